@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for notification rendering.
+
+Measures the cost of rendering a single-event notification and a
+500-event digest with the precompiled templates used by Notifier.
+"""
+
+import os
+import sys
+import argparse
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Add the scripts directory to the Python path
+scripts_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+if scripts_dir not in sys.path:
+    sys.path.insert(0, scripts_dir)
+
+from nuki.notification import Notifier
+
+
+def make_events(count):
+    """Build a list of synthetic normalized events"""
+    start = datetime(2025, 1, 1, 8, 0, 0)
+    actions = ["Unlock", "Lock", "Unlatch", "Lock 'n' Go"]
+    return [
+        {
+            'lock_name': f"Unit {i % 40}",
+            'lock_id': 1000 + (i % 40),
+            'event_type': actions[i % len(actions)],
+            'action': (i % len(actions)) + 1,
+            'trigger': i % 8,
+            'user_name': f"User {i % 25}",
+            'date': (start + timedelta(seconds=i * 37)).strftime('%Y-%m-%d %H:%M:%S'),
+            'event_id': i
+        }
+        for i in range(count)
+    ]
+
+
+def report(label, seconds, runs):
+    """Print the per-call cost of a timed block"""
+    print(f"{label:<32} {seconds / runs * 1e6:10.1f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark notification template rendering')
+    parser.add_argument('--runs', type=int, default=2000, help='Iterations for single-event renders')
+    parser.add_argument('--digest-runs', type=int, default=50, help='Iterations for digest renders')
+    parser.add_argument('--digest-size', type=int, default=500, help='Events per digest')
+    args = parser.parse_args()
+
+    config = SimpleNamespace(
+        use_html_email=True,
+        telegram_use_emoji=True,
+        telegram_format='detailed',
+        template_dir=None
+    )
+
+    started = timeit.default_timer()
+    notifier = Notifier(config)
+    print(f"Template compile (startup)        {(timeit.default_timer() - started) * 1e3:10.1f} ms")
+
+    event = make_events(1)[0]
+    digest = make_events(args.digest_size)
+
+    report("single email (html)", timeit.timeit(lambda: notifier._build_single_email(event), number=args.runs), args.runs)
+    report("single email (plain)", timeit.timeit(lambda: notifier._build_single_plain_email(event), number=args.runs), args.runs)
+    report("single telegram", timeit.timeit(lambda: notifier._build_single_telegram(event), number=args.runs), args.runs)
+    report(f"digest email ({args.digest_size} events)", timeit.timeit(lambda: notifier._build_digest_email(digest), number=args.digest_runs), args.digest_runs)
+    report(f"digest telegram ({args.digest_size} events)", timeit.timeit(lambda: notifier._build_digest_telegram(digest), number=args.digest_runs), args.digest_runs)
+
+
+if __name__ == '__main__':
+    main()
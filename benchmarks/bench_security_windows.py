@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the security monitor's sliding-window detectors.
+
+Streams synthetic events from many users through SecurityMonitor and
+reports throughput, the number of users still tracked and the cost of the
+periodic expiry sweep. Thresholds are set high enough that no alerts fire,
+so the numbers measure window tracking rather than alert delivery.
+"""
+
+import os
+import sys
+import argparse
+import configparser
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Add the repository root (for security.*) to the Python path
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from security.security_monitor import SecurityMonitor
+
+
+def make_monitor(cleanup_interval):
+    """Build a SecurityMonitor whose detectors never alert"""
+    config = configparser.ConfigParser()
+    config['Security'] = {
+        'failed_attempts_threshold': '1000000',
+        'failed_attempts_window': '300',
+        'rapid_access_threshold': '1000000',
+        'rapid_access_window': '60',
+        # Equal start and end disables the unusual-hour check
+        'unusual_hour_start': '12',
+        'unusual_hour_end': '12',
+        'cleanup_interval': str(cleanup_interval)
+    }
+    return SecurityMonitor(config_manager=SimpleNamespace(config=config))
+
+
+def make_events(start, first, count, users, spacing):
+    """Build a chunk of synthetic events, one every `spacing` seconds"""
+    actions = ['Unlock', 'Lock', 'Unlatch', 'Failed Unlock']
+    return [
+        {
+            'id': i,
+            'event_type': actions[i % len(actions)],
+            'user_name': f"User {(i * 7919) % users}",
+            'date': (start + timedelta(seconds=int(i * spacing))).strftime('%Y-%m-%d %H:%M:%S')
+        }
+        for i in range(first, first + count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark security monitor sliding windows')
+    parser.add_argument('--events', type=int, default=1000000, help='Total events to process')
+    parser.add_argument('--users', type=int, default=10000, help='Distinct users')
+    parser.add_argument('--spacing', type=float, default=0.5, help='Seconds of event time between events')
+    parser.add_argument('--cleanup-interval', type=int, default=300, help='Seconds of event time between sweeps')
+    parser.add_argument('--chunk', type=int, default=100000, help='Events generated per chunk')
+    args = parser.parse_args()
+
+    monitor = make_monitor(args.cleanup_interval)
+    start = datetime(2025, 1, 6, 8, 0, 0)
+
+    # Time the sweeps separately from event processing
+    sweeper = monitor.sweeper
+    sweep_times = []
+    maybe_sweep = sweeper.maybe_sweep
+
+    def timed_sweep(now):
+        before = sweeper.last_sweep
+        started = timeit.default_timer()
+        removed = maybe_sweep(now)
+        if sweeper.last_sweep != before and before is not None:
+            sweep_times.append(timeit.default_timer() - started)
+        return removed
+
+    sweeper.maybe_sweep = timed_sweep
+
+    access_window = monitor.pipeline.get('rapid_access').window
+    failed_window = monitor.pipeline.get('failed_attempts').window
+
+    elapsed = 0.0
+    peak_users = 0
+    for first in range(0, args.events, args.chunk):
+        events = make_events(start, first, min(args.chunk, args.events - first), args.users, args.spacing)
+        started = timeit.default_timer()
+        for event in events:
+            monitor.process_event(event)
+        elapsed += timeit.default_timer() - started
+        peak_users = max(peak_users, len(access_window))
+
+    print(f"events processed                 {args.events:10d}")
+    print(f"distinct users                   {args.users:10d}")
+    print(f"throughput                       {args.events / elapsed:10.0f} events/s")
+    print(f"per event                        {elapsed / args.events * 1e6:10.2f} us")
+    print(f"users tracked (access, peak)     {peak_users:10d}")
+    print(f"users tracked (access, final)    {len(access_window):10d}")
+    print(f"users tracked (failed, final)    {len(failed_window):10d}")
+    if sweep_times:
+        print(f"sweeps                           {len(sweep_times):10d}")
+        print(f"sweep cost (mean)                {sum(sweep_times) / len(sweep_times) * 1e3:10.2f} ms")
+        print(f"sweep share of total             {sum(sweep_times) / elapsed * 100:10.2f} %")
+    for name, stats in monitor.get_detector_stats().items():
+        print(f"detector {name:<24}{stats['events']:10d} events {stats['mean_us']:8.2f} us/event")
+
+
+if __name__ == '__main__':
+    main()
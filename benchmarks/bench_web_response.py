@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark for per-request overhead in the web interface.
+
+Serves a dashboard-sized HTML page and a lock status list through a
+Flask test client, once with the response post-processing the web app
+used to run after every request (decoding HTML to patch the theme in,
+re-parsing JSON to drop fields for non-admins) and once without it, as
+the app runs now: the theme comes from the template context and JSON is
+serialized once (with orjson when installed).
+"""
+
+import os
+import sys
+import json
+import argparse
+import timeit
+
+from flask import Flask, jsonify, render_template, request, session
+from jinja2 import DictLoader
+
+# Add the repository root (for web.*) to the Python path
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from web.responses import json_response
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+    <title>Nuki Dashboard</title>
+    {% if theme != 'light' %}<link rel="stylesheet" href="/static/css/dark-mode.css">{% endif %}
+</head>
+<body{% if theme != 'light' %} class="dark-theme"{% endif %}>
+<table>
+{% for row in rows %}<tr><td>{{ row.name }}</td><td>{{ row.state }}</td><td>{{ row.user }}</td><td>{{ row.date }}</td></tr>
+{% endfor %}</table>
+</body>
+</html>
+"""
+
+
+def legacy_post_processing(response):
+    """The after_request hook removed from web/app.py, for comparison"""
+    if 'logged_in' in session and session.get('theme') == 'dark':
+        if response.content_type and 'text/html' in response.content_type:
+            response_data = response.get_data(as_text=True)
+            if '<body>' in response_data and 'dark-theme' not in response_data:
+                response_data = response_data.replace('<body>', '<body class="dark-theme">')
+                response.set_data(response_data)
+            if '<head>' in response_data and 'dark-mode.css' not in response_data:
+                response_data = response_data.replace('</head>', '<link rel="stylesheet">\n</head>')
+                response.set_data(response_data)
+
+    if response.is_json and session.get('role') != 'admin' and request.path.startswith('/api/status'):
+        data = response.get_json()
+        for lock in data:
+            lock.pop('email_details', None)
+            lock.pop('telegram_details', None)
+        response.set_data(json.dumps(data))
+    return response
+
+
+def make_app(rows, locks, legacy):
+    app = Flask(__name__)
+    app.secret_key = 'bench'
+    app.jinja_loader = DictLoader({'index.html': PAGE})
+
+    @app.before_request
+    def login():
+        session['logged_in'] = True
+        session['role'] = 'agent'
+        session['theme'] = 'dark'
+
+    @app.context_processor
+    def inject_theme():
+        return {'theme': session.get('theme') or 'dark'}
+
+    @app.route('/')
+    def index():
+        return render_template('index.html', rows=rows)
+
+    @app.route('/api/status')
+    def status():
+        if legacy:
+            return jsonify(locks)
+        return json_response(locks)
+
+    if legacy:
+        app.after_request(legacy_post_processing)
+    return app
+
+
+def report(label, seconds, runs):
+    """Print the per-request cost of a timed block"""
+    print(f"{label:<48} {seconds / runs * 1e6:10.1f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-request overhead of the web interface')
+    parser.add_argument('--runs', type=int, default=2000, help='Requests per measurement')
+    parser.add_argument('--rows', type=int, default=200, help='Table rows in the HTML page')
+    parser.add_argument('--locks', type=int, default=40, help='Locks in the status response')
+    args = parser.parse_args()
+
+    rows = [{'name': f"Unit {i % 40}", 'state': 'Locked', 'user': f"User {i % 25}",
+             'date': '2025-01-06 10:00:00'} for i in range(args.rows)]
+    locks = [{'id': 1000 + i, 'name': f"Unit {i}", 'state': 'Locked', 'battery_critical': False,
+              'battery_charging': False, 'battery_charge': 80, 'last_activity': '2025-01-06 10:00:00',
+              'last_user': f"User {i % 25}"} for i in range(args.locks)]
+
+    for legacy in (True, False):
+        client = make_app(rows, locks, legacy).test_client()
+        label = 'before (post-processing)' if legacy else 'after (template context)'
+        page_size = len(client.get('/').data)
+        report(f"{label}: HTML {page_size // 1024} KB",
+               timeit.timeit(lambda: client.get('/'), number=args.runs), args.runs)
+        status_size = len(client.get('/api/status').data)
+        report(f"{label}: /api/status {status_size} B",
+               timeit.timeit(lambda: client.get('/api/status'), number=args.runs), args.runs)
+
+
+if __name__ == '__main__':
+    main()
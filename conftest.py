@@ -10,6 +10,39 @@ project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 sys.path.insert(0, os.path.join(project_root, 'web'))
 
+@pytest.fixture
+def security_settings():
+    """Default [Security] settings of make_monitor; override in a test module to change them"""
+    return {}
+
+@pytest.fixture
+def make_monitor(security_settings):
+    """Factory for a SecurityMonitor on in-memory settings that collects its alerts
+
+    Call it with [Security] settings (on top of security_settings), a
+    data_dir and other config sections; it returns (monitor, alerts). No
+    event log or alert log is written.
+    """
+    import configparser
+    from types import SimpleNamespace
+    scripts_dir = os.path.join(project_root, 'scripts')
+    if scripts_dir not in sys.path:
+        sys.path.append(scripts_dir)
+    from security.security_monitor import SecurityMonitor
+
+    def make(data_dir=None, sections=None, **settings):
+        config = configparser.ConfigParser()
+        config['Security'] = {'event_log': 'false', **security_settings, **settings}
+        for name, values in (sections or {}).items():
+            config[name] = values
+        alerts = []
+        monitor = SecurityMonitor(config_manager=SimpleNamespace(config=config, data_dir=data_dir),
+                                  alert_callback=alerts.append)
+        monitor._save_alert = lambda alert_data: None
+        return monitor, alerts
+
+    return make
+
 # Mock data and configs for testing
 @pytest.fixture
 def mock_config_dir():
@@ -103,6 +136,7 @@ def app(mock_config_dir):
     # Set environment variables
     os.environ['CONFIG_DIR'] = os.path.join(mock_config_dir, 'config')
     os.environ['LOGS_DIR'] = os.path.join(mock_config_dir, 'logs')
+    os.environ['DATA_DIR'] = os.path.join(mock_config_dir, 'data')
     
     # Import the app after setting up environment
     from web.app import app as flask_app
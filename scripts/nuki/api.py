@@ -1,5 +1,6 @@
 import requests
 import logging
+import threading
 import time
 from datetime import datetime
 
@@ -45,6 +46,33 @@ class NukiAPI:
         self.user_cache = {}
         self.user_cache_timestamp = 0
         self.user_cache_timeout = config.user_cache_timeout  # In seconds
+        self._cache_token = config.api_token
+        self.config_generation = getattr(config, 'generation', 0)
+        
+        # Lock inventory cache shared by the web handlers
+        self.lock_cache = []
+        self.lock_cache_timestamp = 0
+        self.lock_cache_timeout = getattr(config, 'lock_cache_timeout', 300)
+        # Minimum seconds between refreshes for a lock id missing from the cache
+        self.lock_refresh_interval = 30
+        # smartlockId -> {'name', 'type'} of the cached locks
+        self.lock_map = {}
+        self._lock_cache_lock = threading.Lock()
+    
+    def _sync_config(self):
+        """Pick up reloaded settings, keeping caches whose inputs didn't change"""
+        generation = getattr(self.config, 'generation', 0)
+        if generation == self.config_generation:
+            return
+        self.config_generation = generation
+        if self.config.api_token != self._cache_token:
+            self._cache_token = self.config.api_token
+            self.user_cache = {}
+            self.user_cache_timestamp = 0
+        self.user_cache_timeout = self.config.user_cache_timeout
+        # The token, base URL or explicit lock may have changed: fetch the locks again
+        self.lock_cache_timeout = getattr(self.config, 'lock_cache_timeout', 300)
+        self.invalidate_locks()
     
     def _make_request(self, method, url, params=None, json=None, retry=True):
         """Make an API request with retry logic"""
@@ -172,11 +200,77 @@ class NukiAPI:
             if result is None:
                 # Return an empty list instead of None to prevent errors
                 return []
+            self._cache_locks(result)
             return result
         except Exception as e:
             logger.error(f"Error fetching smartlocks: {e}")
             return []
     
+    def _cache_locks(self, locks):
+        """Store a fresh lock list and its id -> name/type map"""
+        self.lock_map = {
+            lock.get('smartlockId'): {'name': lock.get('name', 'Unknown Lock'), 'type': lock.get('type')}
+            for lock in locks
+        }
+        self.lock_cache = locks
+        self.lock_cache_timestamp = time.time()
+    
+    def get_lock_inventory(self, max_age=None):
+        """Get the smartlocks from the cache, fetching them when it is older than max_age
+        
+        Args:
+            max_age: Seconds a cached list may be old, lock_cache_timeout if None
+        
+        Returns:
+            list: The smartlocks, possibly stale if the API is unreachable
+        """
+        return list(self._cached_locks(max_age))
+    
+    def _cached_locks(self, max_age):
+        """Get the cached lock list (not a copy), fetching it when it is older than max_age"""
+        self._sync_config()
+        if max_age is None:
+            max_age = self.lock_cache_timeout
+        # An account without locks is cached too, so it isn't fetched on every call
+        if self.lock_cache_timestamp and time.time() - self.lock_cache_timestamp < max_age:
+            return self.lock_cache
+        
+        # One request refreshes the cache for all threads waiting on it
+        with self._lock_cache_lock:
+            if self.lock_cache_timestamp and time.time() - self.lock_cache_timestamp < max_age:
+                return self.lock_cache
+            stale = self.lock_cache
+            locks = self.get_smartlocks()
+        if not locks and stale:
+            logger.warning("Could not refresh smartlocks, using the cached list")
+            return stale
+        return locks
+    
+    def get_lock_info(self, smartlock_id):
+        """Get the name and type of a lock from the cached inventory, or None
+        
+        An id missing from the cache refreshes it, at most once every
+        lock_refresh_interval seconds, so locks just added to the account
+        are found before the cache expires.
+        """
+        self._cached_locks(None)
+        info = self.lock_map.get(smartlock_id)
+        if info is None:
+            self._cached_locks(self.lock_refresh_interval)
+            info = self.lock_map.get(smartlock_id)
+        return info
+    
+    def get_default_lock_id(self):
+        """Get the ID of the first lock of the account, or None if there are none"""
+        locks = self.get_lock_inventory()
+        return locks[0].get('smartlockId') if locks else None
+    
+    def invalidate_locks(self):
+        """Drop the cached lock list, e.g. after the account or its locks changed"""
+        self.lock_cache = []
+        self.lock_cache_timestamp = 0
+        self.lock_map = {}
+    
     def get_smartlock_logs(self, smartlock_id, limit=10):
         """Get recent activity logs for a specific smartlock"""
         try:
@@ -260,6 +354,7 @@ class NukiAPI:
     
     def get_users(self, force_refresh=False):
         """Get all users associated with the account with caching"""
+        self._sync_config()
         current_time = time.time()
         
         # Check if we can use cached data
@@ -361,7 +456,7 @@ class NukiAPI:
             logger.error(f"Error parsing date {date_str}: {e}")
             return None
             
-    def add_temporary_code(self, smartlock_id, code, name, expiry):
+    def add_temporary_code(self, smartlock_id, code, name, expiry, valid_from=None):
         """Add a temporary access code to the lock
         
         Args:
@@ -369,6 +464,7 @@ class NukiAPI:
             code: The numeric code to add
             name: User-friendly name/description for the code
             expiry: Datetime object for when the code should expire
+            valid_from: Datetime object for when the code starts working, now if None
         
         Returns:
             dict: Result with success flag and error message or auth ID
@@ -387,7 +483,7 @@ class NukiAPI:
                 "name": name,
                 "code": code,
                 "allowedUntil": expiry_timestamp,
-                "allowedFromTime": int(datetime.now().timestamp()),
+                "allowedFromTime": int((valid_from or datetime.now()).timestamp()),
                 "type": 13  # Code type for temporary code
             }
             
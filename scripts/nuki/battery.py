@@ -0,0 +1,229 @@
+import os
+import json
+import base64
+import logging
+from array import array
+
+logger = logging.getLogger('nuki_monitor')
+
+# Battery history in the data directory, shared by the monitor and the web interface
+BATTERY_HISTORY_NAME = 'battery_history.json'
+
+# A charge rising by at least this many points means the batteries were replaced
+REPLACEMENT_JUMP = 10
+
+# No sample in a slot
+MISSING = -1
+
+
+class BatterySeries:
+    """Battery charge of one lock in a ring buffer of fixed-interval slots
+
+    Slot N covers [N * interval, (N + 1) * interval); each slot holds the
+    last charge sampled in it as one signed byte, or MISSING. Old slots are
+    overwritten as time moves on, so a series never grows.
+    """
+
+    __slots__ = ('values', 'last_slot', 'critical', 'alerted')
+
+    def __init__(self, capacity, values=None, last_slot=None, critical=False, alerted=False):
+        self.values = values if values is not None else array('b', [MISSING]) * capacity
+        self.last_slot = last_slot
+        self.critical = critical
+        # Whether the low battery warning for the current batteries has been sent
+        self.alerted = alerted
+
+    def record(self, slot, charge):
+        """Store a charge in a slot; returns True if the stored data changed"""
+        capacity = len(self.values)
+        if self.last_slot is None:
+            self.last_slot = slot
+        elif slot > self.last_slot:
+            # Clear the slots skipped since the last sample (at most one full turn)
+            for skipped in range(max(self.last_slot + 1, slot - capacity + 1), slot):
+                self.values[skipped % capacity] = MISSING
+            self.last_slot = slot
+        elif slot <= self.last_slot - capacity:
+            return False
+
+        index = slot % capacity
+        if self.values[index] == charge:
+            return False
+        self.values[index] = charge
+        return True
+
+    def last_charge(self):
+        """Get the most recent charge, or None"""
+        if self.last_slot is None:
+            return None
+        charge = self.values[self.last_slot % len(self.values)]
+        return None if charge == MISSING else charge
+
+    def samples(self):
+        """Get (slot, charge) for every stored sample, oldest first"""
+        if self.last_slot is None:
+            return []
+        capacity = len(self.values)
+        result = []
+        for slot in range(self.last_slot - capacity + 1, self.last_slot + 1):
+            charge = self.values[slot % capacity]
+            if charge != MISSING:
+                result.append((slot, charge))
+        return result
+
+
+class BatteryHistory:
+    """Battery charge history and discharge trends for all locks"""
+
+    def __init__(self, interval=3600, capacity=24 * 90):
+        self.interval = interval
+        self.capacity = capacity
+        # str(lock_id) -> BatterySeries
+        self.series = {}
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.series)
+
+    def record(self, lock_id, charge, critical, timestamp):
+        """Record a battery reading taken at `timestamp` (seconds)"""
+        try:
+            charge = max(0, min(100, int(charge)))
+        except (TypeError, ValueError):
+            return
+        key = str(lock_id)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = BatterySeries(self.capacity)
+
+        # New batteries: the warning may be sent again for them
+        last_charge = series.last_charge()
+        if last_charge is not None and charge - last_charge >= REPLACEMENT_JUMP:
+            series.alerted = False
+
+        slot = int(timestamp // self.interval)
+        if series.record(slot, charge):
+            self.dirty = True
+        if series.critical != bool(critical):
+            series.critical = bool(critical)
+            self.dirty = True
+
+    def history(self, lock_id, since=None):
+        """Get [timestamp, charge] pairs for a lock, oldest first"""
+        series = self.series.get(str(lock_id))
+        if series is None:
+            return []
+        return [[slot * self.interval, charge] for slot, charge in series.samples()
+                if since is None or slot * self.interval >= since]
+
+    def trend(self, lock_id, now, critical_level=20):
+        """Fit the discharge trend of a lock's current batteries
+
+        Uses a least-squares line through the samples taken since the
+        batteries were last replaced. Returns a dict with the fitted charge
+        now, the change per day and the estimated days until the charge
+        reaches `critical_level` (None if it isn't falling), or None if
+        there isn't enough history for a fit.
+        """
+        series = self.series.get(str(lock_id))
+        if series is None:
+            return None
+        samples = series.samples()
+
+        # Only look at the samples since the last replacement
+        start = 0
+        for i in range(1, len(samples)):
+            if samples[i][1] - samples[i - 1][1] >= REPLACEMENT_JUMP:
+                start = i
+        samples = samples[start:]
+        if len(samples) < 3 or samples[-1][0] - samples[0][0] < 86400 / self.interval:
+            return None
+
+        # Least squares on (days, charge)
+        scale = self.interval / 86400
+        n = len(samples)
+        mean_x = sum(slot for slot, _ in samples) * scale / n
+        mean_y = sum(charge for _, charge in samples) / n
+        sxx = sum((slot * scale - mean_x) ** 2 for slot, _ in samples)
+        sxy = sum((slot * scale - mean_x) * (charge - mean_y) for slot, charge in samples)
+        per_day = sxy / sxx if sxx else 0.0
+        charge_now = mean_y + per_day * (now / 86400 - mean_x)
+
+        if series.critical or charge_now <= critical_level:
+            days = 0.0
+        elif per_day < 0:
+            days = (charge_now - critical_level) / -per_day
+        else:
+            days = None
+        return {
+            'charge': round(charge_now, 1),
+            'per_day': round(per_day, 3),
+            'days_to_critical': round(days, 1) if days is not None else None
+        }
+
+    def due_warning(self, lock_id, now, critical_level=20, warning_days=14):
+        """Get the trend of a lock if a low battery warning is due
+
+        The warning goes out once per set of batteries, when the estimated
+        time until the charge reaches `critical_level` drops to
+        `warning_days` or less. It stays due until mark_warned() records
+        that it was sent.
+        """
+        series = self.series.get(str(lock_id))
+        if series is None or series.alerted or warning_days <= 0:
+            return None
+        trend = self.trend(lock_id, now, critical_level)
+        if trend is None or trend['days_to_critical'] is None or trend['days_to_critical'] > warning_days:
+            return None
+        return trend
+
+    def mark_warned(self, lock_id):
+        """Record that the low battery warning for the current batteries was sent"""
+        series = self.series.get(str(lock_id))
+        if series is not None and not series.alerted:
+            series.alerted = True
+            self.dirty = True
+
+    def to_dict(self):
+        """Serialize the history; each series is stored as base64 bytes"""
+        return {
+            'interval': self.interval,
+            'capacity': self.capacity,
+            'locks': {
+                key: [series.last_slot, base64.b64encode(series.values.tobytes()).decode('ascii'),
+                      series.critical, series.alerted]
+                for key, series in self.series.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a history serialized with to_dict()"""
+        history = cls(data.get('interval', 3600), data.get('capacity', 24 * 90))
+        for key, (last_slot, values, critical, alerted) in data.get('locks', {}).items():
+            series_values = array('b')
+            series_values.frombytes(base64.b64decode(values))
+            if len(series_values) != history.capacity:
+                continue
+            history.series[key] = BatterySeries(history.capacity, series_values, last_slot, critical, alerted)
+        return history
+
+    def save(self, path):
+        """Write the history to a file atomically"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        """Load a history written by save(), or None if missing or invalid"""
+        try:
+            with open(path, 'r') as f:
+                return cls.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (IOError, ValueError, TypeError) as e:
+            logger.error(f"Error loading battery history from {path}: {e}")
+            return None
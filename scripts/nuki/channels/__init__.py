@@ -0,0 +1,86 @@
+# Notification channel plugins
+#
+# Channel modules are only imported the first time a channel is used, so an
+# installation that only sends email never imports the webhook or MQTT code.
+import logging
+import importlib
+
+logger = logging.getLogger('nuki_monitor')
+
+# Built-in channels: name -> "module:Class" (relative to this package)
+BUILTIN_CHANNELS = {
+    'email': '.smtp:EmailChannel',
+    'telegram': '.telegram:TelegramChannel',
+    'webhook': '.webhook:WebhookChannel',
+    'mqtt': '.mqtt:MqttChannel'
+}
+
+# Recipient option holding the address for each built-in channel
+ADDRESS_OPTIONS = {
+    'email': 'email',
+    'telegram': 'telegram_chat_id',
+    'webhook': 'webhook_url',
+    'mqtt': 'mqtt_topic'
+}
+
+
+def parse_channels(value):
+    """Parse a notification_type value like 'both' or 'email, mqtt' into channel names"""
+    names = []
+    for name in (value or '').replace(';', ',').split(','):
+        name = name.strip().lower()
+        if name == 'both':
+            names.extend(['email', 'telegram'])
+        elif name:
+            names.append(name)
+    # Keep order, drop duplicates
+    return list(dict.fromkeys(names))
+
+
+def load_channel_class(spec):
+    """Import a channel class from a 'module:Class' spec"""
+    module_name, _, class_name = spec.partition(':')
+    if not class_name:
+        raise ValueError(f"Invalid channel spec '{spec}', expected 'module:Class'")
+    module = importlib.import_module(module_name, __name__)
+    return getattr(module, class_name)
+
+
+class ChannelRegistry:
+    """Creates channel instances on first use
+
+    Extra channels can be registered in a [Channels] config section as
+    `name = package.module:Class`; they take precedence over built-ins.
+    """
+
+    def __init__(self, config, http=None):
+        self.config = config
+        self.http = http
+        self.specs = dict(BUILTIN_CHANNELS)
+        parser = getattr(config, 'config', None)
+        if hasattr(parser, 'has_section') and parser.has_section('Channels'):
+            self.specs.update(parser['Channels'])
+        self._channels = {}
+
+    def get(self, name):
+        """Get the channel instance for a name, importing it if needed
+
+        Raises:
+            KeyError: If no channel is registered under the name
+        """
+        channel = self._channels.get(name)
+        if channel is None:
+            spec = self.specs[name]
+            logger.debug(f"Loading notification channel {name} from {spec}")
+            channel = load_channel_class(spec)(self.config, http=self.http)
+            self._channels[name] = channel
+        return channel
+
+    def register(self, name, channel):
+        """Register a ready-made channel instance under a name"""
+        self._channels[name] = channel
+
+    @property
+    def loaded(self):
+        """Names of the channels that have been loaded"""
+        return list(self._channels)
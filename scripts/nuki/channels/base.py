@@ -0,0 +1,75 @@
+import logging
+
+logger = logging.getLogger('nuki_monitor')
+
+
+class DeliveryError(Exception):
+    """A delivery failed
+
+    Args:
+        message: What went wrong
+        retry: Whether retrying could help (False for e.g. an invalid address)
+        retry_after: Seconds the remote side asked us to wait, if any
+    """
+
+    def __init__(self, message, retry=True, retry_after=None):
+        super().__init__(message)
+        self.retry = retry
+        self.retry_after = retry_after
+
+
+class Delivery:
+    """One notification to one address on one channel"""
+
+    def __init__(self, channel, notification, address):
+        self.channel = channel
+        self.notification = notification
+        self.address = address
+        self.attempts = 0
+        self.error = None
+
+
+class Channel:
+    """Base class for notification channels
+
+    Subclasses set `name` and `format` (the Notification rendering they need:
+    'email', 'telegram' or 'json') and implement send(). Channels that hold a
+    connection implement open() and close(), which the dispatch queue calls
+    around each batch. Channels that can send several deliveries in one call
+    override send_batch().
+    """
+
+    name = None
+    format = 'json'
+
+    def __init__(self, config, http=None):
+        self.config = config
+        self.http = http
+
+    def open(self):
+        """Prepare for a batch of deliveries (e.g. connect)"""
+
+    def close(self):
+        """Finish a batch of deliveries"""
+
+    def send(self, delivery):
+        """Send one delivery
+
+        Raises:
+            DeliveryError: If the delivery failed
+        """
+        raise NotImplementedError
+
+    def send_batch(self, deliveries):
+        """Send a batch of deliveries, returning the ones that failed"""
+        failed = []
+        for delivery in deliveries:
+            try:
+                self.send(delivery)
+            except DeliveryError as e:
+                delivery.error = e
+                failed.append(delivery)
+            except Exception as e:
+                delivery.error = DeliveryError(str(e))
+                failed.append(delivery)
+        return failed
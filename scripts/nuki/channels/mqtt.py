@@ -0,0 +1,167 @@
+import json
+import ssl
+import socket
+import struct
+import logging
+
+from .base import Channel, DeliveryError
+
+logger = logging.getLogger('nuki_monitor')
+
+# MQTT 3.1.1 packet types (upper nibble of the fixed header)
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+DISCONNECT = 0xE0
+
+CONNACK_ERRORS = {
+    1: 'unacceptable protocol version',
+    2: 'client identifier rejected',
+    3: 'server unavailable',
+    4: 'bad user name or password',
+    5: 'not authorized'
+}
+
+
+def _encode_length(length):
+    """Encode an MQTT remaining-length varint"""
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length:
+            byte |= 0x80
+        encoded.append(byte)
+        if not length:
+            return bytes(encoded)
+
+
+def _encode_string(value):
+    """Encode a length-prefixed UTF-8 string"""
+    data = value.encode('utf-8')
+    return struct.pack('!H', len(data)) + data
+
+
+class MqttChannel(Channel):
+    """Publishes notifications as JSON to an MQTT broker
+
+    A small MQTT 3.1.1 publisher on the standard library, so no client
+    package is needed. It connects once per batch and publishes at QoS 0 or
+    1; at QoS 1 every message waits for the broker's PUBACK, so a failed
+    publish is retried by the dispatch queue. The delivery address is the
+    topic.
+    """
+
+    name = 'mqtt'
+    format = 'json'
+
+    def __init__(self, config, http=None):
+        super().__init__(config, http)
+        self.host = getattr(config, 'mqtt_host', 'localhost')
+        self.port = getattr(config, 'mqtt_port', 1883)
+        self.username = getattr(config, 'mqtt_username', '')
+        self.password = getattr(config, 'mqtt_password', '')
+        self.client_id = getattr(config, 'mqtt_client_id', 'nuki-monitor')
+        self.qos = 1 if getattr(config, 'mqtt_qos', 1) else 0
+        self.retain = getattr(config, 'mqtt_retain', False)
+        self.use_tls = getattr(config, 'mqtt_tls', False)
+        self.timeout = getattr(config, 'mqtt_timeout', 10)
+        self.sock = None
+        self._packet_id = 0
+
+    def open(self):
+        """Connect to the broker"""
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            if self.use_tls:
+                sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host)
+            self.sock = sock
+
+            flags = 0x02  # Clean session
+            payload = _encode_string(self.client_id)
+            if self.username:
+                flags |= 0x80
+                payload += _encode_string(self.username)
+                if self.password:
+                    flags |= 0x40
+                    payload += _encode_string(self.password)
+            variable_header = _encode_string('MQTT') + struct.pack('!BBH', 4, flags, 60)
+            self._send_packet(CONNECT, variable_header + payload)
+
+            packet_type, body = self._read_packet()
+            if packet_type != CONNACK or len(body) != 2:
+                raise DeliveryError(f"Unexpected reply from MQTT broker: {packet_type:#x}")
+            if body[1]:
+                reason = CONNACK_ERRORS.get(body[1], f"code {body[1]}")
+                raise DeliveryError(f"MQTT broker refused connection: {reason}", retry=body[1] == 3)
+        except OSError as e:
+            self.close()
+            raise DeliveryError(f"Error connecting to MQTT broker {self.host}:{self.port}: {e}")
+        except DeliveryError:
+            self.close()
+            raise
+
+    def close(self):
+        """Disconnect from the broker"""
+        if self.sock is None:
+            return
+        try:
+            self._send_packet(DISCONNECT, b'')
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        self.sock = None
+
+    def send(self, delivery):
+        """Publish one notification to the delivery's topic"""
+        payload = json.dumps(delivery.notification.render(self.format), default=str).encode('utf-8')
+        header = _encode_string(delivery.address)
+        flags = (self.qos << 1) | (1 if self.retain else 0)
+        if self.qos:
+            self._packet_id = self._packet_id % 0xFFFF + 1
+            header += struct.pack('!H', self._packet_id)
+
+        try:
+            self._send_packet(PUBLISH | flags, header + payload)
+            if self.qos:
+                packet_type, body = self._read_packet()
+                if packet_type != PUBACK or struct.unpack('!H', body[:2])[0] != self._packet_id:
+                    raise DeliveryError(f"Unexpected reply from MQTT broker: {packet_type:#x}")
+        except OSError as e:
+            # The connection is unusable; later deliveries in this batch fail fast
+            self.close()
+            raise DeliveryError(f"Error publishing to MQTT topic {delivery.address}: {e}")
+        logger.info(f"MQTT notification published to {delivery.address}")
+
+    def _send_packet(self, header, body):
+        """Write one packet"""
+        if self.sock is None:
+            raise OSError("not connected")
+        self.sock.sendall(bytes([header]) + _encode_length(len(body)) + body)
+
+    def _read_packet(self):
+        """Read one packet, returning (packet type, body)"""
+        header = self._recv_exactly(1)[0]
+        length = 0
+        multiplier = 1
+        while True:
+            byte = self._recv_exactly(1)[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        return header & 0xF0, self._recv_exactly(length)
+
+    def _recv_exactly(self, size):
+        """Read exactly `size` bytes"""
+        data = b''
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise OSError("connection closed by broker")
+            data += chunk
+        return data
@@ -0,0 +1,53 @@
+import logging
+import smtplib
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+from .base import Channel, DeliveryError
+
+logger = logging.getLogger('nuki_monitor')
+
+
+class EmailChannel(Channel):
+    """Sends notifications by email, one SMTP session per batch"""
+
+    name = 'email'
+    format = 'email'
+
+    def __init__(self, config, http=None):
+        super().__init__(config, http)
+        self.server = None
+
+    def open(self):
+        """Connect and log in to the SMTP server"""
+        self.server = smtplib.SMTP(self.config.smtp_server, self.config.smtp_port)
+        self.server.starttls()
+        self.server.login(self.config.email_username, self.config.email_password)
+
+    def close(self):
+        """Close the SMTP session"""
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except smtplib.SMTPException as e:
+                logger.debug(f"Error closing SMTP session: {e}")
+            self.server = None
+
+    def send(self, delivery):
+        """Send one email; each recipient gets their own message so addresses aren't shared"""
+        body = delivery.notification.render(self.format)
+        msg = MIMEMultipart() if self.config.use_html_email else MIMEText(body)
+        msg['From'] = self.config.email_sender
+        msg['To'] = delivery.address
+        msg['Subject'] = delivery.notification.subject
+
+        # Attach body for HTML emails
+        if self.config.use_html_email:
+            msg.attach(MIMEText(body, 'html'))
+
+        try:
+            self.server.sendmail(self.config.email_sender, delivery.address, msg.as_string())
+        except smtplib.SMTPRecipientsRefused as e:
+            raise DeliveryError(f"Recipient refused: {e}", retry=False)
+        except smtplib.SMTPException as e:
+            raise DeliveryError(str(e))
@@ -0,0 +1,52 @@
+import logging
+
+import requests
+
+from .base import Channel, DeliveryError
+
+logger = logging.getLogger('nuki_monitor')
+
+
+class TelegramChannel(Channel):
+    """Sends notifications through the Telegram Bot API over a shared HTTP session"""
+
+    name = 'telegram'
+    format = 'telegram'
+
+    def __init__(self, config, http=None):
+        super().__init__(config, http or requests.Session())
+
+    def open(self):
+        """Check we have the necessary credentials"""
+        if not self.config.telegram_bot_token:
+            raise DeliveryError("Telegram credentials not configured", retry=False)
+
+    def send(self, delivery):
+        """Send one message to one chat"""
+        url = f"https://api.telegram.org/bot{self.config.telegram_bot_token}/sendMessage"
+        payload = {
+            'chat_id': delivery.address,
+            'text': delivery.notification.render(self.format),
+            'parse_mode': 'Markdown'
+        }
+
+        try:
+            response = self.http.post(url, data=payload, timeout=30)
+        except requests.RequestException as e:
+            raise DeliveryError(f"Error sending Telegram notification: {e}")
+
+        if response.status_code == 200:
+            logger.info("Telegram notification sent successfully")
+            return
+        if response.status_code == 429:
+            retry_after = None
+            try:
+                retry_after = response.json().get('parameters', {}).get('retry_after')
+            except ValueError:
+                pass
+            raise DeliveryError("Telegram rate limit reached", retry_after=retry_after)
+        # Other client errors (bad chat ID, blocked bot) won't succeed on retry
+        raise DeliveryError(
+            f"Failed to send Telegram notification. Status code: {response.status_code}, Response: {response.text}",
+            retry=response.status_code >= 500
+        )
@@ -0,0 +1,76 @@
+import hmac
+import json
+import hashlib
+import logging
+
+import requests
+
+from .base import Channel, DeliveryError
+
+logger = logging.getLogger('nuki_monitor')
+
+
+class WebhookChannel(Channel):
+    """POSTs notifications as JSON to HTTP endpoints
+
+    Deliveries to the same URL are batched into one request of the form
+    {"notifications": [...]} (up to webhook_batch_size each), sent over a
+    persistent HTTP session. If a webhook secret is configured, the body is
+    signed with HMAC-SHA256 in the X-Nuki-Signature header.
+    """
+
+    name = 'webhook'
+    format = 'json'
+
+    def __init__(self, config, http=None):
+        super().__init__(config, http or requests.Session())
+        self.batch_size = max(1, getattr(config, 'webhook_batch_size', 20))
+        self.timeout = getattr(config, 'webhook_timeout', 10)
+        secret = getattr(config, 'webhook_secret', '')
+        self.secret = secret.encode('utf-8') if secret else None
+
+    def send(self, delivery):
+        """Send a single delivery"""
+        failed = self.send_batch([delivery])
+        if failed:
+            raise failed[0].error
+
+    def send_batch(self, deliveries):
+        """POST deliveries grouped by URL, returning the ones that failed"""
+        by_url = {}
+        for delivery in deliveries:
+            by_url.setdefault(delivery.address, []).append(delivery)
+
+        failed = []
+        for url, url_deliveries in by_url.items():
+            for start in range(0, len(url_deliveries), self.batch_size):
+                chunk = url_deliveries[start:start + self.batch_size]
+                try:
+                    self._post(url, [delivery.notification.render(self.format) for delivery in chunk])
+                except DeliveryError as e:
+                    for delivery in chunk:
+                        delivery.error = e
+                    failed.extend(chunk)
+        return failed
+
+    def _post(self, url, payloads):
+        """POST one batch of payloads to a URL"""
+        body = json.dumps({'notifications': payloads}, default=str).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.secret:
+            headers['X-Nuki-Signature'] = 'sha256=' + hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+
+        try:
+            response = self.http.post(url, data=body, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise DeliveryError(f"Error calling webhook {url}: {e}")
+
+        if 200 <= response.status_code < 300:
+            logger.info(f"Webhook notification sent to {url} ({len(payloads)} notifications)")
+            return
+        retry_after = response.headers.get('Retry-After')
+        raise DeliveryError(
+            f"Webhook {url} returned status code {response.status_code}",
+            retry=response.status_code == 429 or response.status_code >= 500,
+            retry_after=int(retry_after) if retry_after and retry_after.isdigit() else None
+        )
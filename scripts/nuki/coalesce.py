@@ -0,0 +1,125 @@
+import logging
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger('nuki_monitor')
+
+
+def _event_timestamp(event, fallback):
+    """Get the epoch time of an event's 'YYYY-MM-DD HH:MM:SS' date, or the fallback"""
+    try:
+        return datetime.strptime(event['date'], '%Y-%m-%d %H:%M:%S').timestamp()
+    except (KeyError, TypeError, ValueError):
+        return fallback
+
+
+class EventCoalescer:
+    """Merges bursts of events per lock and user into groups
+
+    An event joins the pending group of its lock/user if it happened within
+    `window` seconds of the group's last event, so a flapping lock produces
+    one group instead of one notification per event. A group is ready once no
+    event has arrived for it for `window` seconds, or once it has been held
+    for `max_delay` seconds. Arrival times are wall-clock; event dates are
+    only compared with each other, so lock clock offsets don't matter.
+    """
+
+    def __init__(self, window, max_delay=0):
+        self.configure(window, max_delay)
+        # (lock_id, user_name) -> pending group, in insertion order
+        self.pending = {}
+        self.closed = []
+
+    def configure(self, window, max_delay=0):
+        """Change the window and maximum delay; pending groups are kept"""
+        self.window = max(0, window)
+        self.max_delay = max_delay if max_delay > 0 else self.window * 10
+
+    def add(self, event, now):
+        """Add an event that arrived at wall-clock time `now`"""
+        key = (event.get('lock_id'), event.get('user_name'))
+        event_time = _event_timestamp(event, now)
+        group = self.pending.get(key)
+
+        if group is not None and abs(event_time - group['last_event_time']) > self.window:
+            # The burst is over; close the old group and start a new one
+            self.closed.append(self.pending.pop(key)['events'])
+            group = None
+
+        if group is None:
+            self.pending[key] = {
+                'events': [event],
+                'first_arrival': now,
+                'last_arrival': now,
+                'last_event_time': event_time
+            }
+        else:
+            group['events'].append(event)
+            group['last_arrival'] = now
+            group['last_event_time'] = max(group['last_event_time'], event_time)
+
+    def ready(self, now):
+        """Remove and return the event groups that are ready to send"""
+        groups = self.closed
+        self.closed = []
+        for key in [key for key, group in self.pending.items() if self._is_ready(group, now)]:
+            groups.append(self.pending.pop(key)['events'])
+        return groups
+
+    def drain(self):
+        """Remove and return all groups, ready or not"""
+        groups = self.closed + [group['events'] for group in self.pending.values()]
+        self.closed = []
+        self.pending = {}
+        return groups
+
+    def next_due(self):
+        """Get the wall-clock time the next group becomes ready, or None if nothing is pending"""
+        if self.closed:
+            return 0
+        if not self.pending:
+            return None
+        return min(min(group['last_arrival'] + self.window, group['first_arrival'] + self.max_delay)
+                   for group in self.pending.values())
+
+    def _is_ready(self, group, now):
+        """Check if a pending group is ready to send"""
+        return (now - group['last_arrival'] >= self.window or
+                now - group['first_arrival'] >= self.max_delay)
+
+    def __len__(self):
+        return sum(len(events) for events in self.closed) + \
+            sum(len(group['events']) for group in self.pending.values())
+
+
+class StormGuard:
+    """Sliding-window limit on outgoing notifications
+
+    Every notification attempt is recorded; while more than `threshold`
+    attempts fall within the last `window` seconds, a storm is in progress
+    and notifications should be held back for a digest instead.
+    """
+
+    def __init__(self, threshold, window=60):
+        self.threshold = threshold
+        self.window = window
+        self.attempts = deque()
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def allow(self, now):
+        """Record a notification attempt and check if it may be sent"""
+        if not self.enabled:
+            return True
+        self.attempts.append(now)
+        return not self.is_storm(now)
+
+    def is_storm(self, now):
+        """Check if the attempt rate is currently above the threshold"""
+        cutoff = now - self.window
+        attempts = self.attempts
+        while attempts and attempts[0] <= cutoff:
+            attempts.popleft()
+        return self.enabled and len(attempts) > self.threshold
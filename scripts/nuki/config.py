@@ -2,9 +2,54 @@ import os
 import configparser
 import logging
 import sys
+import time
+
+from .filters import EventFilter
+from .config_watch import ConfigWatcher
 
 logger = logging.getLogger('nuki_monitor')
 
+# Settings that can be changed at runtime through apply_changes(): (section, option) -> type
+CONFIG_SCHEMA = {
+    ('General', 'notification_type'): str,
+    ('General', 'polling_interval'): int,
+    ('Notification', 'digest_mode'): bool,
+    ('Notification', 'digest_interval'): int,
+    ('Notification', 'notify_auto_lock'): bool,
+    ('Notification', 'notify_system_events'): bool,
+    ('Filter', 'excluded_users'): str,
+    ('Filter', 'excluded_actions'): str,
+    ('Filter', 'excluded_triggers'): str,
+    ('Email', 'smtp_server'): str,
+    ('Email', 'smtp_port'): int,
+    ('Email', 'sender'): str,
+    ('Email', 'recipient'): str,
+    ('Email', 'use_html'): bool,
+    ('Email', 'subject_prefix'): str,
+    ('Telegram', 'chat_id'): str,
+    ('Telegram', 'use_emoji'): bool,
+    ('Telegram', 'format'): str,
+    ('Advanced', 'max_events_per_check'): int,
+    ('Advanced', 'max_historical_events'): int,
+    ('Advanced', 'debug_mode'): bool,
+    ('Advanced', 'user_cache_timeout'): int,
+    ('Advanced', 'lock_cache_timeout'): int,
+    ('Advanced', 'retry_on_failure'): bool,
+    ('Advanced', 'max_retries'): int,
+    ('Advanced', 'retry_delay'): int
+}
+
+# Settings stored in credentials.ini rather than config.ini
+CREDENTIAL_SCHEMA = {
+    ('Nuki', 'api_token'): str,
+    ('Email', 'username'): str,
+    ('Email', 'password'): str,
+    ('Telegram', 'bot_token'): str
+}
+
+# Section names are case-insensitive in requests, e.g. 'general' -> 'General'
+SECTION_NAMES = {section.lower(): section for section, _ in list(CONFIG_SCHEMA) + list(CREDENTIAL_SCHEMA)}
+
 class ConfigManager:
     def __init__(self, base_dir):
         self.base_dir = base_dir
@@ -48,6 +93,11 @@ class ConfigManager:
             logger.critical(f"See DOCKER_SETUP.md for details on setting correct permissions.")
             sys.exit(1)
                 
+        # Incremented every time the settings are (re)loaded; components that copy
+        # settings compare it to notice a reload without touching the files
+        self.generation = 0
+        self.watcher = None
+        
         # Load configuration files
         try:
             self.config = self._load_config()
@@ -71,11 +121,22 @@ class ConfigManager:
         self.track_all_users = self._get_val_bool('Notification', 'track_all_users', env_name='NUKI_TRACK_ALL_USERS', fallback=True)
         self.notify_auto_lock = self._get_val_bool('Notification', 'notify_auto_lock', env_name='NUKI_NOTIFY_AUTO_LOCK', fallback=True)
         self.notify_system_events = self._get_val_bool('Notification', 'notify_system_events', env_name='NUKI_NOTIFY_SYSTEM_EVENTS', fallback=True)
+        self.coalesce_window = self._get_val_int('Notification', 'coalesce_window', env_name='NUKI_COALESCE_WINDOW', fallback=30)
+        self.coalesce_max_delay = self._get_val_int('Notification', 'coalesce_max_delay', env_name='NUKI_COALESCE_MAX_DELAY', fallback=300)
+        self.storm_threshold = self._get_val_int('Notification', 'storm_threshold', env_name='NUKI_STORM_THRESHOLD', fallback=20)
+        self.storm_window = self._get_val_int('Notification', 'storm_window', env_name='NUKI_STORM_WINDOW', fallback=60)
+        self.battery_warning_days = self._get_val_int('Notification', 'battery_warning_days', env_name='NUKI_BATTERY_WARNING_DAYS', fallback=14)
+        self.battery_critical_level = self._get_val_int('Notification', 'battery_critical_level', env_name='NUKI_BATTERY_CRITICAL_LEVEL', fallback=20)
+        self.template_dir = self._get_val('Notification', 'template_dir', env_name='NUKI_TEMPLATE_DIR', fallback=os.path.join(os.path.dirname(self.config_path), 'templates'))
         
         # Filter settings
         self.excluded_users = self._parse_list(self._get_val('Filter', 'excluded_users', env_name='NUKI_EXCLUDED_USERS', fallback=''))
         self.excluded_actions = self._parse_list(self._get_val('Filter', 'excluded_actions', env_name='NUKI_EXCLUDED_ACTIONS', fallback=''))
         self.excluded_triggers = self._parse_list(self._get_val('Filter', 'excluded_triggers', env_name='NUKI_EXCLUDED_TRIGGERS', fallback=''))
+        self.filter_rules = self._get_val('Filter', 'rules', env_name='NUKI_FILTER_RULES', fallback='')
+        
+        # Compile the filters once; the notifier, digest and web UI share them
+        self.event_filter = EventFilter.from_config(self)
         
         # API settings
         self.api_token = self._get_val('Nuki', 'api_token', env_name='NUKI_API_TOKEN', is_credential=True, fallback='')
@@ -129,19 +190,41 @@ class ConfigManager:
         self.telegram_use_emoji = self._get_val_bool('Telegram', 'use_emoji', env_name='NUKI_TELEGRAM_USE_EMOJI', fallback=True)
         self.telegram_format = self._get_val('Telegram', 'format', env_name='NUKI_TELEGRAM_FORMAT', fallback='detailed')
         
+        # Webhook settings
+        self.webhook_url = self._get_val('Webhook', 'url', env_name='NUKI_WEBHOOK_URL', fallback='')
+        self.webhook_secret = self._get_val('Webhook', 'secret', env_name='NUKI_WEBHOOK_SECRET', is_credential=True, fallback='')
+        self.webhook_batch_size = self._get_val_int('Webhook', 'batch_size', env_name='NUKI_WEBHOOK_BATCH_SIZE', fallback=20)
+        self.webhook_timeout = self._get_val_int('Webhook', 'timeout', env_name='NUKI_WEBHOOK_TIMEOUT', fallback=10)
+        
+        # MQTT settings
+        self.mqtt_host = self._get_val('MQTT', 'host', env_name='NUKI_MQTT_HOST', fallback='localhost')
+        self.mqtt_port = self._get_val_int('MQTT', 'port', env_name='NUKI_MQTT_PORT', fallback=1883)
+        self.mqtt_topic = self._get_val('MQTT', 'topic', env_name='NUKI_MQTT_TOPIC', fallback='nuki/events')
+        self.mqtt_client_id = self._get_val('MQTT', 'client_id', env_name='NUKI_MQTT_CLIENT_ID', fallback='nuki-monitor')
+        self.mqtt_qos = self._get_val_int('MQTT', 'qos', env_name='NUKI_MQTT_QOS', fallback=1)
+        self.mqtt_retain = self._get_val_bool('MQTT', 'retain', env_name='NUKI_MQTT_RETAIN', fallback=False)
+        self.mqtt_tls = self._get_val_bool('MQTT', 'tls', env_name='NUKI_MQTT_TLS', fallback=False)
+        self.mqtt_timeout = self._get_val_int('MQTT', 'timeout', env_name='NUKI_MQTT_TIMEOUT', fallback=10)
+        self.mqtt_username = self._get_val('MQTT', 'username', env_name='NUKI_MQTT_USERNAME', is_credential=True, fallback='')
+        self.mqtt_password = self._get_val('MQTT', 'password', env_name='NUKI_MQTT_PASSWORD', is_credential=True, fallback='')
+        
         # Advanced settings
         self.max_events_per_check = self._get_val_int('Advanced', 'max_events_per_check', env_name='NUKI_MAX_EVENTS_PER_CHECK', fallback=5)
         self.max_historical_events = self._get_val_int('Advanced', 'max_historical_events', env_name='NUKI_MAX_HISTORICAL_EVENTS', fallback=20)
         self.debug_mode = self._get_val_bool('Advanced', 'debug_mode', env_name='NUKI_DEBUG_MODE', fallback=False)
         self.user_cache_timeout = self._get_val_int('Advanced', 'user_cache_timeout', env_name='NUKI_USER_CACHE_TIMEOUT', fallback=3600)
+        self.lock_cache_timeout = self._get_val_int('Advanced', 'lock_cache_timeout', env_name='NUKI_LOCK_CACHE_TIMEOUT', fallback=300)
         self.retry_on_failure = self._get_val_bool('Advanced', 'retry_on_failure', env_name='NUKI_RETRY_ON_FAILURE', fallback=True)
         self.max_retries = self._get_val_int('Advanced', 'max_retries', env_name='NUKI_MAX_RETRIES', fallback=3)
         self.retry_delay = self._get_val_int('Advanced', 'retry_delay', env_name='NUKI_RETRY_DELAY', fallback=5)
+        self.event_stream_max_bytes = self._get_val_int('Advanced', 'event_stream_max_bytes', env_name='NUKI_EVENT_STREAM_MAX_BYTES', fallback=10485760)
         
         # Set debug logging if enabled
         if self.debug_mode:
             logger.setLevel(logging.DEBUG)
             logger.debug("Debug logging enabled")
+        
+        self.generation += 1
 
     @property
     def is_configured(self):
@@ -160,6 +243,136 @@ class ConfigManager:
             logger.critical(f"❌ CRITICAL: Permission error reloading configuration: {e}")
             return False
 
+    def start_watching(self, debounce=1.0):
+        """Watch the configuration files for changes made by other processes"""
+        if self.watcher is None:
+            self.watcher = ConfigWatcher([self.config_path, self.credentials_path], debounce=debounce)
+            logger.info(f"Watching configuration files for changes ({self.watcher.backend})")
+        return self.watcher
+
+    def check_for_changes(self, now=None):
+        """Reload the configuration if its files changed; returns True if new settings were loaded"""
+        if self.watcher is None or not self.watcher.poll(now):
+            return False
+        logger.info("Configuration files changed on disk")
+        return self.reload()
+
+    def wait_for_changes(self, timeout):
+        """Sleep up to `timeout` seconds, returning True early once changed settings were loaded"""
+        if self.watcher is None:
+            time.sleep(max(0, timeout))
+            return False
+        if not self.watcher.wait(timeout):
+            return False
+        logger.info("Configuration files changed on disk")
+        return self.reload()
+
+    def apply_changes(self, changes):
+        """Apply a set of changes in one transaction and return the (section, option) keys that changed
+
+        `changes` maps section names (case-insensitive) to {option: value}.
+        Every value is validated against CONFIG_SCHEMA/CREDENTIAL_SCHEMA
+        before anything is written; a ValueError naming all invalid keys is
+        raised otherwise. Each file is parsed once and replaced atomically,
+        and only if one of its values changed. The settings of this
+        instance are then refreshed in place.
+        """
+        updates = {}
+        errors = []
+        for section, options in changes.items():
+            section_name = SECTION_NAMES.get(str(section).lower(), section)
+            if not isinstance(options, dict):
+                errors.append(f"{section}: expected an object")
+                continue
+            for option, value in options.items():
+                key = (section_name, option)
+                value_type = CONFIG_SCHEMA.get(key) or CREDENTIAL_SCHEMA.get(key)
+                if value_type is None:
+                    errors.append(f"{section}.{option}: unknown setting")
+                    continue
+                try:
+                    updates[key] = self._format_value(value, value_type)
+                except ValueError as e:
+                    errors.append(f"{section}.{option}: {e}")
+        if errors:
+            raise ValueError("Invalid configuration: " + "; ".join(errors))
+
+        config = self._read_for_update(self.config, self.config_path)
+        credentials = self._read_for_update(self.credentials, self.credentials_path)
+        changed = set()
+        for key, value in updates.items():
+            section, option = key
+            target = credentials if key in CREDENTIAL_SCHEMA else config
+            if target.get(section, option, fallback=None) == value:
+                continue
+            if not target.has_section(section):
+                target.add_section(section)
+            target.set(section, option, value)
+            changed.add(key)
+        if not changed:
+            return changed
+
+        # The live settings only change once every file has been written
+        if any(key in CREDENTIAL_SCHEMA for key in changed):
+            self._write_atomic(credentials, self.credentials_path, 0o600)
+        if any(key in CONFIG_SCHEMA for key in changed):
+            self._write_atomic(config, self.config_path, 0o640)
+
+        # Our own writes are not news to this process
+        if self.watcher is not None:
+            self.watcher.reset()
+
+        self.config = config
+        self.credentials = credentials
+        self._init_settings()
+        logger.info(f"Applied {len(changed)} configuration changes")
+        return changed
+
+    def _format_value(self, value, value_type):
+        """Validate a value against its schema type and return it as stored in the ini file"""
+        if value_type is bool:
+            if isinstance(value, bool):
+                return 'true' if value else 'false'
+            if str(value).lower() in ('true', '1', 'yes', 'on'):
+                return 'true'
+            if str(value).lower() in ('false', '0', 'no', 'off'):
+                return 'false'
+            raise ValueError(f"expected a boolean, got {value!r}")
+        if value_type is int:
+            try:
+                number = int(str(value).strip())
+            except ValueError:
+                raise ValueError(f"expected an integer, got {value!r}")
+            if number < 0:
+                raise ValueError(f"must not be negative, got {number}")
+            return str(number)
+        if value is None or isinstance(value, (dict, list)):
+            raise ValueError(f"expected a string, got {value!r}")
+        return str(value)
+
+    def _read_for_update(self, current, file_path):
+        """Parse a file for an update, falling back to a copy of the loaded settings"""
+        parser = configparser.ConfigParser(interpolation=None)
+        if os.path.exists(file_path):
+            parser.read(file_path)
+        else:
+            parser.read_dict(current)
+        return parser
+
+    def _write_atomic(self, config_obj, file_path, mode):
+        """Write a configuration object to a temporary file and move it into place"""
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            config_obj.write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_path, mode)
+        except OSError as e:
+            logger.warning(f"Could not set permissions for {file_path}: {e}")
+        os.replace(tmp_path, file_path)
+        logger.info(f"Saved configuration to {file_path}")
+
     def _get_val(self, section, key, env_name=None, is_credential=False, fallback=None):
         """Get a value with environment variable prioritization"""
         if env_name and os.environ.get(env_name):
@@ -321,9 +534,11 @@ class ConfigManager:
         config.set('Advanced', 'max_historical_events', '20')
         config.set('Advanced', 'debug_mode', 'false')
         config.set('Advanced', 'user_cache_timeout', '3600')
+        config.set('Advanced', 'lock_cache_timeout', '300')
         config.set('Advanced', 'retry_on_failure', 'true')
         config.set('Advanced', 'max_retries', '3')
         config.set('Advanced', 'retry_delay', '5')
+        config.set('Advanced', 'event_stream_max_bytes', '10485760')
     
     def _create_empty_credentials(self, credentials):
         """Create an empty credentials file structure"""
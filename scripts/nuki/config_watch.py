@@ -0,0 +1,185 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+
+logger = logging.getLogger('nuki_monitor')
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event header: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def file_signature(path):
+    """Get (mtime in ns, size) of a file, or None if it doesn't exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class Inotify:
+    """Watches the directories of a set of files through the Linux inotify API
+
+    Directories are watched rather than the files themselves, so files that
+    are replaced with os.replace() or created later are still seen.
+    """
+
+    def __init__(self, paths):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.file = open(fd, 'rb', buffering=0)
+
+        # watch descriptor -> names of the watched files in that directory
+        self.names = {}
+        for path in paths:
+            directory, name = os.path.split(os.path.abspath(path))
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                self.close()
+                raise OSError(error, f"Cannot watch {directory}: {os.strerror(error)}")
+            self.names.setdefault(wd, set()).add(os.fsencode(name))
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self):
+        """Drain the pending events; returns True if any concerned a watched file"""
+        changed = False
+        while True:
+            try:
+                data = self.file.read(65536)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            if not data:
+                break
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                start = offset + EVENT_HEADER.size
+                name = data[start:start + length].rstrip(b'\0')
+                offset = start + length
+                if mask & IN_Q_OVERFLOW or name in self.names.get(wd, ()):
+                    changed = True
+        return changed
+
+    def close(self):
+        self.file.close()
+
+
+class ConfigWatcher:
+    """Detects settled changes to a set of files
+
+    Uses inotify where available, so checking for changes costs one
+    non-blocking read and no file system access at all while nothing
+    happens; elsewhere (or if the directories can't be watched) the files
+    are compared by modification time and size on every check. A change is
+    only reported once the files have stopped changing for the debounce
+    period, so a configuration written in several steps isn't applied half
+    written.
+    """
+
+    def __init__(self, paths, debounce=2.0, use_inotify=True, poll_interval=1.0):
+        self.paths = list(dict.fromkeys(paths))
+        self.debounce = debounce
+        # How often wait() checks the files when polling
+        self.poll_interval = poll_interval
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify(self.paths)
+            except (OSError, AttributeError) as e:
+                logger.debug(f"inotify not available, polling configuration files instead: {e}")
+        self.signatures = self._snapshot()
+        # Monotonic time of the last change not yet reported, if any
+        self.changed_at = None
+
+    @property
+    def backend(self):
+        return 'inotify' if self.inotify is not None else 'polling'
+
+    def _snapshot(self):
+        return [file_signature(path) for path in self.paths]
+
+    def _detect(self):
+        """Check if the files changed since the last check"""
+        if self.inotify is not None and not self.inotify.read():
+            return False
+        signatures = self._snapshot()
+        if signatures == self.signatures:
+            return False
+        self.signatures = signatures
+        return True
+
+    def poll(self, now=None):
+        """Check the files for changes
+
+        Args:
+            now: Current monotonic time in seconds, defaults to time.monotonic()
+
+        Returns:
+            bool: True once a change has settled; it is reported only once
+        """
+        if now is None:
+            now = time.monotonic()
+
+        if self._detect():
+            # Still changing: restart the debounce period
+            self.changed_at = now
+            return False
+
+        if self.changed_at is not None and now - self.changed_at >= self.debounce:
+            self.changed_at = None
+            return True
+        return False
+
+    def wait(self, timeout):
+        """Block for up to `timeout` seconds; returns True as soon as a change has settled"""
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if self.poll(now):
+                return True
+            remaining = deadline - now
+            if remaining <= 0:
+                return False
+            if self.changed_at is not None:
+                # Wake up when the pending change settles
+                remaining = min(remaining, max(0.0, self.changed_at + self.debounce - now))
+            if self.inotify is not None:
+                select.select([self.inotify], [], [], remaining)
+            else:
+                time.sleep(min(remaining, self.poll_interval))
+
+    def reset(self):
+        """Forget pending changes, e.g. after writing the files ourselves"""
+        if self.inotify is not None:
+            self.inotify.read()
+        self.signatures = self._snapshot()
+        self.changed_at = None
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
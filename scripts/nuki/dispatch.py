@@ -0,0 +1,152 @@
+import time
+import logging
+
+from .channels.base import Delivery, DeliveryError
+
+logger = logging.getLogger('nuki_monitor')
+
+
+class Notification:
+    """A message to deliver, rendered lazily and at most once per format
+
+    Args:
+        kind: 'event', 'summary', 'digest', 'security' or 'message'
+        subject: Subject line (used by email)
+        events: The events the notification is about
+        title: Heading for summaries and digests
+        data: Extra structured data (e.g. security alert details)
+        renderer: Callable (notification, format) -> rendered payload
+        rendered: Pre-rendered payloads by format
+    """
+
+    def __init__(self, kind, subject, events=(), title=None, data=None, renderer=None, rendered=None):
+        self.kind = kind
+        self.subject = subject
+        self.events = list(events)
+        self.title = title
+        self.data = data
+        self.renderer = renderer
+        self._rendered = dict(rendered or {})
+
+    def render(self, fmt):
+        """Get the payload for a format, rendering it on first use"""
+        if fmt not in self._rendered:
+            if fmt == 'json':
+                self._rendered[fmt] = self.as_dict()
+            elif self.renderer is None:
+                raise DeliveryError(f"No {fmt} rendering for {self.kind} notification", retry=False)
+            else:
+                self._rendered[fmt] = self.renderer(self, fmt)
+        return self._rendered[fmt]
+
+    def as_dict(self):
+        """Structured form for machine channels (webhook, MQTT)"""
+        payload = {
+            'kind': self.kind,
+            'subject': self.subject,
+            'events': self.events
+        }
+        if self.title:
+            payload['title'] = self.title
+        if self.data is not None:
+            payload['data'] = self.data
+        return payload
+
+
+class DispatchQueue:
+    """Delivery queue shared by all channels
+
+    Deliveries are grouped by channel so each channel opens its connection
+    once per run. Failed deliveries are retried as a batch up to max_retries
+    attempts in total, waiting retry_delay seconds (or the Retry-After the
+    remote side asked for) between attempts, following the same retry
+    settings as the Nuki API client. Failures that can't succeed on retry,
+    such as an invalid address, are not retried.
+    """
+
+    def __init__(self, channels, max_retries=3, retry_delay=5, retry_on_failure=True, sleep=time.sleep):
+        self.channels = channels
+        self.configure(max_retries, retry_delay, retry_on_failure)
+        self.sleep = sleep
+        self.pending = []
+
+    def configure(self, max_retries=3, retry_delay=5, retry_on_failure=True):
+        """Change the retry settings"""
+        self.max_retries = max(1, max_retries) if retry_on_failure else 1
+        self.retry_delay = retry_delay
+
+    def put(self, channel_name, notification, addresses):
+        """Queue a notification for a list of addresses on a channel"""
+        for address in addresses:
+            if address:
+                self.pending.append(Delivery(channel_name, notification, address))
+
+    def run(self):
+        """Deliver everything queued; returns True if every delivery succeeded"""
+        pending = self.pending
+        self.pending = []
+        if not pending:
+            return True
+
+        total = len(pending)
+        lost = []
+        for attempt in range(1, self.max_retries + 1):
+            failed = self._send(pending)
+            if not failed:
+                break
+
+            retryable = [delivery for delivery in failed if delivery.error.retry]
+            lost.extend(delivery for delivery in failed if not delivery.error.retry)
+            if not retryable or attempt == self.max_retries:
+                lost.extend(retryable)
+                break
+
+            wait = max([self.retry_delay] + [delivery.error.retry_after or 0 for delivery in retryable])
+            logger.info(f"Retrying {len(retryable)} notifications in {wait} seconds (attempt {attempt}/{self.max_retries})...")
+            self.sleep(wait)
+            pending = retryable
+
+        for delivery in lost:
+            logger.error(f"Failed to send {delivery.channel} notification to {delivery.address}: {delivery.error}")
+        logger.info(f"Notifications sent: {total - len(lost)} delivered, {len(lost)} failed")
+        return not lost
+
+    def _send(self, deliveries):
+        """Send one attempt of deliveries, grouped by channel; returns the failures"""
+        by_channel = {}
+        for delivery in deliveries:
+            delivery.attempts += 1
+            delivery.error = None
+            by_channel.setdefault(delivery.channel, []).append(delivery)
+
+        failed = []
+        for name, channel_deliveries in by_channel.items():
+            try:
+                channel = self.channels.get(name)
+            except Exception as e:
+                logger.error(f"Notification channel {name} unavailable: {e}")
+                self._fail(channel_deliveries, DeliveryError(str(e), retry=False), failed)
+                continue
+
+            try:
+                channel.open()
+            except Exception as e:
+                error = e if isinstance(e, DeliveryError) else DeliveryError(str(e))
+                self._fail(channel_deliveries, error, failed)
+                continue
+
+            try:
+                failed.extend(channel.send_batch(channel_deliveries))
+            finally:
+                try:
+                    channel.close()
+                except Exception as e:
+                    logger.debug(f"Error closing {name} channel: {e}")
+        return failed
+
+    @staticmethod
+    def _fail(deliveries, error, failed):
+        """Mark deliveries as failed with an error"""
+        for delivery in deliveries:
+            delivery.error = error
+        failed.extend(deliveries)
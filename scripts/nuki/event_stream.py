@@ -0,0 +1,196 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger('nuki_monitor')
+
+# Stream of normalized events published by the monitor, in the data directory
+EVENT_STREAM_NAME = 'event_stream.jsonl'
+
+
+class EventStream:
+    """Append-only stream of normalized events shared with other processes
+
+    The monitor publishes every new event as one JSON line carrying a
+    sequence number that keeps increasing across restarts and rotations.
+    Once the file grows past `max_bytes` it is rotated to `<path>.1`, so the
+    stream keeps at most two files; consumers read the rest of the rotated
+    file before moving on to the new one.
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024):
+        self.path = path
+        self.rotated_path = f"{path}.1"
+        self.max_bytes = max_bytes
+        self.seq = None
+
+    def _read_last_seq(self):
+        """Get the sequence number of the last event written, 0 for a new stream"""
+        for path in (self.path, self.rotated_path):
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(0, os.SEEK_END)
+                    size = f.tell()
+                    # Complete lines are short; the tail of the file holds the last one
+                    f.seek(max(0, size - 4096))
+                    lines = f.read().splitlines()
+            except FileNotFoundError:
+                continue
+            for line in reversed(lines):
+                try:
+                    return int(json.loads(line)['seq'])
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return 0
+
+    def publish(self, events):
+        """Append events to the stream and return the last sequence number"""
+        if self.seq is None:
+            self.seq = self._read_last_seq()
+        if not events:
+            return self.seq
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        try:
+            if os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.rotated_path)
+                logger.debug(f"Rotated event stream to {self.rotated_path}")
+        except FileNotFoundError:
+            pass
+
+        seq = self.seq
+        lines = []
+        for event in events:
+            seq += 1
+            lines.append(json.dumps({'seq': seq, 'event': event}, separators=(',', ':'), default=str))
+
+        # One write per batch, synced so a consumer never misses an event it was told about
+        with open(self.path, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.seq = seq
+        return seq
+
+
+class StreamConsumer:
+    """Reads an EventStream from a persisted offset
+
+    The offset (last sequence number, file position and file identity) is
+    committed atomically after each event is handled, so delivery is
+    at-least-once: a crash between handling and committing replays that one
+    event, and a restart resumes right after the last committed event
+    without skipping or reprocessing the rest. A consumer without an offset
+    starts at the end of the stream rather than replaying its history.
+    """
+
+    def __init__(self, path, offset_path):
+        self.path = path
+        self.rotated_path = f"{path}.1"
+        self.offset_path = offset_path
+        self.seq = 0
+        self.position = 0
+        self.inode = None
+        if not self._load_offset():
+            self._start_at_end()
+
+    def _load_offset(self):
+        """Load the committed offset, returning False if there is none"""
+        try:
+            with open(self.offset_path, 'r') as f:
+                offset = json.load(f)
+            self.seq = int(offset.get('seq', 0))
+            self.position = int(offset.get('position', 0))
+            self.inode = offset.get('inode')
+            return True
+        except FileNotFoundError:
+            return False
+        except (IOError, ValueError, TypeError, AttributeError) as e:
+            logger.error(f"Error loading stream offset from {self.offset_path}: {e}")
+            return False
+
+    def _start_at_end(self):
+        """Commit an offset at the current end of the stream"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.commit(EventStream(self.path).publish([]), 0, None)
+            return
+        self.commit(EventStream(self.path).publish([]), stat.st_size, stat.st_ino)
+        logger.info(f"Reading event stream {self.path} from event {self.seq + 1}")
+
+    def commit(self, seq, position, inode):
+        """Persist the offset after an event has been handled"""
+        self.seq, self.position, self.inode = seq, position, inode
+        tmp_path = f"{self.offset_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'seq': seq, 'position': position, 'inode': inode}, f)
+        os.replace(tmp_path, self.offset_path)
+
+    def _records(self, path, position):
+        """Yield (record, end position, inode) for the complete lines after `position`"""
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            inode = os.fstat(f.fileno()).st_ino
+            f.seek(position)
+            for line in f:
+                # A line without its newline is still being written
+                if not line.endswith(b'\n'):
+                    break
+                position += len(line)
+                try:
+                    record = json.loads(line)
+                    record['seq'] = int(record['seq'])
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(f"Skipping malformed event stream line at {path}:{position}")
+                    continue
+                yield record, position, inode
+
+    def _pending(self):
+        """Yield the records after the committed offset, following a rotation"""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+
+        if self.inode is not None and (current is None or current.st_ino != self.inode):
+            # The file we were reading has been rotated: finish it first
+            try:
+                rotated = os.stat(self.rotated_path)
+            except FileNotFoundError:
+                rotated = None
+            if rotated is not None and rotated.st_ino == self.inode:
+                yield from self._records(self.rotated_path, self.position)
+            position = 0
+        elif current is not None and current.st_size < self.position:
+            # Truncated or replaced in place; sequence numbers filter what we've seen
+            position = 0
+        else:
+            position = self.position
+
+        if current is not None:
+            yield from self._records(self.path, position)
+
+    def consume(self, handler, max_events=None):
+        """Pass each new event to `handler`, committing the offset after each one
+
+        If the handler raises, the event is not committed and is delivered
+        again on the next call. Returns the number of events handled.
+        """
+        handled = 0
+        for record, position, inode in self._pending():
+            seq = record['seq']
+            if seq <= self.seq:
+                # Already handled before a rotation or truncation
+                continue
+            if seq > self.seq + 1 and self.seq:
+                logger.warning(f"Event stream gap: expected event {self.seq + 1}, got {seq}")
+            handler(record.get('event') or {})
+            self.commit(seq, position, inode)
+            handled += 1
+            if max_events is not None and handled >= max_events:
+                break
+        return handled
@@ -0,0 +1,274 @@
+import shlex
+import logging
+from datetime import date
+
+from .templates import trigger_description
+
+logger = logging.getLogger('nuki_monitor')
+
+# Event attributes rules can match on
+DIMENSIONS = ('lock', 'user', 'action', 'trigger')
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+MINUTES_PER_DAY = 24 * 60
+ALL_MINUTES = (1 << MINUTES_PER_DAY) - 1
+ALL_WEEKDAYS = (1 << 7) - 1
+
+
+def parse_time_range(value):
+    """Parse 'HH:MM-HH:MM' (or 'HH-HH') into a minute-of-day bitmask
+
+    The start is inclusive and the end exclusive; ranges may span midnight.
+    """
+    try:
+        start, end = (_parse_minute(part) for part in value.split('-', 1))
+    except ValueError:
+        raise ValueError(f"Invalid time range: {value}")
+    if start == end:
+        return ALL_MINUTES
+    if start < end:
+        return ((1 << end) - 1) ^ ((1 << start) - 1)
+    # Range spans midnight (e.g., 22:00-06:00)
+    return ALL_MINUTES ^ (((1 << start) - 1) ^ ((1 << end) - 1))
+
+
+def _parse_minute(value):
+    """Parse 'HH:MM' or 'HH' into minutes since midnight"""
+    hours, _, minutes = value.strip().partition(':')
+    total = int(hours) * 60 + int(minutes or 0)
+    if not 0 <= total <= MINUTES_PER_DAY:
+        raise ValueError(value)
+    return total
+
+
+def parse_weekdays(value):
+    """Parse 'mon-fri' or 'sat,sun' into a 7-bit weekday mask (Monday is bit 0)"""
+    mask = 0
+    for part in value.lower().split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        try:
+            start = WEEKDAYS.index(first[:3])
+            end = WEEKDAYS.index(last[:3]) if last else start
+        except ValueError:
+            raise ValueError(f"Invalid weekday: {part}")
+        day = start
+        while True:
+            mask |= 1 << day
+            if day == end:
+                break
+            day = (day + 1) % 7
+    return mask
+
+
+def event_keys(event):
+    """Get the lowercase lookup keys of an event for each rule dimension"""
+    trigger = event.get('trigger')
+    return (
+        ('lock', (str(event.get('lock_name', '')).lower(), str(event.get('lock_id', '')).lower())),
+        ('user', (str(event.get('user_name', '')).lower(),)),
+        ('action', (str(event.get('event_type', '')).lower(), str(event.get('action', '')).lower())),
+        ('trigger', (str(trigger).lower(), trigger_description(trigger).lower()))
+    )
+
+
+def event_time(event):
+    """Get (minute of day, weekday) of an event's 'YYYY-MM-DD HH:MM:SS' date, or (None, None)"""
+    value = event.get('date')
+    try:
+        minute = int(value[11:13]) * 60 + int(value[14:16])
+        weekday = date(int(value[0:4]), int(value[5:7]), int(value[8:10])).weekday()
+        return minute, weekday
+    except (TypeError, ValueError):
+        return None, None
+
+
+class FilterRule:
+    """A single include/exclude rule
+
+    Each dimension holds a frozenset of accepted lowercase values, or an empty
+    set for "any". Time and weekday constraints are bitmasks.
+    """
+
+    def __init__(self, mode='exclude', lock=(), user=(), action=(), trigger=(),
+                 minutes=ALL_MINUTES, weekdays=ALL_WEEKDAYS, source=''):
+        if mode not in ('include', 'exclude'):
+            raise ValueError(f"Invalid rule mode: {mode}")
+        self.mode = mode
+        self.values = {
+            'lock': frozenset(value.lower() for value in lock),
+            'user': frozenset(value.lower() for value in user),
+            'action': frozenset(value.lower() for value in action),
+            'trigger': frozenset(value.lower() for value in trigger)
+        }
+        self.minutes = minutes
+        self.weekdays = weekdays
+        self.source = source
+
+    @property
+    def is_timed(self):
+        """Whether the rule only applies at certain times"""
+        return self.minutes != ALL_MINUTES or self.weekdays != ALL_WEEKDAYS
+
+    @classmethod
+    def parse(cls, text):
+        """Parse a rule like: include lock:"Front Door" time:08:00-18:00 weekday:mon-fri
+
+        Raises:
+            ValueError: If the rule is malformed
+        """
+        tokens = shlex.split(text)
+        if not tokens:
+            raise ValueError("Empty rule")
+
+        mode = tokens[0].lower()
+        values = {dimension: [] for dimension in DIMENSIONS}
+        minutes = ALL_MINUTES
+        weekdays = ALL_WEEKDAYS
+        for token in tokens[1:]:
+            field, sep, value = token.partition(':')
+            field = field.lower()
+            if not sep or not value:
+                raise ValueError(f"Invalid condition '{token}' in rule: {text}")
+            if field in DIMENSIONS:
+                values[field].extend(item.strip() for item in value.split(',') if item.strip())
+            elif field == 'time':
+                minutes = parse_time_range(value)
+            elif field == 'weekday':
+                weekdays = parse_weekdays(value)
+            else:
+                raise ValueError(f"Unknown field '{field}' in rule: {text}")
+
+        return cls(mode, minutes=minutes, weekdays=weekdays, source=text, **values)
+
+
+def parse_rules(text):
+    """Parse one rule per line, skipping blanks and comments; invalid rules are logged and dropped"""
+    rules = []
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if not line or line.startswith(('#', ';')):
+            continue
+        try:
+            rules.append(FilterRule.parse(line))
+        except ValueError as e:
+            logger.error(f"Ignoring filter rule: {e}")
+    return rules
+
+
+class RuleIndex:
+    """A list of rules compiled into per-value bitmasks
+
+    Each rule owns one bit. For every dimension the index maps a value to the
+    mask of rules that accept it, plus a wildcard mask of rules that don't
+    constrain that dimension. Time and weekday constraints are expanded into
+    per-minute and per-weekday masks. Matching an event is a fixed number of
+    dict lookups and ANDs, independent of the number of rules.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.all_mask = (1 << len(self.rules)) - 1
+        self._compile()
+
+    def _compile(self):
+        """Precompute the lookup masks"""
+        self._wildcard = {}
+        self._index = {}
+        for dimension in DIMENSIONS:
+            wildcard = 0
+            index = {}
+            for bit, rule in enumerate(self.rules):
+                values = rule.values[dimension]
+                if not values:
+                    wildcard |= 1 << bit
+                for value in values:
+                    index[value] = index.get(value, 0) | (1 << bit)
+            self._wildcard[dimension] = wildcard
+            self._index[dimension] = index
+
+        # Rules without time constraints also apply to events without a usable date
+        self._untimed_mask = 0
+        self._minute_masks = [0] * MINUTES_PER_DAY
+        self._weekday_masks = [0] * 7
+        for bit, rule in enumerate(self.rules):
+            if not rule.is_timed:
+                self._untimed_mask |= 1 << bit
+            for minute in range(MINUTES_PER_DAY):
+                if rule.minutes >> minute & 1:
+                    self._minute_masks[minute] |= 1 << bit
+            for weekday in range(7):
+                if rule.weekdays >> weekday & 1:
+                    self._weekday_masks[weekday] |= 1 << bit
+
+    def match(self, event):
+        """Get the bitmask of rules matching an event"""
+        mask = self.all_mask
+        if not mask:
+            return 0
+
+        for dimension, keys in event_keys(event):
+            accepted = self._wildcard[dimension]
+            index = self._index[dimension]
+            for key in keys:
+                accepted |= index.get(key, 0)
+            mask &= accepted
+            if not mask:
+                return 0
+
+        minute, weekday = event_time(event)
+        if minute is None:
+            return mask & self._untimed_mask
+        return mask & self._minute_masks[minute] & self._weekday_masks[weekday]
+
+
+class EventFilter:
+    """Compiled include/exclude rules deciding which events are notified
+
+    An event is filtered out if it matches any exclude rule, or if include
+    rules exist and it matches none of them.
+    """
+
+    def __init__(self, rules):
+        self.index = RuleIndex(rules)
+        self.exclude_mask = 0
+        self.include_mask = 0
+        for bit, rule in enumerate(self.index.rules):
+            if rule.mode == 'exclude':
+                self.exclude_mask |= 1 << bit
+            else:
+                self.include_mask |= 1 << bit
+
+    @classmethod
+    def from_config(cls, config):
+        """Compile the legacy exclusion lists and [Filter] rules of a config"""
+        rules = []
+
+        # Legacy settings become plain exclude rules
+        if not getattr(config, 'notify_auto_lock', True):
+            rules.append(FilterRule('exclude', user=['Auto Lock'], source='notify_auto_lock = false'))
+        if getattr(config, 'excluded_users', None):
+            rules.append(FilterRule('exclude', user=config.excluded_users, source='excluded_users'))
+        if getattr(config, 'excluded_actions', None):
+            rules.append(FilterRule('exclude', action=config.excluded_actions, source='excluded_actions'))
+        if getattr(config, 'excluded_triggers', None):
+            rules.append(FilterRule('exclude', trigger=config.excluded_triggers, source='excluded_triggers'))
+
+        rules.extend(parse_rules(getattr(config, 'filter_rules', '')))
+        return cls(rules)
+
+    def is_filtered(self, event):
+        """Check if an event should be filtered out"""
+        mask = self.index.match(event)
+        if mask & self.exclude_mask:
+            return True
+        if self.include_mask and not mask & self.include_mask:
+            return True
+        return False
+
+    def filter_events(self, events):
+        """Get the events that pass the filter"""
+        return [event for event in events if not self.is_filtered(event)]
@@ -1,20 +1,145 @@
+import time
 import logging
 import requests
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 
+from .channels import ChannelRegistry
+from .channels.base import DeliveryError
+from .coalesce import EventCoalescer, StormGuard
+from .dispatch import DispatchQueue, Notification
+from .recipients import RecipientRegistry
+from .templates import TemplateRenderer
+
 logger = logging.getLogger('nuki_monitor')
 
+DIGEST_TITLE = 'Nuki Lock Activity Digest'
+
 class Notifier:
     def __init__(self, config):
         self.config = config
         self.digest_events = []
         self.last_digest_time = datetime.now()
+        
+        # Compile templates once
+        self.templates = TemplateRenderer(getattr(config, 'template_dir', None))
+        
+        # Channels are loaded on first use and share one HTTP session and one
+        # dispatch queue, so every channel gets the same batching and retries
+        self.http = requests.Session()
+        self.channels = ChannelRegistry(config, http=self.http)
+        self.dispatch = DispatchQueue(self.channels)
+        
+        # Merge bursts per lock/user, and hold notifications for a digest during storms
+        self.coalescer = EventCoalescer(0)
+        self.storm_guard = StormGuard(0)
+        self.storm_events = []
+        
+        # Settings copied from the config; refreshed when its generation changes
+        self.config_generation = None
+        self._sync_config()
+    
+    def _sync_config(self):
+        """Pick up the settings of a reloaded config, keeping queued and coalesced events"""
+        generation = getattr(self.config, 'generation', 0)
+        if generation == self.config_generation:
+            return
+        self.config_generation = generation
+        
+        self._telegram_context = {
+            'use_emoji': self.config.telegram_use_emoji,
+            'compact': self.config.telegram_format == 'compact'
+        }
+        
+        # Recipients and their filters are compiled into a lookup index
+        self.recipients = RecipientRegistry.from_config(self.config)
+        
+        self.dispatch.configure(
+            max_retries=getattr(self.config, 'max_retries', 1),
+            retry_delay=getattr(self.config, 'retry_delay', 0),
+            retry_on_failure=getattr(self.config, 'retry_on_failure', False)
+        )
+        self.coalescer.configure(getattr(self.config, 'coalesce_window', 0),
+                                 getattr(self.config, 'coalesce_max_delay', 0))
+        self.storm_guard.threshold = getattr(self.config, 'storm_threshold', 0)
+        self.storm_guard.window = getattr(self.config, 'storm_window', 60)
+    
+    def submit(self, event, now=None):
+        """Queue an event for immediate notification, coalescing bursts"""
+        self._sync_config()
+        if not self.coalescer.window and not self.storm_guard.enabled:
+            return self.send_notification(event)
+        
+        # Check if we should filter this event
+        if self._should_filter_event(event):
+            logger.info(f"Event filtered: {event['event_type']} by {event['user_name']}")
+            return False
+        
+        if now is None:
+            now = time.time()
+        self.coalescer.add(event, now)
+        return self.flush(now)
+    
+    def flush(self, now=None, force=False):
+        """Send the coalesced notifications that are ready
+        
+        Args:
+            now: Current wall-clock time (defaults to time.time())
+            force: Send everything pending, e.g. on shutdown
+        """
+        self._sync_config()
+        if now is None:
+            now = time.time()
+        groups = self.coalescer.drain() if force else self.coalescer.ready(now)
+        
+        success = True
+        for events in groups:
+            if not self.storm_guard.allow(now):
+                if not self.storm_events:
+                    logger.warning("Notification storm detected, holding notifications for a digest")
+                self.storm_events.extend(events)
+            elif len(events) == 1:
+                success = self.send_notification(events[0]) and success
+            else:
+                success = self._send_summary(events) and success
+        
+        # Once the storm is over, send everything held back as one digest
+        if self.storm_events and (force or not self.storm_guard.is_storm(now)):
+            events = self.storm_events
+            self.storm_events = []
+            logger.info(f"Notification storm over, sending digest of {len(events)} events")
+            success = self._send_digest(events) and success
+        
+        return success
+    
+    def next_flush_time(self):
+        """Get the wall-clock time flush() should next be called, or None if nothing is pending"""
+        due = self.coalescer.next_due()
+        if self.storm_events:
+            storm_due = self.storm_guard.attempts[0] + self.storm_guard.window if self.storm_guard.attempts else 0
+            due = storm_due if due is None else min(due, storm_due)
+        return due
+    
+    def _send_summary(self, events):
+        """Send one summary notification for a burst of events on the same lock by the same user"""
+        first = events[0]
+        logger.info(f"Sending summary of {len(events)} events on {first['lock_name']} by {first['user_name']}")
+        
+        mask = 0
+        for event in events:
+            mask |= self.recipients.match(event)
+        if not mask:
+            return True
+        
+        subject = f"{self.config.email_subject_prefix}: {len(events)} events on {first['lock_name']} by {first['user_name']}"
+        title = f"{first['lock_name']}: {len(events)} events by {first['user_name']}"
+        events = sorted(events, key=lambda x: x['date'], reverse=True)
+        
+        self._queue(Notification('summary', subject, events, title=title, renderer=self._render), mask)
+        return self.dispatch.run()
     
     def send_notification(self, event):
         """Send an immediate notification for a single event"""
+        self._sync_config()
         logger.info(f"Sending notification for {event['event_type']} by {event['user_name']}")
         
         # Check if we should filter this event
@@ -25,23 +150,34 @@ class Notifier:
         # Create subject and messages
         subject = f"{self.config.email_subject_prefix}: {event['event_type']} by {event['user_name']}"
         
-        email_body = self._build_single_email(event)
-        telegram_msg = self._build_single_telegram(event)
+        # Find every recipient interested in this event
+        mask = self.recipients.match(event)
+        if not mask:
+            logger.info(f"No recipients for event: {event['event_type']} by {event['user_name']}")
+            return True
         
-        # Send notifications based on settings
-        success = True
-        if self.config.notification_type in ['email', 'both']:
-            email_success = self.send_email(subject, email_body)
-            success = success and email_success
-            
-        if self.config.notification_type in ['telegram', 'both']:
-            telegram_success = self.send_telegram(telegram_msg)
-            success = success and telegram_success
-            
-        return success
+        # Render once per format, then deliver to all matching recipients in one batch per channel
+        self._queue(Notification('event', subject, [event], renderer=self._render), mask)
+        return self.dispatch.run()
+    
+    def send_system_notification(self, event):
+        """Send a notification from the monitor itself, such as a battery warning
+        
+        Event filters and per-recipient rules select lock activity, so they
+        don't apply: every recipient gets the notification.
+        """
+        self._sync_config()
+        logger.info(f"Sending system notification: {event['event_type']} on {event['lock_name']}")
+        if not self.recipients.recipients:
+            return True
+        
+        subject = f"{self.config.email_subject_prefix}: {event['event_type']} on {event['lock_name']}"
+        self._queue(Notification('event', subject, [event], renderer=self._render), self.recipients.all_mask)
+        return self.dispatch.run()
     
     def add_to_digest(self, event):
         """Add an event to the digest queue"""
+        self._sync_config()
         # Check if we should filter this event
         if self._should_filter_event(event):
             logger.info(f"Event filtered from digest: {event['event_type']} by {event['user_name']}")
@@ -56,283 +192,142 @@ class Notifier:
     
     def _should_filter_event(self, event):
         """Check if an event should be filtered based on config settings"""
-        # Auto-lock filtering
-        if event['user_name'] == "Auto Lock" and not self.config.notify_auto_lock:
-            return True
-            
-        # User filtering
-        if event['user_name'] in self.config.excluded_users:
-            return True
-            
-        # Action filtering
-        if 'action' in event and str(event['action']) in self.config.excluded_actions:
-            return True
-            
-        # Trigger filtering
-        if 'trigger' in event and str(event['trigger']) in self.config.excluded_triggers:
-            return True
-            
-        return False
+        # Rules are compiled when the config is loaded; look them up on each
+        # call so a config reload takes effect without rebuilding the notifier
+        return self.config.event_filter.is_filtered(event)
     
     def send_digest_notification(self):
         """Send a digest notification with all events since last digest"""
+        self._sync_config()
         if not self.digest_events:
             return
             
         logger.info(f"Sending digest notification with {len(self.digest_events)} events")
+        success = self._send_digest(self.digest_events)
         
-        # Build the message
-        subject = f"{self.config.email_subject_prefix}: Activity Digest - {len(self.digest_events)} events"
+        # Reset digest regardless of send success to prevent repeated failures
+        self.digest_events = []
+        self.last_digest_time = datetime.now()
         
-        # Sort events by date, newest first
+        return success
+    
+    def _send_digest(self, events):
+        """Render and send a digest of events to each recipient"""
+        # Sort events by date, newest first (the fixed-width date format sorts lexically)
         sorted_events = sorted(
-            self.digest_events, 
-            key=lambda x: datetime.strptime(x['date'], '%Y-%m-%d %H:%M:%S'),
+            events, 
+            key=lambda x: x['date'],
             reverse=True
         )
         
-        # Build the email and telegram messages
-        email_body = self._build_digest_email(sorted_events)
-        telegram_msg = self._build_digest_telegram(sorted_events)
+        # Work out which events each recipient gets, and group recipients
+        # that get exactly the same events so each digest is rendered once
+        hour = datetime.now().hour
+        masks = [self.recipients.match(event, hour) for event in sorted_events]
+        groups = {}
+        for bit in range(len(self.recipients.recipients)):
+            selected = tuple(i for i, mask in enumerate(masks) if mask >> bit & 1)
+            if selected:
+                groups[selected] = groups.get(selected, 0) | (1 << bit)
         
-        # Send notifications based on settings
-        success = True
-        if self.config.notification_type in ['email', 'both']:
-            email_success = self.send_email(subject, email_body)
-            success = success and email_success
-            
-        if self.config.notification_type in ['telegram', 'both']:
-            telegram_success = self.send_telegram(telegram_msg)
-            success = success and telegram_success
-        
-        # Reset digest regardless of send success to prevent repeated failures
-        self.digest_events = []
-        self.last_digest_time = datetime.now()
+        # Queue one digest per group, then send them all in one batch per channel
+        for selected, recipient_mask in groups.items():
+            events = [sorted_events[i] for i in selected]
+            subject = f"{self.config.email_subject_prefix}: Activity Digest - {len(events)} events"
+            self._queue(Notification('digest', subject, events, title=DIGEST_TITLE, renderer=self._render), recipient_mask)
         
-        return success
+        return self.dispatch.run()
     
-    def _build_digest_email(self, events):
+    def _build_digest_email(self, events, title=DIGEST_TITLE):
         """Build HTML email body for digest"""
         if not self.config.use_html_email:
-            return self._build_digest_plain_email(events)
-            
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; }}
-                .container {{ padding: 20px; }}
-                table {{ border-collapse: collapse; width: 100%; }}
-                th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                th {{ background-color: #f2f2f2; }}
-                tr:nth-child(even) {{ background-color: #f9f9f9; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>Nuki Lock Activity Digest</h2>
-                <p>The following activity has been recorded:</p>
-                
-                <table>
-                    <tr>
-                        <th>Date & Time</th>
-                        <th>Lock</th>
-                        <th>Action</th>
-                        <th>User</th>
-                        <th>Trigger</th>
-                    </tr>
-        """
-        
-        for event in events:
-            trigger_desc = self._get_trigger_description(event)
-            html += f"""
-                    <tr>
-                        <td>{event['date']}</td>
-                        <td>{event['lock_name']}</td>
-                        <td>{event['event_type']}</td>
-                        <td>{event['user_name']}</td>
-                        <td>{trigger_desc}</td>
-                    </tr>
-            """
-            
-        html += """
-                </table>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return html
+            return self._build_digest_plain_email(events, title)
+        return self.templates.render('digest_email.html', events=events, title=title)
     
-    def _build_digest_plain_email(self, events):
+    def _build_digest_plain_email(self, events, title=DIGEST_TITLE):
         """Build plain text email body for digest"""
-        text = "Nuki Lock Activity Digest\n"
-        text += "========================\n\n"
-        text += "The following activity has been recorded:\n\n"
-        
-        for event in events:
-            trigger_desc = self._get_trigger_description(event)
-            text += f"Date: {event['date']}\n"
-            text += f"Lock: {event['lock_name']}\n"
-            text += f"Action: {event['event_type']}\n"
-            text += f"User: {event['user_name']}\n"
-            text += f"Trigger: {trigger_desc}\n\n"
-            text += "-----------------------\n\n"
-            
-        return text
+        return self.templates.render('digest_email.txt', events=events, title=title)
     
-    def _build_digest_telegram(self, events):
+    def _build_digest_telegram(self, events, title=DIGEST_TITLE):
         """Build Telegram message for digest"""
-        emoji_prefix = "🔔 " if self.config.telegram_use_emoji else ""
-        msg = f"{emoji_prefix}*Nuki Lock Activity Digest*\n\n"
-        
-        for event in events:
-            trigger_desc = self._get_trigger_description(event)
-            lock_emoji = "🔒 " if self.config.telegram_use_emoji else ""
-            user_emoji = "👤 " if self.config.telegram_use_emoji else ""
-            time_emoji = "🕒 " if self.config.telegram_use_emoji else ""
-            trigger_emoji = "📱 " if self.config.telegram_use_emoji else ""
-            
-            msg += f"• {event['date']} - {event['lock_name']}\n"
-            msg += f"  {lock_emoji}{event['event_type']} by {user_emoji}{event['user_name']}\n"
-            msg += f"  {trigger_emoji}Trigger: {trigger_desc}\n\n"
-            
-        return msg
-    
-    def _get_trigger_description(self, event):
-        """Get human-readable trigger description"""
-        trigger_map = {
-            0: "System",
-            1: "Manual",
-            2: "Button",
-            3: "Automatic",
-            4: "App",
-            5: "Website",
-            6: "Auto Lock",
-            7: "Time Control"
-        }
-        
-        trigger = event.get('trigger')
-        if trigger in trigger_map:
-            return trigger_map[trigger]
-        return f"Unknown ({trigger})"
+        return self.templates.render('digest_telegram.txt', events=events, title=title, **self._telegram_context)
     
     def _build_single_email(self, event):
         """Build email for a single event"""
         if not self.config.use_html_email:
             return self._build_single_plain_email(event)
-            
-        trigger_desc = self._get_trigger_description(event)
-        return f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; }}
-                .container {{ padding: 20px; }}
-                .event {{ margin-bottom: 20px; }}
-                .label {{ font-weight: bold; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>Nuki Lock Alert</h2>
-                
-                <div class="event">
-                    <p><span class="label">Action:</span> {event['event_type']}</p>
-                    <p><span class="label">Lock:</span> {event['lock_name']}</p>
-                    <p><span class="label">User:</span> {event['user_name']}</p>
-                    <p><span class="label">Time:</span> {event['date']}</p>
-                    <p><span class="label">Trigger:</span> {trigger_desc}</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        return self.templates.render('single_email.html', event=event)
     
     def _build_single_plain_email(self, event):
         """Build plain text email for a single event"""
-        trigger_desc = self._get_trigger_description(event)
-        text = "Nuki Lock Alert\n"
-        text += "==============\n\n"
-        text += f"Action: {event['event_type']}\n"
-        text += f"Lock: {event['lock_name']}\n"
-        text += f"User: {event['user_name']}\n"
-        text += f"Time: {event['date']}\n"
-        text += f"Trigger: {trigger_desc}\n"
-        
-        return text
+        return self.templates.render('single_email.txt', event=event)
     
     def _build_single_telegram(self, event):
         """Build Telegram message for a single event"""
-        trigger_desc = self._get_trigger_description(event)
-        
-        if not self.config.telegram_use_emoji:
-            if self.config.telegram_format == 'compact':
-                return f"Nuki Lock Alert: {event['event_type']} by {event['user_name']} on {event['lock_name']} at {event['date']} ({trigger_desc})"
-            else:
-                return f"Nuki Lock Alert\n{event['event_type']} on {event['lock_name']}\nUser: {event['user_name']}\nTime: {event['date']}\nTrigger: {trigger_desc}"
+        return self.templates.render('single_telegram.txt', event=event, **self._telegram_context)
+    
+    def _render(self, notification, fmt):
+        """Render a notification for a channel format"""
+        kind = notification.kind
+        events = notification.events
+        if fmt == 'email':
+            if kind == 'event':
+                return self._build_single_email(events[0])
+            if kind in ('summary', 'digest'):
+                return self._build_digest_email(events, notification.title)
+        elif fmt == 'telegram':
+            if kind == 'event':
+                return self._build_single_telegram(events[0])
+            if kind in ('summary', 'digest'):
+                return self._build_digest_telegram(events, notification.title)
+        raise DeliveryError(f"Cannot render {kind} notification as {fmt}", retry=False)
+    
+    def _queue(self, notification, mask):
+        """Queue a notification for every recipient in a mask, on each of their channels"""
+        for channel in self.recipients.channels:
+            self.dispatch.put(channel, notification, self.recipients.addresses(mask, channel))
+    
+    def send(self, notification, addresses):
+        """Send a notification to explicit addresses
         
-        # With emoji
-        if self.config.telegram_format == 'compact':
-            return f"🔔 Nuki Alert: {event['event_type']} by {event['user_name']} on {event['lock_name']} at {event['date']}"
-        else:
-            return f"""🔔 *Nuki Lock Alert*
-🔒 *{event['event_type']}* on *{event['lock_name']}*
-👤 User: {event['user_name']}
-🕒 Time: {event['date']}
-📱 Trigger: {trigger_desc}
-"""
+        Args:
+            notification: Notification to send
+            addresses: Dict of channel name -> list of addresses
+        """
+        for channel, channel_addresses in addresses.items():
+            self.dispatch.put(channel, notification, channel_addresses)
+        return self.dispatch.run()
     
-    def send_email(self, subject, body):
-        """Send an email notification"""
-        try:
-            # Create message
-            msg = MIMEMultipart() if self.config.use_html_email else MIMEText(body)
-            msg['From'] = self.config.email_sender
-            msg['To'] = self.config.email_recipient
-            msg['Subject'] = subject
-            
-            # Attach body for HTML emails
-            if self.config.use_html_email:
-                msg.attach(MIMEText(body, 'html'))
-            
-            # Connect to server and send
-            server = smtplib.SMTP(self.config.smtp_server, self.config.smtp_port)
-            server.starttls()
-            server.login(self.config.email_username, self.config.email_password)
-            server.sendmail(self.config.email_sender, self.config.email_recipient, msg.as_string())
-            server.quit()
-            
-            logger.info("Email notification sent successfully")
-            return True
-        except Exception as e:
-            logger.error(f"Error sending email notification: {e}")
+    def send_email(self, subject, body, recipient=None):
+        """Send an email notification
+        
+        Args:
+            subject: Email subject
+            body: Email body (HTML or plain text depending on settings)
+            recipient: Address or list of addresses, or None for the configured recipient
+        """
+        if recipient is None:
+            recipient = self.config.email_recipient
+        recipients = [recipient] if isinstance(recipient, str) else list(recipient)
+        recipients = [address for address in recipients if address]
+        if not recipients:
+            logger.error("Email recipient not configured")
             return False
+        notification = Notification('message', subject, rendered={'email': body})
+        return self.send(notification, {'email': recipients})
     
-    def send_telegram(self, message):
-        """Send a Telegram notification"""
-        try:
-            # Check if we have the necessary credentials
-            if not self.config.telegram_bot_token or not self.config.telegram_chat_id:
-                logger.error("Telegram credentials not configured")
-                return False
-                
-            # Send message
-            url = f"https://api.telegram.org/bot{self.config.telegram_bot_token}/sendMessage"
-            payload = {
-                'chat_id': self.config.telegram_chat_id,
-                'text': message,
-                'parse_mode': 'Markdown'
-            }
-            
-            response = requests.post(url, data=payload)
-            
-            if response.status_code == 200:
-                logger.info("Telegram notification sent successfully")
-                return True
-            else:
-                logger.error(f"Failed to send Telegram notification. Status code: {response.status_code}, Response: {response.text}")
-                return False
-        except Exception as e:
-            logger.error(f"Error sending Telegram notification: {e}")
+    def send_telegram(self, message, chat_id=None):
+        """Send a Telegram notification
+        
+        Args:
+            message: Message text (Markdown)
+            chat_id: Chat ID or list of chat IDs, or None for the configured chat
+        """
+        if chat_id is None:
+            chat_id = self.config.telegram_chat_id
+        chat_ids = [chat_id] if isinstance(chat_id, (str, int)) else list(chat_id)
+        if not any(chat_ids):
+            logger.error("Telegram chat ID not configured")
             return False
+        notification = Notification('message', '', rendered={'telegram': message})
+        return self.send(notification, {'telegram': chat_ids})
@@ -0,0 +1,152 @@
+import logging
+from datetime import datetime
+
+from .channels import ADDRESS_OPTIONS, parse_channels
+from .filters import FilterRule, RuleIndex
+
+logger = logging.getLogger('nuki_monitor')
+
+# Config sections named "[Recipient:<name>]" define additional recipients
+RECIPIENT_SECTION_PREFIX = 'Recipient:'
+
+
+def parse_hours(value):
+    """Parse an hour range like '22-7' into the set of hours it covers"""
+    if not value or '-' not in value:
+        return frozenset()
+    try:
+        start, end = (int(part) % 24 for part in value.split('-', 1))
+    except ValueError:
+        logger.warning(f"Invalid hour range: {value}")
+        return frozenset()
+    if start > end:
+        # Range spans midnight (e.g., 22-7)
+        return frozenset(list(range(start, 24)) + list(range(0, end)))
+    return frozenset(range(start, end))
+
+
+class Recipient:
+    """A notification recipient with its own channels and filters"""
+
+    def __init__(self, name, addresses=None, channels=('email', 'telegram'),
+                 locks=(), users=(), actions=(), triggers=(), quiet_hours=''):
+        self.name = name
+        # Channel name -> address (email address, chat ID, webhook URL, MQTT topic, ...)
+        self.addresses = {channel: address for channel, address in (addresses or {}).items() if address}
+        self.channels = tuple(channels)
+        # Empty filters mean "everything"
+        self.rule = FilterRule('include', lock=locks, user=users, action=actions, trigger=triggers,
+                               source=f"recipient {name}")
+        self.quiet_hours = parse_hours(quiet_hours)
+
+    def address(self, channel):
+        """Get this recipient's address on a channel, or None if not subscribed"""
+        if channel not in self.channels:
+            return None
+        return self.addresses.get(channel)
+
+
+def address_option(channel):
+    """Get the recipient option holding the address for a channel"""
+    return ADDRESS_OPTIONS.get(channel, f"{channel}_address")
+
+
+class RecipientRegistry:
+    """All configured recipients, with filters precompiled into a bitmask index
+
+    Each recipient's filters form one include rule of a shared RuleIndex, so
+    recipient bit N is rule bit N and matching an event is a handful of dict
+    lookups and ANDs regardless of the number of recipients.
+    """
+
+    def __init__(self, recipients):
+        self.recipients = list(recipients)
+        self.index = RuleIndex(recipient.rule for recipient in self.recipients)
+        self.all_mask = self.index.all_mask
+        # Every channel used by at least one recipient, in configuration order
+        self.channels = list(dict.fromkeys(channel for recipient in self.recipients for channel in recipient.channels))
+        self._compile()
+
+    @classmethod
+    def from_config(cls, config):
+        """Build the registry from the default recipient and [Recipient:*] sections"""
+        recipients = []
+
+        # The global recipient keeps receiving everything on the notification_type channels
+        addresses = {
+            'email': getattr(config, 'email_recipient', ''),
+            'telegram': getattr(config, 'telegram_chat_id', ''),
+            'webhook': getattr(config, 'webhook_url', ''),
+            'mqtt': getattr(config, 'mqtt_topic', '')
+        }
+        channels = parse_channels(getattr(config, 'notification_type', 'both'))
+        if any(addresses[channel] for channel in channels if channel in addresses):
+            recipients.append(Recipient('default', addresses=addresses, channels=channels))
+
+        parser = getattr(config, 'config', None)
+        sections = parser.sections() if hasattr(parser, 'sections') else []
+        for section in sections:
+            if not section.startswith(RECIPIENT_SECTION_PREFIX):
+                continue
+            options = parser[section]
+            name = section[len(RECIPIENT_SECTION_PREFIX):].strip()
+            channels = parse_channels(options.get('channels', 'email, telegram'))
+            recipients.append(Recipient(
+                name,
+                addresses={channel: options.get(address_option(channel), '') for channel in channels},
+                channels=channels,
+                locks=_parse_list(options.get('locks', '')),
+                users=_parse_list(options.get('users', '')),
+                actions=_parse_list(options.get('actions', '')),
+                triggers=_parse_list(options.get('triggers', '')),
+                quiet_hours=options.get('quiet_hours', '')
+            ))
+
+        logger.info(f"Loaded {len(recipients)} notification recipients")
+        return cls(recipients)
+
+    def _compile(self):
+        """Precompute the per-hour quiet-hours masks"""
+        # Mask of recipients that are NOT in their quiet hours, per hour of the day
+        self._hour_mask = [0] * 24
+        for hour in range(24):
+            for bit, recipient in enumerate(self.recipients):
+                if hour not in recipient.quiet_hours:
+                    self._hour_mask[hour] |= 1 << bit
+
+    def match(self, event, hour=None):
+        """Get the bitmask of recipients that should receive an event"""
+        if hour is None:
+            hour = datetime.now().hour
+
+        mask = self._hour_mask[hour]
+        if not mask:
+            return 0
+        return mask & self.index.match(event)
+
+    def get(self, name):
+        """Get a recipient by name, or None"""
+        for recipient in self.recipients:
+            if recipient.name == name:
+                return recipient
+        return None
+
+    def members(self, mask):
+        """Get the recipients whose bits are set in a mask"""
+        return [recipient for bit, recipient in enumerate(self.recipients) if mask >> bit & 1]
+
+    def addresses(self, mask, channel):
+        """Get the unique addresses on a channel for the recipients in a mask"""
+        addresses = []
+        for recipient in self.members(mask):
+            address = recipient.address(channel)
+            if address and address not in addresses:
+                addresses.append(address)
+        return addresses
+
+
+def _parse_list(value_str):
+    """Parse a comma-separated string into a list of values"""
+    if not value_str:
+        return []
+    return [item.strip() for item in value_str.split(',') if item.strip()]
@@ -0,0 +1,73 @@
+import os
+import logging
+from jinja2 import ChoiceLoader, Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+
+logger = logging.getLogger('nuki_monitor')
+
+# Built-in templates shipped with the package
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+TRIGGER_MAP = {
+    0: "System",
+    1: "Manual",
+    2: "Button",
+    3: "Automatic",
+    4: "App",
+    5: "Website",
+    6: "Auto Lock",
+    7: "Time Control"
+}
+
+
+def trigger_description(trigger):
+    """Get human-readable trigger description"""
+    if trigger in TRIGGER_MAP:
+        return TRIGGER_MAP[trigger]
+    return f"Unknown ({trigger})"
+
+
+class TemplateRenderer:
+    """Compiles notification templates once and renders them per event"""
+
+    TEMPLATE_NAMES = (
+        'single_email.html',
+        'single_email.txt',
+        'single_telegram.txt',
+        'digest_email.html',
+        'digest_email.txt',
+        'digest_telegram.txt',
+        'security_email.html',
+        'security_telegram.txt'
+    )
+
+    def __init__(self, override_dir=None):
+        # User templates take precedence over the built-in ones
+        loaders = []
+        if override_dir and os.path.isdir(override_dir):
+            logger.info(f"Using notification template overrides from {override_dir}")
+            loaders.append(FileSystemLoader(override_dir))
+        loaders.append(FileSystemLoader(TEMPLATE_DIR))
+
+        # Templates never change while running, so skip the per-render mtime check
+        self.env = Environment(
+            loader=ChoiceLoader(loaders),
+            autoescape=select_autoescape(enabled_extensions=('html',), default_for_string=False),
+            trim_blocks=True,
+            lstrip_blocks=True,
+            keep_trailing_newline=True,
+            auto_reload=False,
+            cache_size=-1
+        )
+        self.env.filters['trigger_description'] = trigger_description
+
+        # Static fragments shared by every message are rendered once and injected as globals,
+        # next to Jinja's defaults (range, namespace, ...) that override templates may use
+        self.env.globals['email_style'] = Markup(self.env.get_template('_email_style.html').render())
+
+        # Compile everything up front so a broken override fails at startup, not on the first event
+        self.templates = {name: self.env.get_template(name) for name in self.TEMPLATE_NAMES}
+
+    def render(self, name, **context):
+        """Render a precompiled template with the given context"""
+        return self.templates[name].render(**context)
@@ -3,7 +3,7 @@ import os
 import time
 import logging
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Set up logging with fallback to console if file logging fails
 log_handlers = []
@@ -47,6 +47,8 @@ from nuki.config import ConfigManager
 from nuki.api import NukiAPI
 from nuki.utils import ActivityTracker
 from nuki.notification import Notifier
+from nuki.event_stream import EventStream, EVENT_STREAM_NAME
+from nuki.battery import BatteryHistory, BATTERY_HISTORY_NAME
 
 class NukiMonitor:
     def __init__(self):
@@ -58,10 +60,25 @@ class NukiMonitor:
         
         # Initialize components
         self.config = ConfigManager(self.base_dir)
+        self.config.start_watching()
         self.api = NukiAPI(self.config)
         self.tracker = ActivityTracker(self.config.data_dir)
         self.notifier = Notifier(self.config)
         
+        # Normalized events are shared with the security service through the event stream
+        self.event_stream = EventStream(
+            os.path.join(self.config.data_dir, EVENT_STREAM_NAME),
+            self.config.event_stream_max_bytes
+        )
+        
+        # Last published status per lock: lock_id -> (state, door state, battery critical)
+        self.lock_states = {}
+        
+        # Battery charge history, sampled on every poll
+        self.battery_path = os.path.join(self.config.data_dir, BATTERY_HISTORY_NAME)
+        self.battery = BatteryHistory.load(self.battery_path) or BatteryHistory()
+        self.battery_checked_slot = None
+        
         # Flag to indicate first run
         self.first_run = True
         
@@ -137,6 +154,81 @@ class NukiMonitor:
         
         return True
     
+    def _lock_status_events(self, locks):
+        """Build 'Lock State' events for the locks whose reported status changed"""
+        events = []
+        # UTC, like the dates of the API's log entries
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        for lock in locks:
+            state = lock.get('state')
+            if not isinstance(state, dict):
+                continue
+            lock_id = lock.get('smartlockId')
+            status = (state.get('state'), state.get('doorState'), state.get('batteryCritical'))
+            if self.lock_states.get(lock_id) == status:
+                continue
+            self.lock_states[lock_id] = status
+            events.append({
+                'lock_name': lock.get('name', 'Unknown Lock'),
+                'lock_id': lock_id,
+                'event_type': 'Lock State',
+                'state': status[0],
+                'door_state': status[1],
+                'battery_critical': status[2],
+                'date': now
+            })
+        return events
+    
+    def sample_batteries(self, locks, now=None):
+        """Record the battery charge of each lock and warn about batteries running low"""
+        if now is None:
+            now = time.time()
+        names = {}
+        for lock in locks:
+            state = lock.get('state')
+            if not isinstance(state, dict) or state.get('batteryCharge') is None:
+                continue
+            lock_id = lock.get('smartlockId')
+            names[lock_id] = lock.get('name', 'Unknown Lock')
+            self.battery.record(lock_id, state['batteryCharge'], state.get('batteryCritical'), now)
+        
+        # Trends only change with new samples; check them once per sampling interval
+        slot = int(now // self.battery.interval)
+        if slot != self.battery_checked_slot:
+            self.battery_checked_slot = slot
+            for lock_id, lock_name in names.items():
+                trend = self.battery.due_warning(lock_id, now, self.config.battery_critical_level,
+                                                 self.config.battery_warning_days)
+                if trend is not None and self._send_battery_warning(lock_id, lock_name, trend):
+                    self.battery.mark_warned(lock_id)
+        
+        if self.battery.dirty:
+            try:
+                self.battery.save(self.battery_path)
+            except (PermissionError, IOError) as e:
+                logger.error(f"Failed to save battery history: {e}")
+    
+    def _send_battery_warning(self, lock_id, lock_name, trend):
+        """Notify every recipient that a lock's batteries will soon be critical; returns whether it was sent"""
+        days = trend['days_to_critical']
+        event_type = "Battery critical" if days <= 0 else f"Battery critical in ~{max(1, round(days))} days"
+        logger.warning(f"{event_type} on {lock_name} (charge {trend['charge']}%, {trend['per_day']}%/day)")
+        event = {
+            'lock_name': lock_name,
+            'lock_id': lock_id,
+            'event_type': event_type,
+            'action': None,
+            'trigger': None,
+            'user_name': 'Battery Monitor',
+            'date': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            'battery': trend
+        }
+        try:
+            return self.notifier.send_system_notification(event)
+        except Exception as e:
+            logger.error(f"Error sending battery warning: {e}")
+            return False
+    
     def check_new_activity(self):
         """Check for new activity and generate notifications if needed"""
         # Special handling for first run
@@ -166,6 +258,12 @@ class NukiMonitor:
                 logger.error("No smartlocks found")
                 return False
         
+        # Track battery levels from the lock status
+        try:
+            self.sample_batteries(locks)
+        except Exception as e:
+            logger.error(f"Error sampling battery levels: {e}")
+        
         new_events = []
         
         for lock in locks:
@@ -217,7 +315,8 @@ class NukiMonitor:
                         'trigger': trigger,
                         'user_name': user_name,
                         'date': date.strftime('%Y-%m-%d %H:%M:%S'),
-                        'event_id': event_id
+                        'event_id': event_id,
+                        'auth_id': auth_id
                     }
                     
                     new_events.append(event_record)
@@ -234,6 +333,14 @@ class NukiMonitor:
                 logger.error("Check that the data directory is writable by the container.")
                 return False
         
+        # Publish new events for the security service, followed by the current lock status
+        stream_events = new_events + self._lock_status_events(locks)
+        if stream_events:
+            try:
+                self.event_stream.publish(stream_events)
+            except (PermissionError, IOError) as e:
+                logger.error(f"Failed to publish events to the event stream: {e}")
+        
         # Send notifications for new events
         if new_events:
             if self.config.digest_mode:
@@ -244,15 +351,46 @@ class NukiMonitor:
                     except Exception as e:
                         logger.error(f"Error adding event to digest: {e}")
             else:
-                # Send immediate notifications
+                # Queue immediate notifications; bursts are coalesced per lock/user
                 for event in new_events:
                     try:
-                        self.notifier.send_notification(event)
+                        self.notifier.submit(event)
                     except Exception as e:
                         logger.error(f"Error sending notification: {e}")
         
+        # Send coalesced notifications whose window has closed
+        try:
+            self.notifier.flush()
+        except Exception as e:
+            logger.error(f"Error sending coalesced notifications: {e}")
+        
         return True
     
+    def wait_for_next_poll(self):
+        """Sleep until the next poll, waking up to send coalesced notifications when due
+        and to apply configuration changes as soon as they are written"""
+        last_poll = time.time()
+        while True:
+            # A changed polling interval applies to the wait in progress
+            next_poll = last_poll + self.config.polling_interval
+            due = self.notifier.next_flush_time()
+            wake = next_poll if due is None else min(due, next_poll)
+            if self.config.wait_for_changes(wake - time.time()):
+                self.apply_config()
+                continue
+            if wake >= next_poll:
+                return
+            try:
+                self.notifier.flush()
+            except Exception as e:
+                logger.error(f"Error sending coalesced notifications: {e}")
+    
+    def apply_config(self):
+        """Apply reloaded settings that were copied at startup"""
+        logger.info(f"Configuration reloaded (generation {self.config.generation}), "
+                    f"polling every {self.config.polling_interval} seconds")
+        self.event_stream.max_bytes = self.config.event_stream_max_bytes
+    
     def run(self):
         """Run the monitor in a continuous loop"""
         logger.info("Starting Nuki Monitor")
@@ -264,9 +402,11 @@ class NukiMonitor:
                 except Exception as e:
                     logger.error(f"Error checking for new activity: {e}")
                     
-                time.sleep(self.config.polling_interval)
+                self.wait_for_next_poll()
         except KeyboardInterrupt:
             logger.info("Monitor stopped by user")
+            # Don't drop notifications still being coalesced
+            self.notifier.flush(force=True)
         except Exception as e:
             logger.error(f"Error in monitor: {e}")
             raise
@@ -0,0 +1,239 @@
+"""
+Behavioral Baselines for Nuki Security Monitoring
+
+Keeps, for every (user, lock) pair, how often the user accesses the lock in
+each of the 168 hours of the week. Counts live in fixed-size float arrays
+and decay exponentially, so old habits fade out. Decay is applied lazily:
+new events are added with a weight that grows over time instead of shrinking
+every count, which keeps both updates and scoring O(1).
+
+Run directly to rebuild a baseline from the stored event log:
+
+    python security/baseline.py data/security_events.jsonl data/security_baseline.json
+"""
+
+import os
+import sys
+import json
+import math
+import base64
+import logging
+import argparse
+from array import array
+
+logger = logging.getLogger('nuki_security')
+
+HOURS_PER_WEEK = 168
+
+# Rebase a profile once its event weights grow past this (keeps float32 counts precise)
+MAX_WEIGHT = float(2 ** 20)
+
+
+def hour_of_week(date):
+    """
+    Get the hour of the week (0 = Monday 00:00 to 167 = Sunday 23:00).
+
+    Args:
+        date: Datetime
+
+    Returns:
+        int: Hour of the week
+    """
+    return date.weekday() * 24 + date.hour
+
+
+class Profile:
+    """
+    Decayed hour-of-week access counts for one key.
+
+    Counts are stored relative to `origin`: an access at time t is added
+    with weight exp(decay * (t - origin)), so at time t the real (decayed)
+    counts are the stored ones times exp(-decay * (t - origin)).
+    """
+
+    __slots__ = ('counts', 'total', 'origin')
+
+    def __init__(self, origin, counts=None, total=0.0):
+        self.counts = counts if counts is not None else array('f', bytes(4 * HOURS_PER_WEEK))
+        self.total = total
+        self.origin = origin
+
+
+class HourOfWeekBaseline:
+    """
+    Per-key hour-of-week access frequencies with exponential decay.
+    """
+
+    def __init__(self, half_life_days=28, alpha=0.01):
+        """
+        Initialize the baseline.
+
+        Args:
+            half_life_days: Days after which an access counts half as much (0 disables decay)
+            alpha: Additive smoothing per hour, so unseen hours keep a small probability
+        """
+        self.half_life_days = half_life_days
+        self.decay = math.log(2) / (half_life_days * 86400) if half_life_days > 0 else 0.0
+        self.alpha = alpha
+        self.profiles = {}
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def update(self, key, hour, timestamp):
+        """
+        Record an access.
+
+        Args:
+            key: Key the access belongs to (e.g. (user, lock))
+            hour: Hour of the week
+            timestamp: Time of the access in seconds
+        """
+        profile = self.profiles.get(key)
+        if profile is None:
+            profile = self.profiles[key] = Profile(timestamp)
+
+        weight = math.exp(self.decay * (timestamp - profile.origin))
+        if weight > MAX_WEIGHT:
+            # Rescale the stored counts to a new origin; rare, so O(168) is fine here
+            scale = 1.0 / weight
+            counts = profile.counts
+            for i in range(HOURS_PER_WEEK):
+                counts[i] *= scale
+            profile.total *= scale
+            profile.origin = timestamp
+            weight = 1.0
+
+        profile.counts[hour] += weight
+        profile.total += weight
+
+    def weight(self, key, timestamp):
+        """
+        Get the decayed number of accesses recorded for a key.
+
+        Args:
+            key: Key to look up
+            timestamp: Time in seconds to decay to
+
+        Returns:
+            float: Decayed access count (0 if the key is unknown)
+        """
+        profile = self.profiles.get(key)
+        if profile is None:
+            return 0.0
+        return profile.total * math.exp(-self.decay * (timestamp - profile.origin))
+
+    def probability(self, key, hour, timestamp):
+        """
+        Get the smoothed probability of an access in an hour of the week.
+
+        Args:
+            key: Key to score
+            hour: Hour of the week
+            timestamp: Time in seconds to decay to
+
+        Returns:
+            float: Probability, or None if the key has no history
+        """
+        profile = self.profiles.get(key)
+        if profile is None:
+            return None
+        factor = math.exp(-self.decay * (timestamp - profile.origin))
+        return ((profile.counts[hour] * factor + self.alpha) /
+                (profile.total * factor + self.alpha * HOURS_PER_WEEK))
+
+    def to_dict(self):
+        """
+        Serialize the baseline; count arrays are stored as base64 float32.
+
+        Returns:
+            dict: JSON-serializable baseline
+        """
+        return {
+            'half_life_days': self.half_life_days,
+            'alpha': self.alpha,
+            'profiles': [
+                [list(key) if isinstance(key, tuple) else key, profile.origin, profile.total,
+                 base64.b64encode(profile.counts.tobytes()).decode('ascii')]
+                for key, profile in self.profiles.items()
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild a baseline serialized with to_dict().
+
+        Args:
+            data: Serialized baseline
+
+        Returns:
+            HourOfWeekBaseline: The baseline
+        """
+        baseline = cls(data.get('half_life_days', 28), data.get('alpha', 0.01))
+        for key, origin, total, counts in data.get('profiles', []):
+            values = array('f')
+            values.frombytes(base64.b64decode(counts))
+            if len(values) != HOURS_PER_WEEK:
+                continue
+            key = tuple(key) if isinstance(key, list) else key
+            baseline.profiles[key] = Profile(origin, values, total)
+        return baseline
+
+    def save(self, path):
+        """
+        Write the baseline to a file atomically.
+
+        Args:
+            path: Destination path
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a baseline written by save().
+
+        Args:
+            path: Source path
+
+        Returns:
+            HourOfWeekBaseline: The baseline, or None if the file is missing or invalid
+        """
+        try:
+            with open(path, 'r') as f:
+                return cls.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (IOError, ValueError, TypeError) as e:
+            logger.error(f"Error loading security baseline from {path}: {e}")
+            return None
+
+
+def main():
+    """Rebuild a baseline file from an event log."""
+    # Allow running as a script
+    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if parent_dir not in sys.path:
+        sys.path.append(parent_dir)
+    from security.detectors import BaselineDetector
+    from security.event_store import EventStore
+
+    parser = argparse.ArgumentParser(description='Rebuild the security access baseline from the event log')
+    parser.add_argument('events', help='Event log (JSON lines)')
+    parser.add_argument('output', help='Baseline file to write')
+    parser.add_argument('--half-life-days', type=int, default=28, help='Decay half-life in days')
+    args = parser.parse_args()
+
+    detector = BaselineDetector(settings={'baseline_half_life_days': args.half_life_days})
+    trained = detector.train(EventStore(args.events))
+    detector.baseline.save(args.output)
+    print(f"Trained {len(detector.baseline)} profiles from {trained} events")
+
+
+if __name__ == '__main__':
+    main()
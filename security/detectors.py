@@ -0,0 +1,932 @@
+"""
+Security Detectors for Nuki Smart Lock
+
+Each detector looks for one suspicious pattern. A detector declares the
+event fields it needs and the event types it handles; the pipeline only
+dispatches matching events to it, runs detectors in the configured order
+and keeps per-detector latency and alert counts.
+
+Detectors are selected and ordered by `[Security] detectors`. Additional
+detectors can be registered in a `[Detectors]` config section as
+`name = package.module:Class`, and take precedence over the built-ins.
+
+Settings can change while the monitor runs: detectors that stay in the
+pipeline get the new settings through configure() and keep their state.
+"""
+
+import os
+import json
+import time
+import logging
+import importlib
+from collections import deque
+from datetime import datetime, timezone
+
+from security.windows import SlidingWindowCounter, BucketedCounter
+from security.baseline import HourOfWeekBaseline, hour_of_week
+from security.event_store import EventStore, EVENT_LOG_NAME
+from security.door_state import DoorStateTracker, DOOR_STATE_NAMES, LOCKED, UNLOCKED, UNLATCHED
+
+logger = logging.getLogger('nuki_security')
+
+# Event types that move a lock to the unlocked or locked state
+UNLOCK_EVENT_TYPES = frozenset(['unlock', 'unlatch'])
+LOCK_EVENT_TYPES = frozenset(['lock', 'full lock', "lock 'n' go", "lock 'n' go with unlatch"])
+
+# Lock status readings the main monitor publishes when a lock's state changes
+STATUS_EVENT_TYPE = 'lock state'
+
+DEFAULT_DETECTORS = ('failed_attempts', 'unusual_hours', 'access_baseline', 'rapid_access',
+                     'door_left_unlocked', 'code_reuse', 'cross_lock', 'temp_code_schedule')
+
+WEEKDAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+def parse_event_date(date_str):
+    """
+    Parse an event date in 'YYYY-MM-DD HH:MM:SS' format.
+
+    Event dates are UTC, like the dates of the API's log entries.
+
+    Args:
+        date_str: Date string
+
+    Returns:
+        datetime: Parsed UTC date, or None if invalid
+    """
+    # Slicing the fixed-width format is much faster than strptime
+    try:
+        return datetime(int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10]),
+                        int(date_str[11:13]), int(date_str[14:16]), int(date_str[17:19]),
+                        tzinfo=timezone.utc)
+    except (ValueError, TypeError):
+        return None
+
+
+def utc_now():
+    """Get the current time as an aware UTC datetime, comparable with event dates."""
+    return datetime.now(timezone.utc)
+
+
+class EventContext:
+    """
+    An event plus the values derived from it once for all detectors.
+    """
+
+    __slots__ = ('event', 'user_name', 'event_type', 'date', 'timestamp')
+
+    def __init__(self, event, user_name, date, timestamp):
+        self.event = event
+        self.user_name = user_name
+        self.event_type = str(event.get('event_type', '')).lower()
+        self.date = date
+        self.timestamp = timestamp
+
+
+class Finding:
+    """
+    A suspicious pattern reported by a detector.
+
+    Event and user default to those of the event being processed when the
+    finding is raised from process().
+    """
+
+    __slots__ = ('alert_type', 'message', 'event', 'user_name')
+
+    def __init__(self, alert_type, message, event=None, user_name=None):
+        self.alert_type = alert_type
+        self.message = message
+        self.event = event
+        self.user_name = user_name
+
+
+class Detector:
+    """
+    Base class for security detectors.
+
+    Subclasses set `name`, `fields` (event keys that must be present) and
+    `event_types` (lower-case event types to receive, or None for all) and
+    implement process(). Detectors that watch for something *not* happening
+    implement tick(), which the monitor calls periodically. Detectors holding
+    SlidingWindowCounters list them in `windows` so idle keys get swept.
+    Thresholds are read in configure(), which is called again with the new
+    settings when the configuration is reloaded.
+    """
+
+    name = None
+    fields = ()
+    event_types = None
+
+    def __init__(self, config=None, settings=None):
+        """
+        Initialize the detector.
+
+        Args:
+            config: ConfigManager instance (or None)
+            settings: Mapping of [Security] settings
+        """
+        self.config = config
+        self.settings = settings if settings is not None else {}
+        self.windows = []
+
+    def configure(self, settings):
+        """
+        Apply (new) settings without resetting the detector's state.
+
+        Args:
+            settings: Mapping of [Security] settings
+        """
+        self.settings = settings if settings is not None else {}
+
+    def get_int(self, key, default):
+        """Read an integer setting, falling back to a default."""
+        try:
+            return int(self.settings.get(key, default))
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid value for {key}, using default {default}")
+            return default
+
+    def get_float(self, key, default):
+        """Read a float setting, falling back to a default."""
+        try:
+            return float(self.settings.get(key, default))
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid value for {key}, using default {default}")
+            return default
+
+    def accepts(self, event_type):
+        """
+        Check whether events of a type should be dispatched to this detector.
+
+        Args:
+            event_type: Lower-case event type
+
+        Returns:
+            bool: True if the detector handles the event type
+        """
+        return self.event_types is None or event_type in self.event_types
+
+    def process(self, context):
+        """
+        Examine an event.
+
+        Args:
+            context: EventContext for the event
+
+        Returns:
+            list: Findings raised by the event
+        """
+        raise NotImplementedError
+
+    def tick(self, now):
+        """
+        Check for time-based conditions.
+
+        Args:
+            now: Current time in seconds
+
+        Returns:
+            list: Findings raised
+        """
+        return []
+
+    def close(self):
+        """Persist any state before shutdown."""
+
+
+class FailedAttemptsDetector(Detector):
+    """Repeated failed access attempts by one user."""
+
+    name = 'failed_attempts'
+    failure_words = ('failed', 'denied', 'rejected', 'invalid')
+
+    def __init__(self, config=None, settings=None):
+        super().__init__(config, settings)
+        self.window = SlidingWindowCounter(300)
+        self.windows = [self.window]
+        self.configure(self.settings)
+
+    def configure(self, settings):
+        super().configure(settings)
+        self.threshold = self.get_int('failed_attempts_threshold', 3)
+        self.window.window = self.get_int('failed_attempts_window', 300)
+
+    def accepts(self, event_type):
+        return any(word in event_type for word in self.failure_words)
+
+    def process(self, context):
+        recent_failures = self.window.add(context.user_name, context.timestamp)
+        if recent_failures < self.threshold:
+            return []
+
+        message = (f"Security Alert: Multiple failed access attempts detected for {context.user_name}. "
+                   f"{recent_failures} attempts in the last "
+                   f"{self.window.window // 60} minutes.")
+        logger.warning(message)
+        return [Finding(self.name, message)]
+
+
+class UnusualHoursDetector(Detector):
+    """Access during configured quiet hours."""
+
+    name = 'unusual_hours'
+    event_types = UNLOCK_EVENT_TYPES
+
+    def __init__(self, config=None, settings=None):
+        super().__init__(config, settings)
+        self.configure(self.settings)
+
+    def configure(self, settings):
+        super().configure(settings)
+        self.start = self.get_int('unusual_hour_start', 23)
+        self.end = self.get_int('unusual_hour_end', 6)
+
+    def is_unusual_hour(self, date):
+        """Check if a datetime falls within the unusual hours range."""
+        hour = date.hour
+        if self.start > self.end:
+            # Range spans midnight (e.g., 23-6)
+            return hour >= self.start or hour < self.end
+        # Normal range (e.g., 1-5)
+        return self.start <= hour < self.end
+
+    def process(self, context):
+        if not self.is_unusual_hour(context.date):
+            return []
+
+        message = (f"Security Notice: Access during unusual hours by {context.user_name}. "
+                   f"Time: {context.date.strftime('%H:%M:%S')}")
+        logger.info(message)
+        return [Finding(self.name, message)]
+
+
+class BaselineDetector(Detector):
+    """Access at an hour of the week the user rarely uses the lock."""
+
+    name = 'access_baseline'
+    fields = ('lock_id',)
+    event_types = UNLOCK_EVENT_TYPES
+    save_interval = 300
+
+    def __init__(self, config=None, settings=None):
+        super().__init__(config, settings)
+        self.configure(self.settings)
+        data_dir = getattr(config, 'data_dir', None)
+        self.path = os.path.join(data_dir, 'security_baseline.json') if data_dir else None
+        self.dirty = False
+        self._saved = time.monotonic()
+
+        self.baseline = HourOfWeekBaseline.load(self.path) if self.path else None
+        if self.baseline is None:
+            self.baseline = HourOfWeekBaseline(self.get_int('baseline_half_life_days', 28))
+            # First run: learn from the event log if there is one
+            store = EventStore(os.path.join(data_dir, EVENT_LOG_NAME)) if data_dir else None
+            if store is not None and store.exists():
+                trained = self.train(store)
+                logger.info(f"Trained access baseline from {trained} logged events")
+                self.dirty = trained > 0
+
+    def configure(self, settings):
+        # The half-life only applies when a new baseline is built
+        super().configure(settings)
+        self.threshold = self.get_float('baseline_threshold', 0.002)
+        self.min_events = self.get_int('baseline_min_events', 20)
+
+    def train(self, events):
+        """
+        Update the baseline from past events without alerting.
+
+        Args:
+            events: Iterable of event dictionaries, oldest first (may be a stream)
+
+        Returns:
+            int: Number of events learned from
+        """
+        trained = 0
+        for event in events:
+            if str(event.get('event_type', '')).lower() not in UNLOCK_EVENT_TYPES:
+                continue
+            lock_id = event.get('lock_id')
+            date = parse_event_date(event.get('date'))
+            if lock_id is None or date is None:
+                continue
+            key = (event.get('user_name', 'Unknown User'), lock_id)
+            self.baseline.update(key, hour_of_week(date), date.timestamp())
+            trained += 1
+        return trained
+
+    def process(self, context):
+        key = (context.user_name, context.event['lock_id'])
+        hour = hour_of_week(context.date)
+
+        # Score against the history before this access, then learn from it
+        history = self.baseline.weight(key, context.timestamp)
+        probability = self.baseline.probability(key, hour, context.timestamp)
+        self.baseline.update(key, hour, context.timestamp)
+        self.dirty = True
+
+        if history < self.min_events or probability >= self.threshold:
+            return []
+
+        lock_name = context.event.get('lock_name', context.event['lock_id'])
+        message = (f"Security Notice: Unusual access time for {context.user_name} at {lock_name}: "
+                   f"{WEEKDAY_NAMES[context.date.weekday()]} {context.date.strftime('%H:%M')} "
+                   f"({probability:.2%} of their usual accesses).")
+        logger.info(message)
+        return [Finding(self.name, message)]
+
+    def tick(self, now):
+        # Persist the baseline now and then rather than on every event
+        if self.dirty and self.path and time.monotonic() - self._saved >= self.save_interval:
+            self.save()
+        return []
+
+    def close(self):
+        if self.dirty and self.path:
+            self.save()
+
+    def save(self):
+        """Write the baseline to the data directory."""
+        try:
+            self.baseline.save(self.path)
+            self.dirty = False
+            self._saved = time.monotonic()
+        except (IOError, OSError) as e:
+            logger.error(f"Error saving security baseline: {e}")
+
+
+class RapidAccessDetector(Detector):
+    """Many lock/unlock events by one user in a short period."""
+
+    name = 'rapid_access'
+    event_types = UNLOCK_EVENT_TYPES | {'lock'}
+
+    def __init__(self, config=None, settings=None):
+        super().__init__(config, settings)
+        self.window = SlidingWindowCounter(60)
+        self.windows = [self.window]
+        self.configure(self.settings)
+
+    def configure(self, settings):
+        super().configure(settings)
+        self.threshold = self.get_int('rapid_access_threshold', 5)
+        self.window.window = self.get_int('rapid_access_window', 60)
+
+    def process(self, context):
+        recent_access = self.window.add(context.user_name, context.timestamp)
+        if recent_access < self.threshold:
+            return []
+
+        message = (f"Security Notice: Rapid multiple access events detected. "
+                   f"{recent_access} events in the last "
+                   f"{self.window.window // 60} minutes by {context.user_name}.")
+        logger.info(message)
+        return [Finding(self.name, message)]
+
+
+class DoorLeftUnlockedDetector(Detector):
+    """A lock that stays unlocked for longer than a limit."""
+
+    name = 'door_left_unlocked'
+    fields = ('lock_id',)
+    event_types = UNLOCK_EVENT_TYPES | LOCK_EVENT_TYPES | {STATUS_EVENT_TYPE}
+
+    def __init__(self, config=None, settings=None):
+        super().__init__(config, settings)
+        self.tracker = DoorStateTracker(30 * 60)
+        self.configure(self.settings)
+
+    def configure(self, settings):
+        super().configure(settings)
+        self.tracker.set_limit(self.get_int('door_left_unlocked_minutes', 30) * 60)
+
+    def process(self, context):
+        lock_id = context.event['lock_id']
+        if context.event_type == STATUS_EVENT_TYPE:
+            event = context.event
+            self.tracker.update_status(lock_id, context.timestamp, event.get('state'),
+                                       event.get('door_state'), event.get('battery_critical'), context)
+        elif context.event_type == 'unlatch':
+            self.tracker.transition(lock_id, UNLATCHED, context.timestamp, context)
+        elif context.event_type in UNLOCK_EVENT_TYPES:
+            self.tracker.transition(lock_id, UNLOCKED, context.timestamp, context)
+        else:
+            self.tracker.transition(lock_id, LOCKED, context.timestamp, context)
+        return []
+
+    def tick(self, now):
+        findings = []
+        for lock in self.tracker.pop_due(now):
+            context = lock.context
+            lock_name = context.event.get('lock_name', lock.lock_id)
+            minutes = int(now - lock.unlocked_since) // 60
+            if context.event_type == STATUS_EVENT_TYPE:
+                message = (f"Security Notice: {lock_name} has been unlocked for {minutes} minutes "
+                           f"since {context.date.strftime('%H:%M:%S')}.")
+            else:
+                message = (f"Security Notice: {lock_name} has been unlocked for {minutes} minutes "
+                           f"since {context.user_name} unlocked it at {context.date.strftime('%H:%M:%S')}.")
+            if DOOR_STATE_NAMES.get(lock.door_state) == 'open':
+                message += " The door is open."
+            logger.info(message)
+            findings.append(Finding(self.name, message, context.event, context.user_name))
+        return findings
+
+    def get_lock_states(self, now):
+        """
+        Get the tracked state of every lock.
+
+        Args:
+            now: Current time in seconds
+
+        Returns:
+            dict: Lock ID -> state, seconds in the current state, time spent
+                  locked/unlocked/unlatched, door state and battery flag
+        """
+        return {
+            lock_id: {
+                'state': lock.state,
+                'seconds_in_state': now - lock.since if lock.since is not None else None,
+                'durations': {state: lock.duration(state, now) for state in lock.durations},
+                'door_state': DOOR_STATE_NAMES.get(lock.door_state),
+                'battery_critical': lock.battery_critical
+            }
+            for lock_id, lock in self.tracker.locks.items()
+        }
+
+
+class CodeReuseDetector(Detector):
+    """One authorization used on several different locks within a short period."""
+
+    name = 'code_reuse'
+    fields = ('auth_id', 'lock_id')
+    event_types = UNLOCK_EVENT_TYPES
+
+    def __init__(self, config=None, settings=None):
+        super().__init__(config, settings)
+        # auth_id -> deque of (timestamp, lock_id), and per-lock counts within the window
+        self.uses = {}
+        self.lock_counts = {}
+        self.configure(self.settings)
+
+    def configure(self, settings):
+        super().configure(settings)
+        self.threshold = self.get_int('code_reuse_locks', 3)
+        self.window = self.get_int('code_reuse_window', 300)
+
+    def process(self, context):
+        auth_id = context.event['auth_id']
+        lock_id = context.event['lock_id']
+        if auth_id is None:
+            return []
+
+        uses = self.uses.get(auth_id)
+        if uses is None:
+            uses = self.uses[auth_id] = deque()
+            self.lock_counts[auth_id] = {}
+        counts = self.lock_counts[auth_id]
+
+        uses.append((context.timestamp, lock_id))
+        counts[lock_id] = counts.get(lock_id, 0) + 1
+
+        cutoff = context.timestamp - self.window
+        while uses[0][0] <= cutoff:
+            _, old_lock = uses.popleft()
+            counts[old_lock] -= 1
+            if not counts[old_lock]:
+                del counts[old_lock]
+
+        # Alert when this use brings the number of distinct locks up to the threshold
+        if counts[lock_id] != 1 or len(counts) != self.threshold:
+            return []
+
+        message = (f"Security Alert: Access code of {context.user_name} used on "
+                   f"{len(counts)} different locks within {self.window // 60} minutes.")
+        logger.warning(message)
+        return [Finding(self.name, message)]
+
+    def tick(self, now):
+        # Forget authorizations that haven't been used within the window
+        cutoff = now - self.window
+        for auth_id in [a for a, uses in self.uses.items() if uses[-1][0] <= cutoff]:
+            del self.uses[auth_id]
+            del self.lock_counts[auth_id]
+        return []
+
+
+class CrossLockDetector(Detector):
+    """
+    Coordinated activity across locks.
+
+    Raises an alert for failed attempts on several different locks within
+    a short window (whoever made them), and for an access code used on a
+    lock without first being used on the lock that must be passed to get
+    there (e.g. an apartment door opened by a code that never opened the
+    building entrance). Required sequences are configured as
+    `cross_lock_sequence = outer>inner, ...` with lock IDs.
+
+    Both checks use time-bucketed counters keyed by lock and by
+    (auth ID, lock), so each event costs O(1) amortized however long the
+    history is. Reusing one code on several locks is covered by code_reuse.
+    """
+
+    name = 'cross_lock'
+    fields = ('lock_id',)
+    failure_words = FailedAttemptsDetector.failure_words
+
+    def __init__(self, config=None, settings=None):
+        super().__init__(config, settings)
+        self.failures = BucketedCounter(60)
+        self.uses = BucketedCounter(1800)
+        self.configure(self.settings)
+
+    def configure(self, settings):
+        super().configure(settings)
+        self.failure_locks = self.get_int('cross_lock_failure_locks', 3)
+        failure_window = self.get_int('cross_lock_failure_window', 60)
+        sequence_window = self.get_int('cross_lock_sequence_window', 1800)
+        # A changed window only takes effect with fresh buckets
+        if failure_window != self.failures.window:
+            self.failures = BucketedCounter(failure_window)
+        if sequence_window != self.uses.window:
+            self.uses = BucketedCounter(sequence_window)
+        self.windows = [self.failures, self.uses]
+
+        # inner lock ID -> outer lock IDs, any one of which must be used first
+        self.sequence = {}
+        for rule in str(self.settings.get('cross_lock_sequence', '') or '').split(','):
+            outer, sep, inner = rule.partition('>')
+            if not sep or not outer.strip() or not inner.strip():
+                if rule.strip():
+                    logger.warning(f"Invalid cross_lock_sequence rule '{rule.strip()}', expected outer>inner")
+                continue
+            self.sequence.setdefault(inner.strip(), set()).add(outer.strip())
+
+    def accepts(self, event_type):
+        return event_type in UNLOCK_EVENT_TYPES or any(word in event_type for word in self.failure_words)
+
+    def process(self, context):
+        lock_id = str(context.event['lock_id'])
+        if context.event_type not in UNLOCK_EVENT_TYPES:
+            return self._check_failures(lock_id, context.timestamp)
+
+        auth_id = context.event.get('auth_id')
+        if auth_id is None or not self.sequence:
+            return []
+        self.uses.add((auth_id, lock_id), context.timestamp)
+
+        outers = self.sequence.get(lock_id)
+        if not outers or any(self.uses.count((auth_id, outer), context.timestamp) for outer in outers):
+            return []
+
+        lock_name = context.event.get('lock_name', lock_id)
+        message = (f"Security Alert: Access code of {context.user_name} opened {lock_name} without "
+                   f"passing lock {', '.join(sorted(outers))} within {self.uses.window // 60} minutes.")
+        logger.warning(message)
+        return [Finding(self.name, message)]
+
+    def _check_failures(self, lock_id, timestamp):
+        """Alert when a failure brings the number of locks with failures up to the threshold."""
+        if self.failures.add(lock_id, timestamp) != 1 or len(self.failures) != self.failure_locks:
+            return []
+
+        message = (f"Security Alert: Failed access attempts on {len(self.failures)} different locks "
+                   f"within {self.failures.window} seconds.")
+        logger.warning(message)
+        return [Finding(self.name, message)]
+
+
+class TempCodeScheduleDetector(Detector):
+    """A temporary code used outside the period it was issued for."""
+
+    name = 'temp_code_schedule'
+    fields = ('auth_id',)
+    event_types = UNLOCK_EVENT_TYPES
+    refresh_interval = 60
+
+    def __init__(self, config=None, settings=None):
+        super().__init__(config, settings)
+        self.codes_file = None
+        # auth_id -> (name, valid from, valid until) in seconds
+        self.schedules = {}
+        self._mtime = None
+        self._checked = None
+        self.configure(self.settings)
+
+    def configure(self, settings):
+        super().configure(settings)
+        self.grace = self.get_int('temp_code_grace', 300)
+        data_dir = getattr(self.config, 'data_dir', None)
+        codes_file = self.settings.get('temp_codes_file', None)
+        if not codes_file and data_dir:
+            codes_file = os.path.join(data_dir, 'temp_codes.json')
+        if codes_file != self.codes_file:
+            # Load the schedules from the new file on next use
+            self.codes_file = codes_file
+            self._mtime = None
+            self._checked = None
+
+    @staticmethod
+    def _to_timestamp(value):
+        """Convert an ISO date string (naive means local time) to seconds, or None."""
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except (TypeError, ValueError):
+            return None
+
+    def _refresh(self):
+        """Reload the temporary code schedules if the codes file changed."""
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.refresh_interval:
+            return
+        self._checked = now
+
+        try:
+            mtime = os.stat(self.codes_file).st_mtime
+        except (OSError, TypeError):
+            self.schedules = {}
+            return
+        if mtime == self._mtime:
+            return
+
+        try:
+            with open(self.codes_file, 'r') as f:
+                codes = json.load(f)
+        except (IOError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading temporary codes: {e}")
+            return
+
+        schedules = {}
+        for data in codes.values():
+            auth_id = data.get('auth_id')
+            if auth_id is None:
+                continue
+            schedules[str(auth_id)] = (data.get('name', 'Temporary code'),
+                                       self._to_timestamp(data.get('created_at')),
+                                       self._to_timestamp(data.get('expiry')))
+        self.schedules = schedules
+        self._mtime = mtime
+
+    def process(self, context):
+        self._refresh()
+        schedule = self.schedules.get(str(context.event['auth_id']))
+        if schedule is None:
+            return []
+
+        name, valid_from, valid_until = schedule
+        ts = context.timestamp
+        if valid_from is not None and ts < valid_from - self.grace:
+            when = 'before it was issued'
+        elif valid_until is not None and ts > valid_until + self.grace:
+            when = 'after it expired'
+        else:
+            return []
+
+        message = (f"Security Alert: Temporary code '{name}' used {when}. "
+                   f"Time: {context.date.strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.warning(message)
+        return [Finding(self.name, message)]
+
+
+BUILTIN_DETECTORS = {
+    detector.name: detector
+    for detector in (FailedAttemptsDetector, UnusualHoursDetector, BaselineDetector, RapidAccessDetector,
+                     DoorLeftUnlockedDetector, CodeReuseDetector, CrossLockDetector,
+                     TempCodeScheduleDetector)
+}
+
+
+def load_detector_class(spec):
+    """
+    Import a detector class from a 'module:Class' spec.
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    module_name, _, class_name = spec.partition(':')
+    if not class_name:
+        raise ValueError(f"Invalid detector spec '{spec}', expected 'module:Class'")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class DetectorStats:
+    """
+    Per-detector counters.
+    """
+
+    __slots__ = ('events', 'alerts', 'seconds')
+
+    def __init__(self):
+        self.events = 0
+        self.alerts = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {
+            'events': self.events,
+            'alerts': self.alerts,
+            'total_ms': round(self.seconds * 1e3, 3),
+            'mean_us': round(self.seconds / self.events * 1e6, 3) if self.events else 0.0
+        }
+
+
+class DetectorPipeline:
+    """
+    Runs events through an ordered list of detectors.
+    """
+
+    def __init__(self, detectors):
+        """
+        Initialize the pipeline.
+
+        Args:
+            detectors: Detector instances, in the order they should run
+        """
+        self.detectors = list(detectors)
+        self.stats = {detector.name: DetectorStats() for detector in self.detectors}
+        # event type -> detectors accepting it, built on first sight of each type
+        self._routes = {}
+
+    @staticmethod
+    def _read_config(config):
+        """
+        Read the detector settings, classes and order from the config.
+
+        Args:
+            config: ConfigManager instance (uses its `config` parser if present)
+
+        Returns:
+            tuple: ([Security] settings, name -> detector class, detector names in order)
+        """
+        parser = getattr(config, 'config', None)
+        has_section = hasattr(parser, 'has_section')
+        settings = parser['Security'] if has_section and parser.has_section('Security') else {}
+
+        classes = dict(BUILTIN_DETECTORS)
+        if has_section and parser.has_section('Detectors'):
+            for name, spec in parser['Detectors'].items():
+                try:
+                    classes[name] = load_detector_class(spec)
+                except (ImportError, AttributeError, ValueError) as e:
+                    logger.error(f"Error loading detector {name} from {spec}: {e}")
+
+        names = settings.get('detectors', None) if settings else None
+        names = [n.strip() for n in names.split(',') if n.strip()] if names else DEFAULT_DETECTORS
+        return settings, classes, names
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Build the pipeline from the [Security] and [Detectors] config sections.
+
+        Args:
+            config: ConfigManager instance (uses its `config` parser if present)
+
+        Returns:
+            DetectorPipeline: Pipeline with the configured detectors
+        """
+        pipeline = cls([])
+        pipeline.reconfigure(config)
+        return pipeline
+
+    def reconfigure(self, config):
+        """
+        Apply the current config to the pipeline.
+
+        Detectors that stay in the pipeline are reconfigured in place and keep
+        their windows and other state; new detectors are created and removed
+        ones are closed. The new detector list replaces the old one in a
+        single assignment, so events are never routed through a mix of both.
+
+        Args:
+            config: ConfigManager instance (uses its `config` parser if present)
+        """
+        settings, classes, names = self._read_config(config)
+        current = {detector.name: detector for detector in self.detectors}
+
+        detectors = []
+        for name in names:
+            if name not in classes:
+                logger.error(f"Unknown security detector: {name}")
+                continue
+            detector = current.pop(name, None)
+            if detector is not None and type(detector) is classes[name]:
+                detector.configure(settings)
+            else:
+                if detector is not None:
+                    current[name] = detector
+                detector = classes[name](config, settings)
+                detector.name = name
+            detectors.append(detector)
+
+        # Detectors no longer configured get to persist their state
+        for detector in current.values():
+            try:
+                detector.close()
+            except Exception as e:
+                logger.error(f"Error closing security detector {detector.name}: {e}")
+
+        self.detectors, self._routes = detectors, {}
+        self.stats = {detector.name: self.stats.get(detector.name) or DetectorStats()
+                      for detector in detectors}
+        logger.info(f"Security detectors: {', '.join(d.name for d in detectors)}")
+
+    def get(self, name):
+        """Get a detector by name, or None."""
+        for detector in self.detectors:
+            if detector.name == name:
+                return detector
+        return None
+
+    @property
+    def windows(self):
+        """All sliding windows held by the detectors."""
+        return [window for detector in self.detectors for window in detector.windows]
+
+    def route(self, event_type):
+        """
+        Get the detectors that handle an event type.
+
+        Args:
+            event_type: Lower-case event type
+
+        Returns:
+            list: Detectors in pipeline order
+        """
+        detectors = self._routes.get(event_type)
+        if detectors is None:
+            detectors = self._routes[event_type] = [d for d in self.detectors if d.accepts(event_type)]
+        return detectors
+
+    def process(self, context):
+        """
+        Dispatch an event to the detectors that handle it.
+
+        Args:
+            context: EventContext for the event
+
+        Returns:
+            list: Findings, with event and user filled in
+        """
+        findings = []
+        event = context.event
+        for detector in self.route(context.event_type):
+            if detector.fields and not all(event.get(field) is not None for field in detector.fields):
+                continue
+            stats = self.stats[detector.name]
+            started = time.perf_counter()
+            try:
+                raised = detector.process(context)
+            except Exception as e:
+                logger.error(f"Error in security detector {detector.name}: {e}")
+                raised = []
+            stats.seconds += time.perf_counter() - started
+            stats.events += 1
+            stats.alerts += len(raised)
+            for finding in raised:
+                if finding.event is None:
+                    finding.event = event
+                if finding.user_name is None:
+                    finding.user_name = context.user_name
+                findings.append(finding)
+        return findings
+
+    def tick(self, now):
+        """
+        Run the time-based checks of all detectors.
+
+        Args:
+            now: Current time in seconds
+
+        Returns:
+            list: Findings raised
+        """
+        findings = []
+        for detector in self.detectors:
+            try:
+                raised = detector.tick(now)
+            except Exception as e:
+                logger.error(f"Error in security detector {detector.name}: {e}")
+                continue
+            self.stats[detector.name].alerts += len(raised)
+            findings.extend(raised)
+        return findings
+
+    def close(self):
+        """Let every detector persist its state."""
+        for detector in self.detectors:
+            try:
+                detector.close()
+            except Exception as e:
+                logger.error(f"Error closing security detector {detector.name}: {e}")
+
+    def get_stats(self):
+        """
+        Get per-detector statistics.
+
+        Returns:
+            dict: Detector name -> events, alerts, total_ms and mean_us, in pipeline order
+        """
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
@@ -0,0 +1,230 @@
+"""
+Door State Tracking for Nuki Security Monitoring
+
+Keeps a small state machine per lock, fed by lock/unlock events and by the
+lock status the main monitor reads from the Nuki API (`state`,
+`doorState`, `batteryCritical`). Each lock records how long it has spent
+locked, unlocked and unlatched.
+
+Deadlines such as "unlocked for more than N minutes" live in one timer
+heap shared by all locks, so checking for due timers costs O(log n) per
+timer that fires instead of a scan over every lock. Cancelled timers are
+left in the heap and skipped when popped; the heap is compacted when they
+pile up.
+"""
+
+import heapq
+
+LOCKED = 'locked'
+UNLOCKED = 'unlocked'
+UNLATCHED = 'unlatched'
+
+STATES = (LOCKED, UNLOCKED, UNLATCHED)
+
+# Nuki lock state codes with a settled state; transitions (unlocking,
+# locking, unlatching) and errors leave the tracked state unchanged
+LOCK_STATE_CODES = {
+    1: LOCKED,
+    3: UNLOCKED,
+    5: UNLATCHED,
+    6: UNLOCKED     # unlocked (lock 'n' go)
+}
+
+# Nuki door sensor state codes
+DOOR_STATE_NAMES = {
+    0: 'unavailable',
+    1: 'deactivated',
+    2: 'closed',
+    3: 'open',
+    4: 'unknown',
+    5: 'calibrating',
+    16: 'uncalibrated',
+    240: 'removed',
+    255: 'unknown'
+}
+
+
+class LockState:
+    """
+    Tracked state of one lock.
+    """
+
+    __slots__ = ('lock_id', 'state', 'since', 'durations', 'door_state', 'battery_critical',
+                 'unlocked_since', 'context', 'timer')
+
+    def __init__(self, lock_id):
+        self.lock_id = lock_id
+        self.state = None
+        self.since = None
+        # Seconds spent in each state before the current one
+        self.durations = dict.fromkeys(STATES, 0.0)
+        self.door_state = None
+        self.battery_critical = None
+        # When the lock last went from locked to unlocked/unlatched, and the event that did it
+        self.unlocked_since = None
+        self.context = None
+        # Generation of the armed timer, None if no timer is armed
+        self.timer = None
+
+    def duration(self, state, now):
+        """
+        Get the total time spent in a state.
+
+        Args:
+            state: LOCKED, UNLOCKED or UNLATCHED
+            now: Current time in seconds
+
+        Returns:
+            float: Seconds spent in the state, including the current stretch
+        """
+        total = self.durations.get(state, 0.0)
+        if state == self.state and self.since is not None:
+            total += max(0.0, now - self.since)
+        return total
+
+
+class DoorStateTracker:
+    """
+    Per-lock state machines with a shared timer heap.
+    """
+
+    def __init__(self, limit):
+        """
+        Initialize the tracker.
+
+        Args:
+            limit: Seconds a lock may stay unlocked or unlatched before its timer fires
+        """
+        self.limit = limit
+        self.locks = {}
+        # (deadline, generation, lock_id), min-heap on the deadline
+        self.timers = []
+        self._generation = 0
+        self._cancelled = 0
+
+    def __len__(self):
+        return len(self.locks)
+
+    def get(self, lock_id):
+        """Get the state of a lock, or None if it hasn't been seen."""
+        return self.locks.get(lock_id)
+
+    def transition(self, lock_id, state, timestamp, context=None):
+        """
+        Move a lock to a new state.
+
+        Going from locked (or unknown) to unlocked or unlatched arms the
+        lock's timer; locking cancels it. Moving between unlocked and
+        unlatched keeps the running timer.
+
+        Args:
+            lock_id: Lock ID
+            state: LOCKED, UNLOCKED or UNLATCHED
+            timestamp: Time of the change in seconds
+            context: Event that caused the change, reported when the timer fires
+        """
+        lock = self.locks.get(lock_id)
+        if lock is None:
+            lock = self.locks[lock_id] = LockState(lock_id)
+
+        if lock.since is not None:
+            # Events may arrive slightly out of order; never count negative time
+            timestamp = max(timestamp, lock.since)
+        if lock.state == state:
+            return
+
+        if lock.state is not None:
+            lock.durations[lock.state] += timestamp - lock.since
+        lock.state = state
+        lock.since = timestamp
+
+        if state == LOCKED:
+            lock.unlocked_since = None
+            lock.context = None
+            self._cancel(lock)
+        elif lock.unlocked_since is None:
+            lock.unlocked_since = timestamp
+            lock.context = context
+            self._arm(lock, timestamp + self.limit)
+
+    def update_status(self, lock_id, timestamp, state=None, door_state=None, battery_critical=None,
+                      context=None):
+        """
+        Apply a lock status reading.
+
+        Args:
+            lock_id: Lock ID
+            timestamp: Time of the reading in seconds
+            state: Nuki lock state code, or None
+            door_state: Nuki door sensor state code, or None
+            battery_critical: Battery critical flag, or None
+            context: Event carrying the reading
+        """
+        if state in LOCK_STATE_CODES:
+            self.transition(lock_id, LOCK_STATE_CODES[state], timestamp, context)
+        lock = self.locks.get(lock_id)
+        if lock is None:
+            lock = self.locks[lock_id] = LockState(lock_id)
+        if door_state is not None:
+            lock.door_state = door_state
+        if battery_critical is not None:
+            lock.battery_critical = bool(battery_critical)
+
+    def _arm(self, lock, deadline):
+        if lock.timer is not None:
+            self._cancelled += 1
+        self._generation += 1
+        lock.timer = self._generation
+        heapq.heappush(self.timers, (deadline, self._generation, lock.lock_id))
+
+    def _cancel(self, lock):
+        if lock.timer is None:
+            return
+        lock.timer = None
+        self._cancelled += 1
+        # Drop cancelled timers once they make up most of the heap
+        if self._cancelled > 64 and self._cancelled * 2 > len(self.timers):
+            self.timers = [(deadline, generation, lock_id) for deadline, generation, lock_id in self.timers
+                           if self.locks[lock_id].timer == generation]
+            heapq.heapify(self.timers)
+            self._cancelled = 0
+
+    def set_limit(self, limit):
+        """
+        Change the unlocked limit, rescheduling the armed timers.
+
+        Args:
+            limit: Seconds a lock may stay unlocked or unlatched
+        """
+        if limit == self.limit:
+            return
+        self.limit = limit
+        self.timers = []
+        self._cancelled = 0
+        for lock in self.locks.values():
+            if lock.timer is not None:
+                lock.timer = None
+                self._arm(lock, lock.unlocked_since + limit)
+
+    def pop_due(self, now):
+        """
+        Remove and return the locks whose timer is due.
+
+        Args:
+            now: Current time in seconds
+
+        Returns:
+            list: LockState of every lock whose timer fired, in deadline order
+        """
+        due = []
+        timers = self.timers
+        while timers and timers[0][0] <= now:
+            _, generation, lock_id = heapq.heappop(timers)
+            lock = self.locks[lock_id]
+            if lock.timer != generation:
+                self._cancelled -= 1
+                continue
+            # Fires once per unlock; locking and unlocking again re-arms it
+            lock.timer = None
+            due.append(lock)
+        return due
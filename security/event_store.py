@@ -0,0 +1,74 @@
+"""
+Event Log for Nuki Security Monitoring
+
+An append-only JSON-lines file of the events the security monitor has
+processed. Reading is a streaming pass, one line at a time, so history can
+be replayed (e.g. to train baselines) without loading it all into memory.
+"""
+
+import os
+import json
+import logging
+
+logger = logging.getLogger('nuki_security')
+
+# File name of the event log in the data directory
+EVENT_LOG_NAME = 'security_events.jsonl'
+
+
+class EventStore:
+    """
+    Append-only JSON-lines event log.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the store.
+
+        Args:
+            path: Path of the log file
+        """
+        self.path = path
+        self._file = None
+
+    def exists(self):
+        """Check whether the log file exists."""
+        return os.path.exists(self.path)
+
+    def append(self, event):
+        """
+        Append an event to the log.
+
+        Args:
+            event: Event dictionary
+        """
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps(event, separators=(',', ':'), default=str) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """Close the log file if open."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __iter__(self):
+        """
+        Stream the events in the log, oldest first.
+
+        Lines that can't be parsed (e.g. a partial last line) are skipped.
+        """
+        try:
+            f = open(self.path, 'r')
+        except FileNotFoundError:
+            return
+        with f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping invalid line {number} in {self.path}")
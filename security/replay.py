@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Security Rule Replay for Nuki Smart Lock
+
+Streams a recorded event history through SecurityMonitor to show which
+alerts the current (or proposed) settings would have raised. Time is
+simulated from the event dates: detector windows, periodic cleanup and
+time-based checks such as a door left unlocked all run on event time.
+
+Replays are offline: alerts are collected in memory, nothing is delivered
+through the alert callback, written to the alert log or added to the event
+log, and no baseline is loaded or saved.
+
+Usage:
+    python security/replay.py [events.jsonl] [--config config.ini] [--set key=value ...]
+
+Without an events file the local event log (data/security_events.jsonl) is
+replayed. Use '-' to read JSON lines from stdin.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import configparser
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Add parent directory (for security.*) and scripts directory (for nuki.*) to path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (parent_dir, os.path.join(parent_dir, 'scripts')):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from security.security_monitor import SecurityMonitor
+from security.detectors import parse_event_date
+from security.event_store import EventStore, EVENT_LOG_NAME
+
+
+class ReplayMonitor(SecurityMonitor):
+    """
+    SecurityMonitor that runs on simulated time and keeps alerts in memory.
+    """
+
+    def __init__(self, config_manager):
+        """
+        Initialize the replay monitor.
+
+        Args:
+            config_manager: Object with a `config` parser holding [Security] settings
+        """
+        self.alerts = []
+        self.sim_time = datetime.fromtimestamp(0, timezone.utc)
+        super().__init__(config_manager, alert_callback=None, clock=lambda: self.sim_time)
+
+    def _save_alert(self, alert_data):
+        """Record the alert instead of writing it to the alert log."""
+        self.alerts.append(alert_data)
+
+
+def load_settings(config_path=None, overrides=()):
+    """
+    Build the settings parser for a replay.
+
+    Args:
+        config_path: INI file to read [Security] and [Detectors] from, or None
+        overrides: 'key=value' strings overriding [Security] settings
+
+    Returns:
+        ConfigParser: Parser with the replay settings
+
+    Raises:
+        ValueError: If an override isn't in key=value form
+    """
+    parser = configparser.ConfigParser()
+    if config_path:
+        parser.read(config_path)
+    if not parser.has_section('Security'):
+        parser.add_section('Security')
+
+    for override in overrides:
+        key, sep, value = override.partition('=')
+        if not sep or not key.strip():
+            raise ValueError(f"Invalid setting '{override}', expected key=value")
+        parser.set('Security', key.strip(), value.strip())
+
+    # A replay must not append the replayed events to the event log
+    parser.set('Security', 'event_log', 'false')
+    return parser
+
+
+def read_events(source):
+    """
+    Stream events from a JSON-lines file, or stdin for '-'.
+
+    Args:
+        source: Path or '-'
+
+    Yields:
+        dict: Events in file order
+    """
+    if source != '-':
+        yield from EventStore(source)
+        return
+    for line in sys.stdin:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def replay(monitor, events, tick_interval=60):
+    """
+    Stream events through a replay monitor.
+
+    Time-based checks run every `tick_interval` seconds of event time, so an
+    alert such as a door left unlocked fires at the tick where it would have
+    fired live.
+
+    Args:
+        monitor: ReplayMonitor to run
+        events: Iterable of events, oldest first
+        tick_interval: Seconds of event time between time-based checks
+
+    Returns:
+        dict: Counts of processed and skipped events and elapsed seconds
+    """
+    processed = 0
+    skipped = 0
+    next_tick = None
+    started = time.perf_counter()
+
+    for event in events:
+        date = parse_event_date(event.get('date'))
+        if date is None:
+            skipped += 1
+            continue
+        timestamp = date.timestamp()
+
+        # Catch up on time-based checks due before this event
+        if next_tick is None:
+            next_tick = timestamp + tick_interval
+        while timestamp >= next_tick:
+            monitor.sim_time = datetime.fromtimestamp(next_tick, timezone.utc)
+            monitor.check_timers(next_tick)
+            next_tick += tick_interval
+
+        monitor.sim_time = date
+        monitor.process_event(event)
+        processed += 1
+
+    return {
+        'processed': processed,
+        'skipped': skipped,
+        'seconds': time.perf_counter() - started
+    }
+
+
+def main():
+    """Run a replay from the command line."""
+    default_events = os.path.join(os.environ.get('DATA_DIR', os.path.join(parent_dir, 'data')), EVENT_LOG_NAME)
+    default_config = os.path.join(parent_dir, 'config', 'config.ini')
+
+    parser = argparse.ArgumentParser(description='Replay recorded events through the security detectors')
+    parser.add_argument('events', nargs='?', default=default_events,
+                        help='Event history as JSON lines, or - for stdin (default: the local event log)')
+    parser.add_argument('--config', default=default_config if os.path.exists(default_config) else None,
+                        help='INI file with [Security] settings (default: config/config.ini if present)')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='Override a [Security] setting, e.g. --set rapid_access_threshold=8')
+    parser.add_argument('--temp-codes', help='temp_codes.json to check temporary code schedules against')
+    parser.add_argument('--tick', type=int, default=60, help='Seconds of event time between time-based checks')
+    parser.add_argument('--json', action='store_true', help='Print alerts and summary as JSON')
+    parser.add_argument('--quiet', action='store_true', help='Only print the summary')
+    parser.add_argument('--verbose', action='store_true', help='Log each alert as it fires')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger('nuki_security').setLevel(logging.ERROR)
+
+    if args.events != '-' and not os.path.exists(args.events):
+        parser.error(f"Event history not found: {args.events}")
+
+    try:
+        settings = load_settings(args.config, args.set)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.temp_codes:
+        settings.set('Security', 'temp_codes_file', args.temp_codes)
+
+    # No data directory: nothing is read from or written to the live state
+    monitor = ReplayMonitor(SimpleNamespace(config=settings, data_dir=None))
+    result = replay(monitor, read_events(args.events), args.tick)
+
+    rate = result['processed'] / result['seconds'] if result['seconds'] > 0 else 0.0
+    by_type = Counter(alert['type'] for alert in monitor.alerts)
+    summary = {
+        'events': result['processed'],
+        'skipped': result['skipped'],
+        'alerts': len(monitor.alerts),
+        'alerts_by_type': dict(by_type),
+        'seconds': round(result['seconds'], 3),
+        'events_per_second': round(rate, 1),
+        'detectors': monitor.get_detector_stats()
+    }
+
+    if args.json:
+        output = {'summary': summary}
+        if not args.quiet:
+            output['alerts'] = monitor.alerts
+        print(json.dumps(output, indent=2, default=str))
+        return
+
+    if not args.quiet:
+        for alert in monitor.alerts:
+            print(f"{alert['timestamp']}  {alert['type']:<20} {alert['user']}: {alert['message']}")
+        if monitor.alerts:
+            print()
+
+    print(f"Replayed {result['processed']} events ({result['skipped']} skipped) in "
+          f"{result['seconds']:.2f}s - {rate:,.0f} events/sec")
+    print(f"Alerts: {len(monitor.alerts)}")
+    for alert_type, count in by_type.most_common():
+        print(f"  {alert_type:<22}{count:>8}")
+    print("Detectors:")
+    for name, stats in summary['detectors'].items():
+        print(f"  {name:<22}{stats['events']:>8} events {stats['alerts']:>6} alerts {stats['mean_us']:>9.2f} us/event")
+
+
+if __name__ == "__main__":
+    main()
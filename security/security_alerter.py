@@ -10,25 +10,36 @@ import os
 import sys
 import logging
 import json
+import time
 from datetime import datetime
 
-# Add parent directory to path
+# Add parent directory (for security.*) and scripts directory (for nuki.*) to path
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-if parent_dir not in sys.path:
-    sys.path.append(parent_dir)
+for path in (parent_dir, os.path.join(parent_dir, 'scripts')):
+    if path not in sys.path:
+        sys.path.append(path)
 
 # Import from main Nuki modules
 from nuki.config import ConfigManager
 from nuki.notification import Notifier
+from nuki.dispatch import Notification
+from nuki.channels import parse_channels
+from security.suppression import AlertSuppressor
+
+# Set up logging with fallback to console if file logging fails
+log_handlers = []
+try:
+    logs_dir = os.environ.get('LOGS_DIR', os.path.expanduser("~/nukiweb/logs"))
+    os.makedirs(logs_dir, exist_ok=True)
+    log_handlers.append(logging.FileHandler(os.path.join(logs_dir, "nuki_security_alerts.log")))
+except (PermissionError, IOError) as e:
+    print(f"WARNING: Could not set up file logging: {e}")
+log_handlers.append(logging.StreamHandler())
 
-# Set up logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.expanduser("~/nukiweb/logs/nuki_security_alerts.log")),
-        logging.StreamHandler()
-    ]
+    handlers=log_handlers
 )
 logger = logging.getLogger('nuki_security_alerts')
 
@@ -56,6 +67,9 @@ class SecurityAlerter:
         # Load alert settings
         self._load_alert_settings()
         
+        # Suppress repeats of the same alert
+        self.suppressor = AlertSuppressor(self.suppression_window, self.suppression_max_entries)
+        
         logger.info("Security Alerter initialized")
     
     def _load_alert_settings(self):
@@ -65,6 +79,8 @@ class SecurityAlerter:
         self.alert_sound = True
         self.notify_owner_only = True
         self.include_evidence = True
+        self.suppression_window = 300      # 5 minutes
+        self.suppression_max_entries = 1000
         
         # Try to load from config
         if hasattr(self.config, 'config') and 'Security' in self.config.config:
@@ -73,22 +89,91 @@ class SecurityAlerter:
             self.alert_sound = security_config.getboolean('alert_sound', True)
             self.notify_owner_only = security_config.getboolean('notify_owner_only', True)
             self.include_evidence = security_config.getboolean('include_evidence', True)
+            self.suppression_window = security_config.getint('alert_suppression_window', 300)
+            self.suppression_max_entries = security_config.getint('alert_suppression_max_entries', 1000)
         
         logger.info(f"Alert settings loaded: priority={self.alert_priority}, "
                    f"sound={self.alert_sound}, owner_only={self.notify_owner_only}")
     
-    def send_alert(self, alert_data):
+    def reload(self):
+        """
+        Apply changed alert and notification settings.
+        
+        The config manager is expected to have re-read its files already.
+        Alerts currently being suppressed stay suppressed.
+        """
+        self._load_alert_settings()
+        self.suppressor.window = self.suppression_window
+        self.suppressor.max_entries = self.suppression_max_entries
+        
+        # Channels and recipients are compiled when the notifier is created
+        self.notifier = Notifier(self.config)
+    
+    def send_alert(self, alert_data, now=None):
+        """
+        Send a security alert notification, unless it repeats a recent one.
+        
+        Repeats of an alert (same type, user and lock) within the suppression
+        window are counted instead of sent; the count goes out with the next
+        alert sent for it, or from flush() once the window has passed.
+        
+        Args:
+            alert_data: Dictionary containing alert information
+            now: Current time in seconds, defaults to the wall clock
+        
+        Returns:
+            bool: True if alert was sent successfully or suppressed as a repeat
+        """
+        if now is None:
+            now = time.time()
+        
+        send, suppressed = self.suppressor.check(alert_data, now)
+        if not send:
+            logger.info(f"Suppressed repeat security alert: {alert_data.get('message', 'Security Alert')}")
+            return True
+        
+        return self._send_alert(alert_data, suppressed)
+    
+    def flush(self, now=None):
+        """
+        Send summaries of suppressed repeats whose window has passed.
+        
+        Args:
+            now: Current time in seconds, defaults to the wall clock
+        
+        Returns:
+            int: Number of summaries sent
+        """
+        if now is None:
+            now = time.time()
+        
+        summaries = self.suppressor.expire(now)
+        for alert_data, suppressed in summaries:
+            self._send_alert(alert_data, suppressed)
+        return len(summaries)
+    
+    def _describe_window(self):
+        """Describe the suppression window for alert messages."""
+        if self.suppression_window % 60 == 0:
+            minutes = self.suppression_window // 60
+            return f"{minutes} minutes" if minutes != 1 else "minute"
+        return f"{self.suppression_window} seconds"
+    
+    def _send_alert(self, alert_data, suppressed=0):
         """
         Send a security alert notification.
         
         Args:
             alert_data: Dictionary containing alert information
+            suppressed: Number of repeats held back since the last one was sent
         
         Returns:
             bool: True if alert was sent successfully
         """
         # Extract alert details
         message = alert_data.get('message', 'Security Alert')
+        if suppressed:
+            message = f"{message} ({suppressed} more in the last {self._describe_window()})"
         alert_type = alert_data.get('type', 'unknown')
         event = alert_data.get('event', {})
         user = alert_data.get('user', 'Unknown User')
@@ -110,7 +195,8 @@ class SecurityAlerter:
             'trigger': event.get('trigger', ''),
             'message': message,
             'priority': self.alert_priority,
-            'security_alert': True
+            'security_alert': True,
+            'suppressed_count': suppressed
         }
         
         # Send notification
@@ -128,33 +214,38 @@ class SecurityAlerter:
             bool: True if notification was sent successfully
         """
         try:
-            # Create email body with security formatting
-            email_body = self._create_security_email(data)
-            
-            # Create Telegram message with security formatting
-            telegram_msg = self._create_security_telegram(data)
+            # Email and Telegram get security formatting; webhook and MQTT get the raw data
+            notification = Notification(
+                'security',
+                subject,
+                data=data,
+                renderer=self._render_security_notification
+            )
             
             # Determine recipients
             recipients = self._get_security_recipients()
             
-            # Send through normal notification channels with security formatting
-            success = True
-            
-            # Send email
-            if self.config.notification_type in ['email', 'both']:
-                email_success = self.notifier.send_email(subject, email_body, recipients.get('email', None))
-                success = success and email_success
-            
-            # Send Telegram
-            if self.config.notification_type in ['telegram', 'both']:
-                telegram_success = self.notifier.send_telegram(telegram_msg, recipients.get('telegram', None))
-                success = success and telegram_success
-            
-            return success
+            # Send through the normal notification channels
+            return self.notifier.send(notification, recipients)
         except Exception as e:
             logger.error(f"Error sending security notification: {e}")
             return False
     
+    def _render_security_notification(self, notification, fmt):
+        """
+        Render a security notification for a channel format.
+        
+        Args:
+            notification: Security Notification
+            fmt: Channel format ('email' or 'telegram')
+            
+        Returns:
+            str: Rendered message
+        """
+        if fmt == 'email':
+            return self._create_security_email(notification.data)
+        return self._create_security_telegram(notification.data)
+    
     def _create_security_email(self, data):
         """
         Create HTML email body for security alert.
@@ -165,71 +256,11 @@ class SecurityAlerter:
         Returns:
             str: HTML email body
         """
-        # Create security-themed HTML
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; }}
-                .container {{ padding: 20px; }}
-                .security-alert {{ 
-                    border-left: 5px solid #ff0000; 
-                    background-color: #fff8f8;
-                    padding: 15px;
-                    margin-bottom: 20px;
-                }}
-                .label {{ font-weight: bold; color: #cc0000; }}
-                .evidence {{ 
-                    background-color: #f5f5f5; 
-                    padding: 10px; 
-                    border: 1px solid #ddd;
-                    margin-top: 20px;
-                }}
-                .warning-icon {{
-                    font-size: 48px;
-                    color: #cc0000;
-                    margin-bottom: 15px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="security-alert">
-                    <div class="warning-icon">⚠️</div>
-                    <h2>Security Alert</h2>
-                    <p><strong>{data.get('message')}</strong></p>
-                    
-                    <div class="alert-details">
-                        <p><span class="label">Alert Type:</span> {data.get('event_type')}</p>
-                        <p><span class="label">Lock:</span> {data.get('lock_name')}</p>
-                        <p><span class="label">User:</span> {data.get('user_name')}</p>
-                        <p><span class="label">Time:</span> {data.get('date')}</p>
-                    </div>
-        """
-        
-        # Add evidence section if enabled
-        if self.include_evidence:
-            html += f"""
-                    <div class="evidence">
-                        <h3>Additional Details</h3>
-                        <p><span class="label">Lock ID:</span> {data.get('lock_id')}</p>
-                        <p><span class="label">Trigger:</span> {data.get('trigger')}</p>
-                        <p><span class="label">Priority:</span> {data.get('priority', 'high')}</p>
-                    </div>
-            """
-        
-        # Complete HTML
-        html += """
-                </div>
-                
-                <p>This is an automated security alert from your Nuki Smart Lock system.</p>
-                <p>Please investigate this activity promptly if it was not expected.</p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return html
+        return self.notifier.templates.render(
+            'security_email.html',
+            data=data,
+            include_evidence=self.include_evidence
+        )
     
     def _create_security_telegram(self, data):
         """
@@ -241,39 +272,21 @@ class SecurityAlerter:
         Returns:
             str: Formatted Telegram message
         """
-        # Create security-themed message with emoji
-        message = f"""🚨 *SECURITY ALERT* 🚨
-
-*{data.get('message')}*
-
-🔐 Lock: {data.get('lock_name')}
-👤 User: {data.get('user_name')}
-🕒 Time: {data.get('date')}
-⚠️ Alert Type: {data.get('event_type').replace('SECURITY: ', '')}
-"""
-        
-        # Add evidence if enabled
-        if self.include_evidence:
-            message += f"""
-📋 Additional Details:
-  • Trigger: {data.get('trigger')}
-  • Priority: {data.get('priority', 'high')}
-"""
-            
-        # Add footer
-        message += """
-⚠️ Please investigate this activity promptly if it was not expected.
-"""
-        
-        return message
+        return self.notifier.templates.render(
+            'security_telegram.txt',
+            data=data,
+            include_evidence=self.include_evidence
+        )
     
     def _get_security_recipients(self):
         """
         Get recipients for security notifications.
         
         Returns:
-            dict: Dictionary with email and telegram recipients
+            dict: Dictionary of channel name -> list of addresses
         """
+        registry = self.notifier.recipients
+        
         # If notify_owner_only is True, only send to owner email/chat
         if self.notify_owner_only:
             # Try to get owner email from config
@@ -291,16 +304,22 @@ class SecurityAlerter:
             
             if not owner_chat_id:
                 owner_chat_id = self.config.telegram_chat_id
-                
-            return {
-                'email': owner_email,
-                'telegram': owner_chat_id
-            }
+            
+            # Other channels (webhook, MQTT) go to the default recipient's endpoints
+            default = registry.get('default')
+            owner = {'email': owner_email, 'telegram': owner_chat_id}
+            recipients = {}
+            for channel in parse_channels(self.config.notification_type):
+                if channel in owner:
+                    recipients[channel] = [owner[channel]]
+                else:
+                    recipients[channel] = [default.address(channel)] if default else []
+            return recipients
         else:
-            # Use normal notification recipients
+            # Fan out to every configured recipient on each channel
             return {
-                'email': None,  # None means use default recipient
-                'telegram': None
+                channel: registry.addresses(registry.all_mask, channel)
+                for channel in registry.channels
             }
 
 # Example usage when run directly
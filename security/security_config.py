@@ -10,19 +10,28 @@ import sys
 import logging
 import configparser
 
-# Add parent directory to path
+# Add parent directory (for security.*) and scripts directory (for nuki.*) to path
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-if parent_dir not in sys.path:
-    sys.path.append(parent_dir)
+for path in (parent_dir, os.path.join(parent_dir, 'scripts')):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from security.detectors import DEFAULT_DETECTORS
+
+# Set up logging with fallback to console if file logging fails
+log_handlers = []
+try:
+    logs_dir = os.environ.get('LOGS_DIR', os.path.expanduser("~/nukiweb/logs"))
+    os.makedirs(logs_dir, exist_ok=True)
+    log_handlers.append(logging.FileHandler(os.path.join(logs_dir, "nuki_security_config.log")))
+except (PermissionError, IOError) as e:
+    print(f"WARNING: Could not set up file logging: {e}")
+log_handlers.append(logging.StreamHandler())
 
-# Set up logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.expanduser("~/nukiweb/logs/nuki_security_config.log")),
-        logging.StreamHandler()
-    ]
+    handlers=log_handlers
 )
 logger = logging.getLogger('nuki_security_config')
 
@@ -121,12 +130,31 @@ class SecurityConfigManager:
         config.set('Security', 'unusual_hour_end', '6')
         config.set('Security', 'rapid_access_threshold', '5')
         config.set('Security', 'rapid_access_window', '60')
+        config.set('Security', 'cleanup_interval', '300')
+        
+        # Detector settings
+        config.set('Security', 'detectors', ', '.join(DEFAULT_DETECTORS))
+        config.set('Security', 'door_left_unlocked_minutes', '30')
+        config.set('Security', 'code_reuse_locks', '3')
+        config.set('Security', 'code_reuse_window', '300')
+        config.set('Security', 'cross_lock_failure_locks', '3')
+        config.set('Security', 'cross_lock_failure_window', '60')
+        config.set('Security', 'cross_lock_sequence', '')
+        config.set('Security', 'cross_lock_sequence_window', '1800')
+        config.set('Security', 'temp_code_grace', '300')
+        config.set('Security', 'baseline_threshold', '0.002')
+        config.set('Security', 'baseline_min_events', '20')
+        config.set('Security', 'baseline_half_life_days', '28')
+        config.set('Security', 'event_log', 'true')
+        config.set('Security', 'stream_poll_interval', '5')
         
         # Alert settings
         config.set('Security', 'alert_priority', 'high')
         config.set('Security', 'alert_sound', 'true')
         config.set('Security', 'notify_owner_only', 'true')
         config.set('Security', 'include_evidence', 'true')
+        config.set('Security', 'alert_suppression_window', '300')
+        config.set('Security', 'alert_suppression_max_entries', '1000')
         
         # Save default configuration
         try:
@@ -151,12 +179,31 @@ class SecurityConfigManager:
         self.unusual_hour_end = self.config.getint('Security', 'unusual_hour_end', fallback=6)
         self.rapid_access_threshold = self.config.getint('Security', 'rapid_access_threshold', fallback=5)
         self.rapid_access_window = self.config.getint('Security', 'rapid_access_window', fallback=60)
+        self.cleanup_interval = self.config.getint('Security', 'cleanup_interval', fallback=300)
+        
+        # Load detector settings
+        self.detectors = self.config.get('Security', 'detectors', fallback=', '.join(DEFAULT_DETECTORS))
+        self.door_left_unlocked_minutes = self.config.getint('Security', 'door_left_unlocked_minutes', fallback=30)
+        self.code_reuse_locks = self.config.getint('Security', 'code_reuse_locks', fallback=3)
+        self.code_reuse_window = self.config.getint('Security', 'code_reuse_window', fallback=300)
+        self.cross_lock_failure_locks = self.config.getint('Security', 'cross_lock_failure_locks', fallback=3)
+        self.cross_lock_failure_window = self.config.getint('Security', 'cross_lock_failure_window', fallback=60)
+        self.cross_lock_sequence = self.config.get('Security', 'cross_lock_sequence', fallback='')
+        self.cross_lock_sequence_window = self.config.getint('Security', 'cross_lock_sequence_window', fallback=1800)
+        self.temp_code_grace = self.config.getint('Security', 'temp_code_grace', fallback=300)
+        self.baseline_threshold = self.config.getfloat('Security', 'baseline_threshold', fallback=0.002)
+        self.baseline_min_events = self.config.getint('Security', 'baseline_min_events', fallback=20)
+        self.baseline_half_life_days = self.config.getint('Security', 'baseline_half_life_days', fallback=28)
+        self.event_log = self.config.getboolean('Security', 'event_log', fallback=True)
+        self.stream_poll_interval = self.config.getint('Security', 'stream_poll_interval', fallback=5)
         
         # Load alert settings
         self.alert_priority = self.config.get('Security', 'alert_priority', fallback='high')
         self.alert_sound = self.config.getboolean('Security', 'alert_sound', fallback=True)
         self.notify_owner_only = self.config.getboolean('Security', 'notify_owner_only', fallback=True)
         self.include_evidence = self.config.getboolean('Security', 'include_evidence', fallback=True)
+        self.alert_suppression_window = self.config.getint('Security', 'alert_suppression_window', fallback=300)
+        self.alert_suppression_max_entries = self.config.getint('Security', 'alert_suppression_max_entries', fallback=1000)
         
         # Override from security-specific config if exists
         if os.path.exists(self.security_config_path):
@@ -186,6 +233,51 @@ class SecurityConfigManager:
                 if 'rapid_access_window' in security_section:
                     self.rapid_access_window = security_section.getint('rapid_access_window')
                 
+                if 'cleanup_interval' in security_section:
+                    self.cleanup_interval = security_section.getint('cleanup_interval')
+                
+                if 'detectors' in security_section:
+                    self.detectors = security_section.get('detectors')
+                
+                if 'door_left_unlocked_minutes' in security_section:
+                    self.door_left_unlocked_minutes = security_section.getint('door_left_unlocked_minutes')
+                
+                if 'code_reuse_locks' in security_section:
+                    self.code_reuse_locks = security_section.getint('code_reuse_locks')
+                
+                if 'code_reuse_window' in security_section:
+                    self.code_reuse_window = security_section.getint('code_reuse_window')
+                
+                if 'cross_lock_failure_locks' in security_section:
+                    self.cross_lock_failure_locks = security_section.getint('cross_lock_failure_locks')
+                
+                if 'cross_lock_failure_window' in security_section:
+                    self.cross_lock_failure_window = security_section.getint('cross_lock_failure_window')
+                
+                if 'cross_lock_sequence' in security_section:
+                    self.cross_lock_sequence = security_section.get('cross_lock_sequence')
+                
+                if 'cross_lock_sequence_window' in security_section:
+                    self.cross_lock_sequence_window = security_section.getint('cross_lock_sequence_window')
+                
+                if 'temp_code_grace' in security_section:
+                    self.temp_code_grace = security_section.getint('temp_code_grace')
+                
+                if 'baseline_threshold' in security_section:
+                    self.baseline_threshold = security_section.getfloat('baseline_threshold')
+                
+                if 'baseline_min_events' in security_section:
+                    self.baseline_min_events = security_section.getint('baseline_min_events')
+                
+                if 'baseline_half_life_days' in security_section:
+                    self.baseline_half_life_days = security_section.getint('baseline_half_life_days')
+                
+                if 'event_log' in security_section:
+                    self.event_log = security_section.getboolean('event_log')
+                
+                if 'stream_poll_interval' in security_section:
+                    self.stream_poll_interval = security_section.getint('stream_poll_interval')
+                
                 if 'alert_priority' in security_section:
                     self.alert_priority = security_section.get('alert_priority')
                 
@@ -197,6 +289,12 @@ class SecurityConfigManager:
                 
                 if 'include_evidence' in security_section:
                     self.include_evidence = security_section.getboolean('include_evidence')
+                
+                if 'alert_suppression_window' in security_section:
+                    self.alert_suppression_window = security_section.getint('alert_suppression_window')
+                
+                if 'alert_suppression_max_entries' in security_section:
+                    self.alert_suppression_max_entries = security_section.getint('alert_suppression_max_entries')
         
         logger.info(f"Security settings loaded: enabled={self.enabled}, "
                    f"failed_threshold={self.failed_attempts_threshold}, "
@@ -218,8 +316,15 @@ class SecurityConfigManager:
             if name not in [
                 'enabled', 'failed_attempts_threshold', 'failed_attempts_window',
                 'unusual_hour_start', 'unusual_hour_end', 'rapid_access_threshold',
-                'rapid_access_window', 'alert_priority', 'alert_sound',
-                'notify_owner_only', 'include_evidence'
+                'rapid_access_window', 'cleanup_interval', 'detectors',
+                'door_left_unlocked_minutes', 'code_reuse_locks', 'code_reuse_window',
+                'cross_lock_failure_locks', 'cross_lock_failure_window', 'cross_lock_sequence',
+                'cross_lock_sequence_window',
+                'temp_code_grace', 'baseline_threshold', 'baseline_min_events',
+                'baseline_half_life_days', 'event_log', 'stream_poll_interval',
+                'alert_priority', 'alert_sound',
+                'notify_owner_only', 'include_evidence', 'alert_suppression_window',
+                'alert_suppression_max_entries'
             ]:
                 logger.error(f"Invalid security setting: {name}")
                 return False
@@ -229,7 +334,7 @@ class SecurityConfigManager:
                 self.security_config.add_section('Security')
             
             # Convert booleans
-            if name in ['enabled', 'alert_sound', 'notify_owner_only', 'include_evidence']:
+            if name in ['enabled', 'event_log', 'alert_sound', 'notify_owner_only', 'include_evidence']:
                 if isinstance(value, str):
                     value = value.lower() in ['true', 'yes', '1', 'on']
                 self.security_config.set('Security', name, str(value).lower())
@@ -264,10 +369,27 @@ class SecurityConfigManager:
             'unusual_hour_end': self.unusual_hour_end,
             'rapid_access_threshold': self.rapid_access_threshold,
             'rapid_access_window': self.rapid_access_window,
+            'cleanup_interval': self.cleanup_interval,
+            'detectors': self.detectors,
+            'door_left_unlocked_minutes': self.door_left_unlocked_minutes,
+            'code_reuse_locks': self.code_reuse_locks,
+            'code_reuse_window': self.code_reuse_window,
+            'cross_lock_failure_locks': self.cross_lock_failure_locks,
+            'cross_lock_failure_window': self.cross_lock_failure_window,
+            'cross_lock_sequence': self.cross_lock_sequence,
+            'cross_lock_sequence_window': self.cross_lock_sequence_window,
+            'temp_code_grace': self.temp_code_grace,
+            'baseline_threshold': self.baseline_threshold,
+            'baseline_min_events': self.baseline_min_events,
+            'baseline_half_life_days': self.baseline_half_life_days,
+            'event_log': self.event_log,
+            'stream_poll_interval': self.stream_poll_interval,
             'alert_priority': self.alert_priority,
             'alert_sound': self.alert_sound,
             'notify_owner_only': self.notify_owner_only,
-            'include_evidence': self.include_evidence
+            'include_evidence': self.include_evidence,
+            'alert_suppression_window': self.alert_suppression_window,
+            'alert_suppression_max_entries': self.alert_suppression_max_entries
         }
 
 # Example usage when run directly
@@ -12,25 +12,35 @@ import sys
 import logging
 import json
 import time
-from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from datetime import datetime
+from collections import deque
 
-# Add parent directory to path
+# Add parent directory (for security.*) and scripts directory (for nuki.*) to path
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-if parent_dir not in sys.path:
-    sys.path.append(parent_dir)
+for path in (parent_dir, os.path.join(parent_dir, 'scripts')):
+    if path not in sys.path:
+        sys.path.append(path)
 
 # Import from main Nuki modules
 from nuki.config import ConfigManager
+from security.windows import ExpirySweeper
+from security.detectors import DetectorPipeline, EventContext, parse_event_date, utc_now
+from security.event_store import EventStore, EVENT_LOG_NAME
+
+# Set up logging with fallback to console if file logging fails
+log_handlers = []
+try:
+    logs_dir = os.environ.get('LOGS_DIR', os.path.expanduser("~/nukiweb/logs"))
+    os.makedirs(logs_dir, exist_ok=True)
+    log_handlers.append(logging.FileHandler(os.path.join(logs_dir, "nuki_security.log")))
+except (PermissionError, IOError) as e:
+    print(f"WARNING: Could not set up file logging: {e}")
+log_handlers.append(logging.StreamHandler())
 
-# Set up logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.expanduser("~/nukiweb/logs/nuki_security.log")),
-        logging.StreamHandler()
-    ]
+    handlers=log_handlers
 )
 logger = logging.getLogger('nuki_security')
 
@@ -39,13 +49,15 @@ class SecurityMonitor:
     Monitor for detecting suspicious activity patterns and generating security alerts.
     """
     
-    def __init__(self, config_manager=None, alert_callback=None):
+    def __init__(self, config_manager=None, alert_callback=None, clock=None):
         """
         Initialize the security monitor.
         
         Args:
             config_manager: ConfigManager instance or None to create new one
             alert_callback: Function to call when an alert is triggered
+            clock: Function returning the current aware UTC datetime (defaults to
+                   utc_now); replays pass simulated time
         """
         # Get base directory
         self.base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -55,39 +67,60 @@ class SecurityMonitor:
         
         # Set alert callback
         self.alert_callback = alert_callback
+        self.clock = clock or utc_now
+        
+        # Load security settings
+        self._load_security_settings()
         
         # Initialize activity tracking
         self.recent_activity = deque(maxlen=100)  # Store recent activity
-        self.failed_attempts = defaultdict(list)  # Store failed attempts per user/device
-        self.access_events = defaultdict(list)    # Store access events per user/device
         
-        # Load security settings
-        self._load_security_settings()
+        # Log processed events so detectors can be retrained from history
+        data_dir = getattr(self.config, 'data_dir', None)
+        self.event_store = None
+        if self.event_log and data_dir:
+            self.event_store = EventStore(os.path.join(data_dir, EVENT_LOG_NAME))
+        
+        # Build the detector pipeline; idle users are swept from its windows periodically
+        self.pipeline = DetectorPipeline.from_config(self.config)
+        self.sweeper = ExpirySweeper(self.pipeline.windows, self.cleanup_interval)
         
         logger.info("Security Monitor initialized")
     
     def _load_security_settings(self):
         """Load security settings from configuration."""
-        # Default thresholds
-        self.failed_attempts_threshold = 3
-        self.failed_attempts_window = 300  # 5 minutes
-        self.unusual_hour_start = 23       # 11 PM
-        self.unusual_hour_end = 6          # 6 AM
-        self.rapid_access_threshold = 5
-        self.rapid_access_window = 60      # 1 minute
+        # Detector thresholds are read by the detectors themselves
+        self.cleanup_interval = 300        # 5 minutes
+        self.event_log = True
         
         # Try to load from config
         if hasattr(self.config, 'config') and 'Security' in self.config.config:
             security_config = self.config.config['Security']
-            self.failed_attempts_threshold = security_config.getint('failed_attempts_threshold', 3)
-            self.failed_attempts_window = security_config.getint('failed_attempts_window', 300)
-            self.unusual_hour_start = security_config.getint('unusual_hour_start', 23)
-            self.unusual_hour_end = security_config.getint('unusual_hour_end', 6)
-            self.rapid_access_threshold = security_config.getint('rapid_access_threshold', 5)
-            self.rapid_access_window = security_config.getint('rapid_access_window', 60)
-        
-        logger.info(f"Security settings loaded: failed_threshold={self.failed_attempts_threshold}, "
-                   f"unusual_hours={self.unusual_hour_start}-{self.unusual_hour_end}")
+            self.cleanup_interval = security_config.getint('cleanup_interval', 300)
+            self.event_log = security_config.getboolean('event_log', True)
+        
+        logger.info(f"Security settings loaded: cleanup_interval={self.cleanup_interval}")
+    
+    def reload(self):
+        """
+        Apply changed [Security] settings without losing detector state.
+        
+        The config manager is expected to have re-read its files already.
+        Detector windows, baselines and pending timers are kept.
+        """
+        self._load_security_settings()
+        
+        # Start or stop the event log
+        data_dir = getattr(self.config, 'data_dir', None)
+        if self.event_log and data_dir and self.event_store is None:
+            self.event_store = EventStore(os.path.join(data_dir, EVENT_LOG_NAME))
+        elif not self.event_log and self.event_store is not None:
+            self.event_store.close()
+            self.event_store = None
+        
+        self.pipeline.reconfigure(self.config)
+        self.sweeper.counters = self.pipeline.windows
+        self.sweeper.interval = self.cleanup_interval
     
     def process_event(self, event):
         """
@@ -103,162 +136,71 @@ class SecurityMonitor:
         self.recent_activity.append(event)
         
         # Extract event details
-        event_id = event.get('id')
-        event_type = event.get('event_type', '')
-        action = event.get('action')
         user_name = event.get('user_name', 'Unknown User')
         date_str = event.get('date')
         
         # Parse date
-        try:
-            date = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
-        except (ValueError, TypeError):
+        date = parse_event_date(date_str)
+        if date is None:
             logger.warning(f"Invalid date format in event: {date_str}")
-            date = datetime.now()
-        
-        # Check if this is a failed attempt
-        if self._is_failed_attempt(event):
-            self._handle_failed_attempt(event, user_name, date)
+            date = self.clock()
+        timestamp = date.timestamp()
         
-        # Check for access during unusual hours
-        if self._is_unusual_hour(date):
-            self._handle_unusual_hour_access(event, user_name, date)
+        # Record the event in the event log
+        if self.event_store is not None:
+            try:
+                self.event_store.append(event)
+            except (IOError, OSError) as e:
+                logger.error(f"Error writing security event log: {e}")
         
-        # Track access events for rapid access detection
-        self._track_access_event(event, user_name, date)
+        # Run the event through the detectors that handle it
+        context = EventContext(event, user_name, date, timestamp)
+        for finding in self.pipeline.process(context):
+            self._trigger_alert(finding.message, finding.alert_type, finding.event, finding.user_name)
         
         # Clean up old entries periodically
-        self._cleanup_old_entries()
+        self._cleanup_old_entries(timestamp)
     
-    def _is_failed_attempt(self, event):
+    def check_timers(self, now=None):
         """
-        Determine if an event represents a failed access attempt.
+        Run the time-based detector checks (e.g. a door left unlocked).
         
         Args:
-            event: Event dictionary
-            
-        Returns:
-            bool: True if this is a failed attempt
+            now: Current time in seconds, defaults to the monitor's clock
         """
-        # Look for failed unlock attempts, denied access, etc.
-        action = event.get('action')
-        event_type = event.get('event_type', '').lower()
-        
-        # Check for specific failure indicators
-        return ('failed' in event_type or 
-                'denied' in event_type or 
-                'rejected' in event_type or
-                'invalid' in event_type)
+        if now is None:
+            now = self.clock().timestamp()
+        for finding in self.pipeline.tick(now):
+            self._trigger_alert(finding.message, finding.alert_type, finding.event, finding.user_name)
     
-    def _handle_failed_attempt(self, event, user_name, date):
-        """
-        Handle a failed access attempt and check for security issues.
-        
-        Args:
-            event: Event dictionary
-            user_name: Name of the user
-            date: Datetime of the event
-        """
-        # Add to failed attempts list
-        self.failed_attempts[user_name].append(date)
-        
-        # Check for multiple failed attempts
-        recent_failures = [d for d in self.failed_attempts[user_name] 
-                          if date - d < timedelta(seconds=self.failed_attempts_window)]
-        
-        if len(recent_failures) >= self.failed_attempts_threshold:
-            # This is a security concern - multiple failed attempts
-            alert_message = (f"Security Alert: Multiple failed access attempts detected for {user_name}. "
-                            f"{len(recent_failures)} attempts in the last "
-                            f"{self.failed_attempts_window // 60} minutes.")
-            
-            logger.warning(alert_message)
-            self._trigger_alert(alert_message, "failed_attempts", event, user_name)
+    def close(self):
+        """Save detector state and close the event log."""
+        self.pipeline.close()
+        if self.event_store is not None:
+            self.event_store.close()
     
-    def _is_unusual_hour(self, date):
+    def get_detector_stats(self):
         """
-        Check if the time is within the unusual hours range.
+        Get per-detector event counts, alert counts and latency.
         
-        Args:
-            date: Datetime to check
-            
         Returns:
-            bool: True if time is within unusual hours
+            dict: Detector name -> statistics, in pipeline order
         """
-        hour = date.hour
-        
-        if self.unusual_hour_start > self.unusual_hour_end:
-            # Range spans midnight (e.g., 23-6)
-            return hour >= self.unusual_hour_start or hour < self.unusual_hour_end
-        else:
-            # Normal range (e.g., 1-5)
-            return hour >= self.unusual_hour_start and hour < self.unusual_hour_end
+        return self.pipeline.get_stats()
     
-    def _handle_unusual_hour_access(self, event, user_name, date):
+    def _cleanup_old_entries(self, timestamp):
         """
-        Handle access during unusual hours.
+        Drop users with no events left in their windows, at most once per cleanup_interval.
         
-        Args:
-            event: Event dictionary
-            user_name: Name of the user
-            date: Datetime of the event
-        """
-        # Check if this is an actual access event (not just a status check)
-        if event.get('event_type', '').lower() in ['unlock', 'unlatch']:
-            alert_message = (f"Security Notice: Access during unusual hours by {user_name}. "
-                           f"Time: {date.strftime('%H:%M:%S')}")
-            
-            logger.info(alert_message)
-            self._trigger_alert(alert_message, "unusual_hours", event, user_name)
-    
-    def _track_access_event(self, event, user_name, date):
-        """
-        Track access events to detect rapid multiple accesses.
+        Windows already evict expired timestamps as events arrive; this only
+        reclaims the per-user entries of users that have gone quiet.
         
         Args:
-            event: Event dictionary
-            user_name: Name of the user
-            date: Datetime of the event
+            timestamp: Time of the current event in seconds
         """
-        # Only track actual access events
-        if event.get('event_type', '').lower() in ['unlock', 'unlatch', 'lock']:
-            # Add to access events list
-            self.access_events[user_name].append(date)
-            
-            # Check for rapid access
-            recent_access = [d for d in self.access_events[user_name] 
-                            if date - d < timedelta(seconds=self.rapid_access_window)]
-            
-            if len(recent_access) >= self.rapid_access_threshold:
-                # This is unusual - rapid multiple access
-                alert_message = (f"Security Notice: Rapid multiple access events detected. "
-                               f"{len(recent_access)} events in the last "
-                               f"{self.rapid_access_window // 60} minutes by {user_name}.")
-                
-                logger.info(alert_message)
-                self._trigger_alert(alert_message, "rapid_access", event, user_name)
-    
-    def _cleanup_old_entries(self):
-        """Clean up old entries from tracking dictionaries."""
-        now = datetime.now()
-        
-        # Clean up failed attempts
-        for user in list(self.failed_attempts.keys()):
-            self.failed_attempts[user] = [d for d in self.failed_attempts[user] 
-                                        if now - d < timedelta(seconds=self.failed_attempts_window * 2)]
-            
-            # Remove empty lists
-            if not self.failed_attempts[user]:
-                del self.failed_attempts[user]
-        
-        # Clean up access events
-        for user in list(self.access_events.keys()):
-            self.access_events[user] = [d for d in self.access_events[user] 
-                                      if now - d < timedelta(seconds=self.rapid_access_window * 2)]
-            
-            # Remove empty lists
-            if not self.access_events[user]:
-                del self.access_events[user]
+        removed = self.sweeper.maybe_sweep(timestamp)
+        if removed:
+            logger.debug(f"Expired {removed} idle tracking entries")
     
     def _trigger_alert(self, message, alert_type, event, user_name):
         """
@@ -276,7 +218,7 @@ class SecurityMonitor:
             'type': alert_type,
             'event': event,
             'user': user_name,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'timestamp': self.clock().strftime('%Y-%m-%d %H:%M:%S'),
             'priority': 'high'
         }
         
@@ -4,19 +4,26 @@ Security Monitoring Service for Nuki Smart Lock
 
 This script runs the security monitoring as a standalone service
 or can be integrated with the main Nuki notification system.
+
+The service doesn't poll the Nuki API itself: it follows the event stream
+the main monitor publishes, so both see exactly the same normalized events.
+Its position in the stream is saved after every event, so a restart picks
+up where it left off.
+
+Changes to config.ini or security.ini are picked up while the service runs:
+thresholds and detector settings are swapped in between two events, and the
+detectors keep their tracking windows.
 """
 
 import os
 import sys
 import logging
-import time
-import json
-from datetime import datetime, timedelta
 
-# Add parent directory to path
+# Add parent directory (for security.*) and scripts directory (for nuki.*) to path
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-if parent_dir not in sys.path:
-    sys.path.append(parent_dir)
+for path in (parent_dir, os.path.join(parent_dir, 'scripts')):
+    if path not in sys.path:
+        sys.path.append(path)
 
 # Import security modules
 from security.security_monitor import SecurityMonitor
@@ -25,17 +32,23 @@ from security.security_config import SecurityConfigManager
 
 # Import from main Nuki modules
 from nuki.config import ConfigManager
-from nuki.api import NukiAPI
-from nuki.utils import ActivityTracker
+from nuki.config_watch import ConfigWatcher
+from nuki.event_stream import StreamConsumer, EVENT_STREAM_NAME
+
+# Set up logging with fallback to console if file logging fails
+log_handlers = []
+try:
+    logs_dir = os.environ.get('LOGS_DIR', os.path.expanduser("~/nukiweb/logs"))
+    os.makedirs(logs_dir, exist_ok=True)
+    log_handlers.append(logging.FileHandler(os.path.join(logs_dir, "nuki_security_service.log")))
+except (PermissionError, IOError) as e:
+    print(f"WARNING: Could not set up file logging: {e}")
+log_handlers.append(logging.StreamHandler())
 
-# Set up logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.expanduser("~/nukiweb/logs/nuki_security_service.log")),
-        logging.StreamHandler()
-    ]
+    handlers=log_handlers
 )
 logger = logging.getLogger('nuki_security_service')
 
@@ -53,16 +66,19 @@ class SecurityMonitorService:
         self.config = ConfigManager(self.base_dir)
         self.security_config = SecurityConfigManager(self.base_dir)
         
-        # Initialize components
-        self.api = NukiAPI(self.config)
-        self.tracker = ActivityTracker(self.base_dir)
-        
         # Create security components
         self.alerter = SecurityAlerter(self.config)
         self.monitor = SecurityMonitor(self.config, self.handle_security_alert)
         
-        # Track last checked time
-        self.last_check_time = datetime.now() - timedelta(minutes=5)
+        # Follow the events published by the main monitor
+        self.consumer = StreamConsumer(
+            os.path.join(self.config.data_dir, EVENT_STREAM_NAME),
+            os.path.join(self.config.data_dir, 'security_stream_offset.json')
+        )
+        
+        # Watch the configuration files for changes made through the web interface
+        self.watcher = ConfigWatcher([self.config.config_path, self.config.credentials_path,
+                                      self.security_config.security_config_path], debounce=1.0)
         
         logger.info("Security Monitor Service initialized")
     
@@ -81,70 +97,43 @@ class SecurityMonitorService:
         self.alerter.send_alert(alert_data)
     
     def check_activity(self):
-        """Check for new activity and process through security monitor."""
-        logger.info("Checking for new activity...")
+        """Process new events from the event stream through the security monitor."""
+        logger.debug("Checking for new activity...")
         
         try:
-            # Get all lock IDs
-            locks = self.api.get_smartlocks()
-            if not locks:
-                logger.error("No smartlocks found")
-                return
+            # Each event's offset is committed once it has been processed
+            processed = self.consumer.consume(self.monitor.process_event)
+            if processed:
+                logger.info(f"Processed {processed} new events")
             
-            # Process events for each lock
-            for lock in locks:
-                lock_id = lock.get('smartlockId')
-                lock_name = lock.get('name', 'Unknown Lock')
-                
-                # Get activity since last check
-                activity = self.api.get_smartlock_logs(lock_id, limit=10)
-                
-                # Process each event through security monitor
-                for event in activity:
-                    # Parse date
-                    date_str = event.get('date')
-                    date = self.api.parse_date(date_str)
-                    
-                    # Skip events before last check
-                    if date and date <= self.last_check_time:
-                        continue
-                    
-                    # Process event data
-                    event_id = event.get('id')
-                    action = event.get('action')
-                    trigger = event.get('trigger')
-                    auth_id = event.get('authId')
-                    
-                    # Get action description
-                    action_description = "Unknown"
-                    if hasattr(self.api, 'get_action_description'):
-                        action_description = self.api.get_action_description(event)
-                    
-                    # Get user name if available
-                    user_name = "Auto Lock" if trigger == 6 else self.api.get_user_name(auth_id) if auth_id else "Unknown User"
-                    
-                    # Create event record for security monitor
-                    event_record = {
-                        'id': event_id,
-                        'lock_name': lock_name,
-                        'lock_id': lock_id,
-                        'event_type': action_description,
-                        'action': action,
-                        'trigger': trigger,
-                        'user_name': user_name,
-                        'date': date.strftime('%Y-%m-%d %H:%M:%S') if date else datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'auth_id': auth_id
-                    }
-                    
-                    # Process through security monitor
-                    self.monitor.process_event(event_record)
+            # Run time-based checks (e.g. a door left unlocked)
+            self.monitor.check_timers()
             
-            # Update last check time
-            self.last_check_time = datetime.now()
+            # Report repeats of alerts that were suppressed
+            self.alerter.flush()
         
         except Exception as e:
             logger.error(f"Error checking activity: {e}")
     
+    def reload_config(self):
+        """
+        Reload the configuration after its files changed.
+        
+        Returns:
+            bool: True if new settings were applied
+        """
+        logger.info("Configuration changed, reloading security settings")
+        try:
+            if not self.config.reload():
+                return False
+            self.security_config = SecurityConfigManager(self.base_dir)
+            self.monitor.reload()
+            self.alerter.reload()
+        except Exception as e:
+            logger.error(f"Error reloading configuration: {e}")
+            return False
+        return True
+    
     def run(self):
         """Run the security monitoring service."""
         logger.info("Starting Security Monitor Service")
@@ -160,10 +149,16 @@ class SecurityMonitorService:
                 # Check for new activity
                 self.check_activity()
                 
-                # Sleep until next check
-                time.sleep(self.config.polling_interval)
+                # Wait for the main monitor to publish more events, applying
+                # configuration changes as soon as they have been written
+                if self.watcher.wait(self.security_config.stream_poll_interval):
+                    self.reload_config()
         except KeyboardInterrupt:
             logger.info("Security Monitor Service stopped by user")
+            for name, stats in self.monitor.get_detector_stats().items():
+                logger.info(f"Detector {name}: {stats['events']} events, {stats['alerts']} alerts, "
+                            f"{stats['mean_us']} us/event")
+            self.monitor.close()
         except Exception as e:
             logger.error(f"Error in Security Monitor Service: {e}")
             raise
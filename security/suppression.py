@@ -0,0 +1,137 @@
+"""
+Alert Suppression for Nuki Security Monitoring
+
+Deduplicates security alerts so one incident doesn't turn into hundreds of
+notifications. Alerts are fingerprinted by type, user and lock. The first
+alert for a fingerprint goes out; repeats within the suppression window are
+counted instead of sent, and the count is reported with the next alert that
+goes out ("12 more in the last 5 minutes"), or in a summary once the window
+closes.
+
+The suppression table is bounded: entries expire once their window has
+passed, and the least recently seen entries are evicted when it is full.
+"""
+
+from collections import OrderedDict
+
+
+def alert_fingerprint(alert_data):
+    """
+    Get the fingerprint identifying repeats of an alert.
+
+    Args:
+        alert_data: Alert data dictionary
+
+    Returns:
+        tuple: (alert type, user, lock ID)
+    """
+    event = alert_data.get('event') or {}
+    return (alert_data.get('type', 'unknown'), alert_data.get('user'), event.get('lock_id'))
+
+
+class SuppressionEntry:
+    """
+    Suppression state of one fingerprint.
+    """
+
+    __slots__ = ('sent_at', 'last_seen', 'suppressed', 'last_alert')
+
+    def __init__(self, now):
+        self.sent_at = now
+        self.last_seen = now
+        self.suppressed = 0
+        self.last_alert = None
+
+
+class AlertSuppressor:
+    """
+    Decides which alerts to send and counts the ones it holds back.
+    """
+
+    def __init__(self, window=300, max_entries=1000):
+        """
+        Initialize the suppressor.
+
+        Args:
+            window: Seconds after a sent alert during which repeats are suppressed (0 disables)
+            max_entries: Maximum number of fingerprints tracked
+        """
+        self.window = window
+        self.max_entries = max_entries
+        # fingerprint -> SuppressionEntry, least recently seen first
+        self.entries = OrderedDict()
+        # Summaries of entries evicted early to respect max_entries
+        self.evicted = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def check(self, alert_data, now):
+        """
+        Record an alert and decide whether to send it.
+
+        Args:
+            alert_data: Alert data dictionary
+            now: Current time in seconds
+
+        Returns:
+            tuple: (send, suppressed) where send tells whether to send the alert
+                   and suppressed is how many repeats were held back since the
+                   previous one was sent
+        """
+        if self.window <= 0:
+            return True, 0
+
+        key = alert_fingerprint(alert_data)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = SuppressionEntry(now)
+            if len(self.entries) > self.max_entries:
+                _, oldest = self.entries.popitem(last=False)
+                if oldest.suppressed:
+                    self.evicted.append((oldest.last_alert, oldest.suppressed))
+            return True, 0
+
+        self.entries.move_to_end(key)
+        entry.last_seen = now
+        if now - entry.sent_at < self.window:
+            entry.suppressed += 1
+            entry.last_alert = alert_data
+            return False, 0
+
+        suppressed = entry.suppressed
+        entry.sent_at = now
+        entry.suppressed = 0
+        entry.last_alert = None
+        return True, suppressed
+
+    def expire(self, now):
+        """
+        Drop entries that have gone quiet and close windows that have passed.
+
+        Args:
+            now: Current time in seconds
+
+        Returns:
+            list: (alert_data, suppressed) summaries for every fingerprint whose
+                  window closed with suppressed repeats, including entries
+                  evicted early to respect max_entries
+        """
+        summaries, self.evicted = self.evicted, []
+        # Entries are ordered by last_seen, so expired ones are at the front
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if now - entry.last_seen < self.window:
+                break
+            del self.entries[key]
+            if entry.suppressed:
+                summaries.append((entry.last_alert, entry.suppressed))
+
+        # Entries seen recently may still have repeats waiting whose window has closed
+        for entry in self.entries.values():
+            if entry.suppressed and now - entry.sent_at >= self.window:
+                summaries.append((entry.last_alert, entry.suppressed))
+                entry.sent_at = now
+                entry.suppressed = 0
+                entry.last_alert = None
+        return summaries
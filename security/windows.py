@@ -0,0 +1,228 @@
+"""
+Sliding Window Counters for Nuki Security Monitoring
+
+Per-key event windows used by the security detectors. Each key (typically a
+user name) keeps a deque of event timestamps in non-decreasing order, so
+evicting expired timestamps only ever pops from the left and counting is
+len(): amortized O(1) per event, independent of how many users or events
+have been seen. Keys that have gone quiet are removed by a periodic sweep
+rather than on every event.
+
+BucketedCounter trades exactness for aggregate queries: events are grouped
+into fixed-size time buckets and running totals are kept per key, so "how
+many distinct keys had events in the window" is len() instead of a scan.
+"""
+
+from collections import deque
+
+
+class SlidingWindowCounter:
+    """
+    Counts events per key within a sliding time window.
+    """
+
+    def __init__(self, window):
+        """
+        Initialize the counter.
+
+        Args:
+            window: Window length in seconds
+        """
+        self.window = window
+        self.events = {}
+
+    def add(self, key, timestamp):
+        """
+        Record an event and count the key's events in the window ending at it.
+
+        Timestamps older than the key's newest one are clamped to it, which
+        keeps each deque monotonic when events arrive slightly out of order.
+
+        Args:
+            key: Key to count for (e.g. user name)
+            timestamp: Event time in seconds
+
+        Returns:
+            int: Number of events for the key within the window, including this one
+        """
+        events = self.events.get(key)
+        if events is None:
+            events = self.events[key] = deque()
+        elif timestamp < events[-1]:
+            timestamp = events[-1]
+        events.append(timestamp)
+
+        # Evict from the left; each timestamp is evicted at most once
+        cutoff = timestamp - self.window
+        while events[0] <= cutoff:
+            events.popleft()
+        return len(events)
+
+    def count(self, key, now):
+        """
+        Count a key's events within the window ending at a given time.
+
+        Args:
+            key: Key to count for
+            now: End of the window in seconds
+
+        Returns:
+            int: Number of events within the window
+        """
+        events = self.events.get(key)
+        if not events:
+            return 0
+        cutoff = now - self.window
+        while events and events[0] <= cutoff:
+            events.popleft()
+        return len(events)
+
+    def sweep(self, now):
+        """
+        Drop keys whose newest event has left the window.
+
+        Args:
+            now: Current time in seconds
+
+        Returns:
+            int: Number of keys removed
+        """
+        cutoff = now - self.window
+        expired = [key for key, events in self.events.items() if events[-1] <= cutoff]
+        for key in expired:
+            del self.events[key]
+        return len(expired)
+
+    def __len__(self):
+        return len(self.events)
+
+
+class BucketedCounter:
+    """
+    Counts events per key over a window of fixed-size time buckets.
+
+    Events are added to the bucket covering their time; whole buckets expire
+    once they end before the window, so counts include events up to one
+    bucket older than the window. Running totals make per-key counts and
+    the number of distinct keys O(1); expiring costs O(keys in the bucket).
+    """
+
+    def __init__(self, window, bucket=None):
+        """
+        Initialize the counter.
+
+        Args:
+            window: Window length in seconds
+            bucket: Bucket length in seconds (defaults to a tenth of the window)
+        """
+        self.window = window
+        self.bucket = bucket or max(1, window // 10)
+        # (bucket index, {key: count}), oldest first
+        self.buckets = deque()
+        self.totals = {}
+
+    def add(self, key, timestamp):
+        """
+        Record an event.
+
+        Events older than the newest bucket are counted in it, which keeps
+        the buckets in order when events arrive slightly out of order.
+
+        Args:
+            key: Key to count for
+            timestamp: Event time in seconds
+
+        Returns:
+            int: Number of events for the key within the window, including this one
+        """
+        self.expire(timestamp)
+        index = int(timestamp // self.bucket)
+        if not self.buckets or self.buckets[-1][0] < index:
+            self.buckets.append((index, {}))
+        counts = self.buckets[-1][1]
+        counts[key] = counts.get(key, 0) + 1
+        total = self.totals[key] = self.totals.get(key, 0) + 1
+        return total
+
+    def expire(self, now):
+        """
+        Drop the buckets that ended before the window.
+
+        Args:
+            now: Current time in seconds
+
+        Returns:
+            int: Number of keys that no longer have events in the window
+        """
+        removed = 0
+        cutoff = now - self.window
+        buckets = self.buckets
+        while buckets and (buckets[0][0] + 1) * self.bucket <= cutoff:
+            _, counts = buckets.popleft()
+            for key, count in counts.items():
+                remaining = self.totals[key] - count
+                if remaining:
+                    self.totals[key] = remaining
+                else:
+                    del self.totals[key]
+                    removed += 1
+        return removed
+
+    def count(self, key, now):
+        """
+        Count a key's events within the window ending at a given time.
+
+        Args:
+            key: Key to count for
+            now: End of the window in seconds
+
+        Returns:
+            int: Number of events within the window
+        """
+        self.expire(now)
+        return self.totals.get(key, 0)
+
+    # Expiry is all a sweep has to do
+    sweep = expire
+
+    def __len__(self):
+        return len(self.totals)
+
+
+class ExpirySweeper:
+    """
+    Runs sweep() on a set of window counters at most once per interval.
+
+    The clock is whatever time the caller passes in (event time when
+    processing a stream), so sweeping behaves the same live and in replays.
+    """
+
+    def __init__(self, counters, interval):
+        """
+        Initialize the sweeper.
+
+        Args:
+            counters: SlidingWindowCounter instances to sweep
+            interval: Minimum seconds between sweeps
+        """
+        self.counters = list(counters)
+        self.interval = interval
+        self.last_sweep = None
+
+    def maybe_sweep(self, now):
+        """
+        Sweep all counters if the interval has elapsed.
+
+        Args:
+            now: Current time in seconds
+
+        Returns:
+            int: Number of keys removed (0 if no sweep ran)
+        """
+        if self.last_sweep is None:
+            self.last_sweep = now
+            return 0
+        if now - self.last_sweep < self.interval:
+            return 0
+        self.last_sweep = now
+        return sum(counter.sweep(now) for counter in self.counters)
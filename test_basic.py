@@ -1,5 +1,8 @@
-import pytest
+import os
 import json
+import sqlite3
+
+import pytest
 
 def test_health_check(app):
     """Test the health check endpoint"""
@@ -25,3 +28,61 @@ def test_temp_codes_redirect(app):
     response = app.get('/temp-codes', follow_redirects=True)
     assert response.status_code == 200
     assert b'Login' in response.data
+
+def test_health_check_creates_no_session(app, monkeypatch):
+    """Test health probes don't store sessions or set cookies"""
+    import web.app as web_app
+    from web.app import app as flask_app
+
+    # Once set up, requests get past the setup redirect to the theme and session hooks
+    monkeypatch.setattr(web_app.config, 'api_token', 'test_token')
+
+    def session_rows():
+        if not os.path.exists(flask_app.session_interface.path):
+            return 0
+        with sqlite3.connect(flask_app.session_interface.path) as db:
+            return db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    before = session_rows()
+    for _ in range(3):
+        # Probes don't keep cookies, so each one is a new client
+        response = flask_app.test_client().get('/health')
+        assert 'Set-Cookie' not in response.headers
+    assert session_rows() == before
+
+def test_bulk_temp_codes_accept_string_lock_ids(app, monkeypatch):
+    """Test bulk codes take smartlock ids as strings, like the single-code form sends them"""
+    import web.app as web_app
+
+    locks = [{'smartlockId': 12345, 'name': 'Unit 1', 'type': 4}]
+    monkeypatch.setattr(web_app.config, 'api_token', 'test_token')
+    monkeypatch.setattr(web_app.api, '_make_request', lambda *args, **kwargs: [dict(lock) for lock in locks])
+    web_app.api.invalidate_locks()
+    added = []
+
+    def add_temporary_code(smartlock_id, code, name, expiry, valid_from=None):
+        added.append(smartlock_id)
+        return {'success': True, 'auth_id': f"{smartlock_id}-{code}"}
+
+    monkeypatch.setattr(web_app.api, 'add_temporary_code', add_temporary_code)
+    monkeypatch.setattr(web_app.temp_code_db, 'add_codes', lambda codes: True)
+    with app.session_transaction() as sess:
+        sess['logged_in'] = True
+        sess['username'] = 'admin'
+        sess['role'] = 'admin'
+
+    expiry = '2030-01-01T00:00:00Z'
+    response = app.post('/api/temp-codes/bulk', json={'codes': [
+        {'code': '1234', 'name': 'Guest', 'expiry': expiry, 'smartlock_id': '12345'},
+        {'code': '5678', 'name': 'Guest', 'expiry': expiry, 'smartlock_id': 12345}
+    ]})
+    assert response.status_code == 200, response.get_json()
+    assert added == [12345, 12345]
+
+    response = app.post('/api/temp-codes/bulk', json={'codes': [
+        {'code': '1234', 'name': 'Guest', 'expiry': expiry, 'smartlock_id': 'front-door'}
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0]['index'] == 0
+    assert added == [12345, 12345]
+    web_app.api.invalidate_locks()
@@ -33,6 +33,8 @@ def mock_api():
                 }
             }
         ]
+        api_instance.get_lock_inventory.return_value = api_instance.get_smartlocks.return_value
+        api_instance.get_default_lock_id.return_value = '12345'
         
         # Mock logs
         api_instance.get_smartlock_logs.return_value = [
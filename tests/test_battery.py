@@ -0,0 +1,74 @@
+import os
+import sys
+
+# Add scripts to path so we can import nuki
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from nuki.battery import BatteryHistory
+
+DAY = 86400
+
+
+def discharge(history, lock_id=1, start=100, per_day=2.0, days=10, offset=0):
+    for hour in range(days * 24):
+        history.record(lock_id, start - per_day * hour / 24, False, offset + hour * 3600)
+
+
+def test_ring_buffer_is_fixed_size():
+    history = BatteryHistory(interval=3600, capacity=48)
+    discharge(history, days=5)
+    samples = history.history(1)
+    assert len(samples) == 48
+    assert samples[-1][0] == (5 * 24 - 1) * 3600
+    # Skipped slots are cleared rather than showing stale readings
+    history.record(1, 80, False, (5 * 24 + 10) * 3600)
+    assert len(history.history(1)) == 48 - 10
+
+
+def test_trend_predicts_days_to_critical():
+    history = BatteryHistory()
+    discharge(history, start=60, per_day=2.0, days=10)
+    now = 10 * DAY
+    trend = history.trend(1, now, critical_level=20)
+    assert abs(trend['per_day'] + 2.0) < 0.1
+    # Down to 40 now, 20 points above critical at 2 points a day
+    assert abs(trend['days_to_critical'] - 10) < 1
+    assert history.trend(2, now) is None
+
+
+def test_trend_restarts_after_battery_replacement():
+    history = BatteryHistory()
+    discharge(history, start=30, per_day=2.0, days=5)
+    # New batteries; a steady charge means no predicted end
+    for hour in range(5 * 24, 8 * 24):
+        history.record(1, 100, False, hour * 3600)
+    assert history.trend(1, 8 * DAY)['days_to_critical'] is None
+
+
+def test_warning_sent_once_per_set_of_batteries(tmp_path):
+    history = BatteryHistory()
+    discharge(history, start=40, per_day=2.0, days=4)
+    now = 4 * DAY
+    assert history.due_warning(1, now, warning_days=14)['days_to_critical'] < 14
+    # Still due until it was sent
+    assert history.due_warning(1, now, warning_days=14) is not None
+    history.mark_warned(1)
+    assert history.due_warning(1, now, warning_days=14) is None
+
+    # The sent flag survives a restart
+    path = str(tmp_path / 'battery_history.json')
+    history.save(path)
+    restored = BatteryHistory.load(path)
+    assert restored.history(1) == history.history(1)
+    assert restored.due_warning(1, now, warning_days=14) is None
+
+    # Replacing the batteries re-arms the warning
+    restored.record(1, 100, False, now + 3600)
+    assert restored.series['1'].alerted is False
+
+
+def test_critical_flag_means_no_time_left():
+    history = BatteryHistory()
+    discharge(history, start=80, per_day=1.0, days=3)
+    history.record(1, 77, True, 3 * DAY)
+    assert history.trend(1, 3 * DAY)['days_to_critical'] == 0.0
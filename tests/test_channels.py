@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import socket
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+# Add scripts to path so we can import nuki
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from nuki.channels import ChannelRegistry, parse_channels
+from nuki.dispatch import DispatchQueue, Notification
+from nuki.filters import EventFilter
+from nuki.notification import Notifier
+
+EVENT = {'lock_name': 'Front Door', 'lock_id': 7, 'event_type': 'Unlock', 'action': 1,
+         'trigger': 0, 'user_name': 'Alice', 'date': '2025-01-06 10:00:00'}
+
+
+def make_config(**values):
+    settings = dict(
+        notification_type='webhook, mqtt',
+        email_recipient='',
+        telegram_chat_id='',
+        use_html_email=False,
+        telegram_use_emoji=True,
+        telegram_format='detailed',
+        template_dir=None,
+        email_subject_prefix='Nuki',
+        event_filter=EventFilter([]),
+        webhook_url='',
+        webhook_secret='s3cret',
+        webhook_batch_size=2,
+        mqtt_topic='',
+        mqtt_host='127.0.0.1',
+        mqtt_qos=1
+    )
+    settings.update(values)
+    return SimpleNamespace(**settings)
+
+
+class WebhookServer:
+    """Local stand-in webhook endpoint answering with queued status codes"""
+
+    def __init__(self, statuses=()):
+        self.requests = []
+        self.statuses = list(statuses)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                server.requests.append((self.client_address, dict(self.headers), json.loads(body)))
+                status = server.statuses.pop(0) if server.statuses else 200
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/hook"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class MqttBroker:
+    """Local stand-in MQTT broker that acknowledges every publish"""
+
+    def __init__(self):
+        self.published = []
+        self.connects = []
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(1)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _read_packet(self, conn):
+        header = conn.recv(1)
+        if not header:
+            return None, b''
+        length, multiplier = 0, 1
+        while True:
+            byte = conn.recv(1)[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        body = b''
+        while len(body) < length:
+            body += conn.recv(length - len(body))
+        return header[0], body
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                self._handle(conn)
+
+    def _handle(self, conn):
+        while True:
+            header, body = self._read_packet(conn)
+            if header is None or header == 0xE0:
+                return
+            if header == 0x10:
+                self.connects.append(body)
+                conn.sendall(b'\x20\x02\x00\x00')
+            elif header & 0xF0 == 0x30:
+                topic_length = struct.unpack('!H', body[:2])[0]
+                topic = body[2:2 + topic_length].decode()
+                packet_id = body[2 + topic_length:4 + topic_length]
+                self.published.append((topic, header, json.loads(body[4 + topic_length:])))
+                conn.sendall(b'\x40\x02' + packet_id)
+
+    def close(self):
+        self.sock.close()
+
+
+def test_parse_channels():
+    assert parse_channels('both') == ['email', 'telegram']
+    assert parse_channels('email, mqtt, email') == ['email', 'mqtt']
+
+
+def test_channels_are_loaded_lazily():
+    notifier = Notifier(make_config(notification_type='email'))
+    assert notifier.channels.loaded == []
+
+    registry = ChannelRegistry(make_config())
+    assert registry.get('webhook').name == 'webhook'
+    assert registry.loaded == ['webhook']
+
+
+def test_webhook_batches_over_one_connection():
+    server = WebhookServer()
+    try:
+        notifier = Notifier(make_config(notification_type='webhook', webhook_url=server.url))
+        for i in range(3):
+            notifier.dispatch.put('webhook', Notification('event', f"Event {i}", [EVENT]), [server.url])
+        assert notifier.dispatch.run()
+    finally:
+        server.close()
+
+    # Three notifications in batches of two, over a single kept-alive connection
+    assert [len(body['notifications']) for _, _, body in server.requests] == [2, 1]
+    assert len({client for client, _, _ in server.requests}) == 1
+    _, headers, body = server.requests[0]
+    assert headers['X-Nuki-Signature'].startswith('sha256=')
+    assert body['notifications'][0]['events'][0]['lock_name'] == 'Front Door'
+
+
+def test_dispatch_retries_transient_failures_only():
+    server = WebhookServer(statuses=[503, 200, 400])
+    sleeps = []
+    try:
+        registry = ChannelRegistry(make_config())
+        queue = DispatchQueue(registry, max_retries=3, retry_delay=5, sleep=sleeps.append)
+
+        queue.put('webhook', Notification('event', 'Retried', [EVENT]), [server.url])
+        assert queue.run()
+        assert sleeps == [5]
+
+        # A client error is permanent and isn't retried
+        queue.put('webhook', Notification('event', 'Rejected', [EVENT]), [server.url])
+        assert not queue.run()
+        assert sleeps == [5]
+    finally:
+        server.close()
+    assert len(server.requests) == 3
+
+
+def test_unknown_channel_fails_without_retry():
+    sleeps = []
+    queue = DispatchQueue(ChannelRegistry(make_config()), max_retries=3, sleep=sleeps.append)
+    queue.put('pager', Notification('event', 'Nope', [EVENT]), ['123'])
+    assert not queue.run()
+    assert sleeps == []
+
+
+def test_mqtt_publishes_to_broker():
+    broker = MqttBroker()
+    try:
+        notifier = Notifier(make_config(notification_type='mqtt', mqtt_topic='home/nuki',
+                                        mqtt_port=broker.port, mqtt_username='nuki', mqtt_password='pw'))
+        assert notifier.send_notification(EVENT)
+        assert notifier.send_notification(dict(EVENT, user_name='Bob'))
+    finally:
+        broker.close()
+
+    # One connection per batch, QoS 1 publishes acknowledged by the broker
+    assert len(broker.connects) == 2
+    assert b'nuki-monitor' in broker.connects[0] and b'pw' in broker.connects[0]
+    assert [(topic, header) for topic, header, _ in broker.published] == [('home/nuki', 0x32)] * 2
+    _, _, payload = broker.published[0]
+    assert payload['kind'] == 'event'
+    assert payload['subject'] == 'Nuki: Unlock by Alice'
+    assert payload['events'] == [EVENT]
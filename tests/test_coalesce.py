@@ -0,0 +1,127 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add scripts to path so we can import nuki
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from nuki.channels.base import Channel
+from nuki.coalesce import EventCoalescer, StormGuard
+from nuki.filters import EventFilter
+from nuki.notification import Notifier
+
+
+class RecordingChannel(Channel):
+    format = 'email'
+
+    def __init__(self):
+        super().__init__(None)
+        self.sent = []
+
+    def send(self, delivery):
+        self.sent.append((delivery.notification.subject, delivery.notification.render(self.format), delivery.address))
+
+
+def make_notifier(**values):
+    notifier = Notifier(make_config(**values))
+    notifier.channels.register('email', RecordingChannel())
+    return notifier, notifier.channels.get('email').sent
+
+
+def make_config(**values):
+    settings = dict(
+        notification_type='email',
+        email_recipient='owner@example.com',
+        telegram_chat_id='',
+        use_html_email=False,
+        telegram_use_emoji=True,
+        telegram_format='detailed',
+        template_dir=None,
+        email_subject_prefix='Nuki',
+        event_filter=EventFilter([]),
+        coalesce_window=30,
+        coalesce_max_delay=120,
+        storm_threshold=0,
+        storm_window=60
+    )
+    settings.update(values)
+    return SimpleNamespace(**settings)
+
+
+def event(second, **values):
+    base = {'lock_name': 'Front Door', 'lock_id': 7, 'event_type': 'Unlock', 'action': 1,
+            'trigger': 0, 'user_name': 'Alice', 'date': f"2025-01-06 10:00:{second:02d}"}
+    base.update(values)
+    return base
+
+
+def test_coalescer_groups_bursts_per_lock_and_user():
+    coalescer = EventCoalescer(window=30)
+    coalescer.add(event(0), now=1000)
+    coalescer.add(event(5, event_type='Lock'), now=1000)
+    coalescer.add(event(6, user_name='Bob'), now=1001)
+    assert len(coalescer) == 3
+    assert coalescer.ready(now=1020) == []
+    assert coalescer.next_due() == 1030
+
+    groups = coalescer.ready(now=1031)
+    assert [len(group) for group in groups] == [2, 1]
+    assert coalescer.next_due() is None
+
+
+def test_coalescer_closes_group_after_gap_in_event_time():
+    coalescer = EventCoalescer(window=30)
+    coalescer.add(event(0), now=1000)
+    # Same poll, but the lock recorded it more than 30s later
+    coalescer.add(dict(event(0), date='2025-01-06 10:05:00'), now=1000)
+    assert [len(group) for group in coalescer.ready(now=1000)] == [1]
+    assert [len(group) for group in coalescer.drain()] == [1]
+
+
+def test_coalescer_max_delay_bounds_latency():
+    coalescer = EventCoalescer(window=30, max_delay=60)
+    for i in range(5):
+        coalescer.add(event(i * 10), now=1000 + i * 20)
+    assert coalescer.ready(now=1059) == []
+    assert [len(group) for group in coalescer.ready(now=1060)] == [5]
+
+
+def test_storm_guard_sliding_window():
+    guard = StormGuard(threshold=2, window=60)
+    assert guard.allow(0) and guard.allow(1)
+    assert not guard.allow(2)
+    assert guard.is_storm(59)
+    assert not guard.is_storm(61)
+
+
+def test_flap_sends_one_summary():
+    notifier, sent = make_notifier()
+
+    for i, action in enumerate(['Lock', 'Unlock', "Lock 'n' Go"]):
+        notifier.submit(event(i * 3, event_type=action), now=1000 + i)
+    assert sent == []
+
+    assert notifier.flush(now=1040)
+    assert len(sent) == 1
+    subject, body, recipient = sent[0]
+    assert subject == 'Nuki: 3 events on Front Door by Alice'
+    assert body.startswith('Front Door: 3 events by Alice')
+    assert recipient == 'owner@example.com'
+
+
+def test_storm_degrades_to_digest():
+    notifier, sent = make_notifier(coalesce_window=0, storm_threshold=3)
+
+    for i in range(10):
+        notifier.submit(event(i, user_name=f"User {i}"), now=1000)
+    assert len(sent) == 3
+    assert len(notifier.storm_events) == 7
+
+    # The storm is still going one second later; once the window passes the held events go out together
+    notifier.flush(now=1001)
+    assert len(sent) == 3
+    assert notifier.next_flush_time() == 1060
+    notifier.flush(now=1061)
+    assert len(sent) == 4
+    assert sent[-1][0] == 'Nuki: Activity Digest - 7 events'
+    assert notifier.storm_events == []
@@ -36,4 +36,54 @@ def test_config_env_prioritization(tmp_path):
     # Clean up
     del os.environ["NUKI_NOTIFICATION_TYPE"]
     del os.environ["NUKI_API_TOKEN"]
-    del os.environ["CONFIG_DIR"]
\ No newline at end of file
+    del os.environ["CONFIG_DIR"]
+
+def make_config(tmp_path, monkeypatch):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    (config_dir / "config.ini").write_text("[General]\nnotification_type = both\npolling_interval = 60\n\n[Security]\nenabled = true\n")
+    (config_dir / "credentials.ini").write_text("[Nuki]\napi_token = file_token\n")
+    monkeypatch.setenv("CONFIG_DIR", str(config_dir))
+    monkeypatch.setenv("DATA_DIR", str(tmp_path / "data"))
+    return ConfigManager(base_dir=str(tmp_path)), config_dir
+
+
+def test_apply_changes_single_write_in_place(tmp_path, monkeypatch):
+    cm, config_dir = make_config(tmp_path, monkeypatch)
+    changed = cm.apply_changes({
+        'general': {'notification_type': 'both', 'polling_interval': '30'},
+        'notification': {'digest_mode': True},
+        'nuki': {'api_token': 'new_token'}
+    })
+
+    # Unchanged values don't count; sections are matched case-insensitively
+    assert changed == {('General', 'polling_interval'), ('Notification', 'digest_mode'), ('Nuki', 'api_token')}
+    assert cm.polling_interval == 30
+    assert cm.digest_mode is True
+    assert cm.headers["Authorization"] == "Bearer new_token"
+
+    text = (config_dir / "config.ini").read_text()
+    assert "[general]" not in text
+    assert "[Security]" in text
+    assert "digest_mode = true" in text
+    assert "new_token" in (config_dir / "credentials.ini").read_text()
+    assert not os.path.exists(str(config_dir / "config.ini.tmp"))
+
+
+def test_apply_changes_validates_before_writing(tmp_path, monkeypatch):
+    cm, config_dir = make_config(tmp_path, monkeypatch)
+    before = (config_dir / "config.ini").read_text()
+
+    with pytest.raises(ValueError) as error:
+        cm.apply_changes({
+            'general': {'polling_interval': 'often'},
+            'advanced': {'max_retries': '2', 'bogus': '1'}
+        })
+    assert 'general.polling_interval' in str(error.value)
+    assert 'advanced.bogus' in str(error.value)
+
+    # Nothing was applied, not even the valid change
+    assert (config_dir / "config.ini").read_text() == before
+    assert cm.polling_interval == 60
+    assert cm.max_retries == 3
+    assert cm.apply_changes({'general': {'polling_interval': 60}}) == set()
@@ -0,0 +1,95 @@
+import os
+import sys
+
+import pytest
+
+# Add scripts to path so we can import nuki
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from nuki.api import NukiAPI
+from nuki.config import ConfigManager
+from nuki.config_watch import ConfigWatcher
+from nuki.notification import Notifier
+
+
+def replace(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    (config_dir / "config.ini").write_text("[General]\npolling_interval = 60\n\n[Notification]\ncoalesce_window = 30\n")
+    (config_dir / "credentials.ini").write_text("[Nuki]\napi_token = first_token\n")
+    monkeypatch.setenv("CONFIG_DIR", str(config_dir))
+    monkeypatch.setenv("DATA_DIR", str(tmp_path / "data"))
+    return config_dir
+
+
+@pytest.mark.parametrize('use_inotify', [True, False])
+def test_watcher_sees_atomic_replace(tmp_path, use_inotify):
+    path = str(tmp_path / 'config.ini')
+    replace(path, '[General]\n')
+    watcher = ConfigWatcher([path], debounce=0, use_inotify=use_inotify)
+    # Other files in the directory are ignored
+    (tmp_path / 'users.json').write_text('{}')
+    assert watcher.wait(0) is False
+
+    replace(path, '[General]\npolling_interval = 30\n')
+    assert watcher.wait(2) is True
+    assert watcher.poll() is False
+    watcher.close()
+
+
+def test_reload_bumps_generation_once(config_dir):
+    cm = ConfigManager(str(config_dir.parent))
+    cm.start_watching(debounce=0)
+    generation = cm.generation
+    assert cm.check_for_changes() is False
+
+    replace(str(config_dir / "config.ini"), "[General]\npolling_interval = 15\n")
+    assert cm.wait_for_changes(2) is True
+    assert cm.polling_interval == 15
+    assert cm.generation == generation + 1
+    assert cm.check_for_changes() is False
+    cm.watcher.close()
+
+
+def test_own_writes_do_not_trigger_reload(config_dir):
+    cm = ConfigManager(str(config_dir.parent))
+    cm.start_watching(debounce=0)
+    cm.apply_changes({'general': {'polling_interval': 20}})
+    generation = cm.generation
+    assert cm.wait_for_changes(0.2) is False
+    assert cm.generation == generation
+    cm.watcher.close()
+
+
+def test_consumers_follow_generation(config_dir):
+    writer = ConfigManager(str(config_dir.parent))
+    reader = ConfigManager(str(config_dir.parent))
+    reader.start_watching(debounce=0)
+    api = NukiAPI(reader)
+    api.user_cache = {1: 'Alice'}
+    notifier = Notifier(reader)
+    assert notifier.dispatch.max_retries == 3
+
+    # Settings changed by another process reach the notifier; the user cache survives
+    writer.apply_changes({'advanced': {'max_retries': 5, 'user_cache_timeout': 60}})
+    assert reader.wait_for_changes(2) is True
+    api._sync_config()
+    notifier._sync_config()
+    assert notifier.dispatch.max_retries == 5
+    assert api.user_cache_timeout == 60
+    assert api.user_cache == {1: 'Alice'}
+
+    # A new API token drops it
+    writer.apply_changes({'nuki': {'api_token': 'second_token'}})
+    assert reader.wait_for_changes(2) is True
+    api._sync_config()
+    assert api.user_cache == {}
+    reader.watcher.close()
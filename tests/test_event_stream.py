@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+
+# Add scripts to path so we can import nuki
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from nuki.event_stream import EventStream, StreamConsumer
+
+
+def event(n):
+    return {'event_id': n, 'lock_id': 1, 'user_name': 'Alice', 'event_type': 'Unlock',
+            'date': f"2025-01-06 10:{n:02d}:00"}
+
+
+def make_consumer(tmp_path):
+    return StreamConsumer(str(tmp_path / 'events.jsonl'), str(tmp_path / 'offset.json'))
+
+
+def test_events_are_delivered_once_in_order(tmp_path):
+    stream = EventStream(str(tmp_path / 'events.jsonl'))
+    consumer = make_consumer(tmp_path)
+    stream.publish([event(1), event(2)])
+    stream.publish([event(3)])
+
+    seen = []
+    assert consumer.consume(seen.append) == 3
+    assert consumer.consume(seen.append) == 0
+    assert [e['event_id'] for e in seen] == [1, 2, 3]
+
+
+def test_restart_resumes_after_committed_offset(tmp_path):
+    stream = EventStream(str(tmp_path / 'events.jsonl'))
+    consumer = make_consumer(tmp_path)
+    stream.publish([event(n) for n in range(1, 6)])
+    seen = []
+    consumer.consume(seen.append, max_events=2)
+
+    # A new producer continues the sequence, a new consumer continues from the offset
+    EventStream(str(tmp_path / 'events.jsonl')).publish([event(6)])
+    make_consumer(tmp_path).consume(seen.append)
+    assert [e['event_id'] for e in seen] == [1, 2, 3, 4, 5, 6]
+
+
+def test_failed_event_is_redelivered(tmp_path):
+    stream = EventStream(str(tmp_path / 'events.jsonl'))
+    consumer = make_consumer(tmp_path)
+    stream.publish([event(1), event(2)])
+
+    seen = []
+
+    def handler(e):
+        if e['event_id'] == 2 and not seen.count(2):
+            seen.append(2)
+            raise RuntimeError('crashed')
+        seen.append(e['event_id'])
+
+    try:
+        consumer.consume(handler)
+    except RuntimeError:
+        pass
+    make_consumer(tmp_path).consume(handler)
+    assert seen == [1, 2, 2]
+
+
+def test_new_consumer_starts_at_end(tmp_path):
+    stream = EventStream(str(tmp_path / 'events.jsonl'))
+    stream.publish([event(1)])
+    consumer = make_consumer(tmp_path)
+    stream.publish([event(2)])
+
+    seen = []
+    consumer.consume(seen.append)
+    assert [e['event_id'] for e in seen] == [2]
+
+
+def test_rotation_neither_skips_nor_repeats(tmp_path):
+    stream = EventStream(str(tmp_path / 'events.jsonl'), max_bytes=1)
+    consumer = make_consumer(tmp_path)
+    seen = []
+    stream.publish([event(1), event(2)])
+    consumer.consume(seen.append, max_events=1)
+
+    # Rotates before appending; the consumer finishes the old file first
+    stream.publish([event(3)])
+    consumer.consume(seen.append)
+    stream.publish([event(4)])
+    consumer.consume(seen.append)
+    assert [e['event_id'] for e in seen] == [1, 2, 3, 4]
+    assert os.path.exists(str(tmp_path / 'events.jsonl.1'))
+
+
+def test_partial_line_waits_for_the_rest(tmp_path):
+    path = tmp_path / 'events.jsonl'
+    consumer = make_consumer(tmp_path)
+    line = json.dumps({'seq': 1, 'event': event(1)})
+    path.write_text(line[:10])
+
+    seen = []
+    assert consumer.consume(seen.append) == 0
+    path.write_text(line + '\n')
+    assert consumer.consume(seen.append) == 1
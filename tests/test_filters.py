@@ -0,0 +1,91 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add scripts to path so we can import nuki
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from nuki.filters import EventFilter, FilterRule, parse_rules, parse_time_range, parse_weekdays
+
+
+def event(**values):
+    # 2025-01-06 is a Monday
+    base = {'lock_name': 'Front Door', 'lock_id': 7, 'event_type': 'Unlock', 'action': 1,
+            'trigger': 0, 'user_name': 'Alice', 'date': '2025-01-06 10:30:00'}
+    base.update(values)
+    return base
+
+
+def make_config(rules='', **values):
+    settings = dict(notify_auto_lock=True, excluded_users=[], excluded_actions=[],
+                    excluded_triggers=[], filter_rules=rules)
+    settings.update(values)
+    return SimpleNamespace(**settings)
+
+
+def test_time_and_weekday_masks():
+    overnight = parse_time_range('22:00-06:30')
+    assert overnight >> (23 * 60) & 1
+    assert overnight >> (6 * 60 + 29) & 1
+    assert not overnight >> (6 * 60 + 30) & 1
+    assert not overnight >> (12 * 60) & 1
+    assert parse_weekdays('mon-fri') == 0b0011111
+    assert parse_weekdays('fri-mon') == 0b1110001
+    assert parse_weekdays('sat,sun') == 0b1100000
+
+
+def test_parse_rule_with_quoted_values():
+    rule = FilterRule.parse('include lock:"Front Door",Garage user:Bob time:08-18 weekday:sat')
+    assert rule.mode == 'include'
+    assert rule.values['lock'] == {'front door', 'garage'}
+    assert rule.values['user'] == {'bob'}
+    assert rule.is_timed
+
+
+def test_invalid_rules_are_dropped():
+    rules = parse_rules("""
+        # comment
+        exclude user:Bob
+        block user:Eve
+        exclude colour:red
+        exclude time:25:00-26:00
+    """)
+    assert [rule.source for rule in rules] == ['exclude user:Bob']
+
+
+def test_legacy_settings_become_exclude_rules():
+    event_filter = EventFilter.from_config(make_config(
+        notify_auto_lock=False, excluded_users=['Bob'], excluded_actions=['2'], excluded_triggers=['Button']))
+    assert event_filter.is_filtered(event(user_name='Auto Lock'))
+    assert event_filter.is_filtered(event(user_name='bob'))
+    assert event_filter.is_filtered(event(action=2, event_type='Lock'))
+    assert event_filter.is_filtered(event(trigger=2))
+    assert not event_filter.is_filtered(event())
+
+
+def test_exclude_rule_with_time_window():
+    event_filter = EventFilter.from_config(make_config(
+        'exclude user:Cleaner weekday:mon-fri time:09:00-12:00'))
+    assert event_filter.is_filtered(event(user_name='Cleaner'))
+    assert not event_filter.is_filtered(event(user_name='Cleaner', date='2025-01-06 13:00:00'))
+    assert not event_filter.is_filtered(event(user_name='Cleaner', date='2025-01-11 10:30:00'))
+    assert not event_filter.is_filtered(event(user_name='Alice'))
+    # Timed rules never match events without a usable date
+    assert not event_filter.is_filtered(event(user_name='Cleaner', date=None))
+
+
+def test_include_rules_restrict_to_matches():
+    event_filter = EventFilter.from_config(make_config(
+        'include lock:7\ninclude action:Unlatch time:22:00-06:00\nexclude user:Bob'))
+    assert not event_filter.is_filtered(event())
+    assert event_filter.is_filtered(event(lock_id=8, lock_name='Garage'))
+    assert not event_filter.is_filtered(event(lock_id=8, lock_name='Garage', event_type='Unlatch',
+                                              action=3, date='2025-01-06 23:15:00'))
+    # Exclude rules win over include rules
+    assert event_filter.is_filtered(event(user_name='Bob'))
+
+
+def test_filter_events_keeps_order():
+    event_filter = EventFilter.from_config(make_config('exclude action:Lock'))
+    events = [event(event_id=1), event(event_id=2, event_type='Lock', action=2), event(event_id=3)]
+    assert [e['event_id'] for e in event_filter.filter_events(events)] == [1, 3]
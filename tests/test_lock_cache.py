@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add scripts to path so we can import nuki
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from nuki.api import NukiAPI
+from nuki.config import ConfigManager
+
+LOCKS = [{'smartlockId': 1, 'name': 'Unit 1', 'type': 4}, {'smartlockId': 2, 'name': 'Unit 2', 'type': 4}]
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    (config_dir / "config.ini").write_text("[Advanced]\nlock_cache_timeout = 300\n")
+    (config_dir / "credentials.ini").write_text("[Nuki]\napi_token = first_token\n")
+    monkeypatch.setenv("CONFIG_DIR", str(config_dir))
+    monkeypatch.setenv("DATA_DIR", str(tmp_path / "data"))
+    api = NukiAPI(ConfigManager(str(tmp_path)))
+    api.requests = []
+
+    def make_request(method, url, **kwargs):
+        api.requests.append((method, url))
+        time.sleep(0.01)
+        return [dict(lock) for lock in api.locks] if api.locks is not None else None
+
+    api.locks = LOCKS
+    monkeypatch.setattr(api, '_make_request', make_request)
+    return api
+
+
+def test_inventory_is_cached(api):
+    assert api.get_lock_inventory() == LOCKS
+    assert api.get_default_lock_id() == 1
+    assert api.get_lock_info(2) == {'name': 'Unit 2', 'type': 4}
+    assert api.get_lock_info(3) is None
+    assert len(api.requests) == 1
+
+    # A shorter max_age refreshes; a live fetch refreshes the cache for everyone
+    api.lock_cache_timestamp -= 20
+    api.get_lock_inventory(max_age=10)
+    assert len(api.requests) == 2
+    api.get_smartlocks()
+    api.get_lock_inventory(max_age=0.5)
+    assert len(api.requests) == 3
+
+
+def test_concurrent_misses_share_one_request(api):
+    threads = [threading.Thread(target=api.get_lock_inventory) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(api.requests) == 1
+
+
+def test_stale_inventory_is_used_when_the_api_fails(api):
+    api.get_lock_inventory()
+    api.locks = None
+    assert api.get_lock_inventory(max_age=0) == LOCKS
+    api.invalidate_locks()
+    assert api.get_lock_inventory() == []
+
+
+def test_config_change_invalidates_inventory(api):
+    api.get_lock_inventory()
+    api.config.apply_changes({'advanced': {'lock_cache_timeout': 60}})
+    assert api.get_lock_inventory() == LOCKS
+    assert api.lock_cache_timeout == 60
+    assert len(api.requests) == 2
+
+
+def test_unknown_lock_refreshes_at_most_once_per_interval(api):
+    assert api.get_lock_info(1) == {'name': 'Unit 1', 'type': 4}
+    api.locks = LOCKS + [{'smartlockId': 3, 'name': 'Unit 3', 'type': 4}]
+    # Just fetched: an unknown id doesn't refetch yet
+    assert api.get_lock_info(3) is None
+    assert len(api.requests) == 1
+
+    api.lock_cache_timestamp -= api.lock_refresh_interval
+    assert api.get_lock_info(3) == {'name': 'Unit 3', 'type': 4}
+    assert api.get_lock_info(4) is None
+    assert len(api.requests) == 2
+
+
+def test_account_without_locks_is_cached(api):
+    api.locks = []
+    assert api.get_lock_inventory() == []
+    assert api.get_default_lock_id() is None
+    assert api.get_lock_info(1) is None
+    assert len(api.requests) == 1
@@ -0,0 +1,74 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add scripts to path so we can import nuki
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from nuki.notification import Notifier
+from nuki.templates import TemplateRenderer
+
+EVENT = {
+    'lock_name': 'Front <Door>',
+    'lock_id': 1,
+    'event_type': 'Unlock',
+    'action': 1,
+    'trigger': 4,
+    'user_name': 'Alice',
+    'date': '2025-01-01 10:00:00'
+}
+
+
+def make_config(**overrides):
+    values = dict(use_html_email=True, telegram_use_emoji=True, telegram_format='detailed', template_dir=None)
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_single_messages_render_event_fields():
+    notifier = Notifier(make_config())
+
+    html = notifier._build_single_email(EVENT)
+    assert 'Front &lt;Door&gt;' in html
+    assert '<span class="label">Trigger:</span> App' in html
+    assert 'font-family: Arial' in html
+
+    telegram = notifier._build_single_telegram(EVENT)
+    assert telegram.startswith('🔔 *Nuki Lock Alert*')
+    assert '📱 Trigger: App' in telegram
+
+
+def test_compact_telegram_without_emoji():
+    notifier = Notifier(make_config(telegram_use_emoji=False, telegram_format='compact'))
+
+    assert notifier._build_single_telegram(EVENT) == (
+        "Nuki Lock Alert: Unlock by Alice on Front <Door> at 2025-01-01 10:00:00 (App)"
+    )
+
+
+def test_digest_renders_every_event():
+    notifier = Notifier(make_config(use_html_email=False))
+    events = [dict(EVENT, user_name=f"User {i}", trigger=99) for i in range(3)]
+
+    text = notifier._build_digest_email(events)
+    assert text.count('-----------------------') == 3
+    assert 'Trigger: Unknown (99)' in text
+
+
+def test_override_directory_takes_precedence(tmp_path):
+    (tmp_path / 'single_telegram.txt').write_text('Custom: {{ event["user_name"] }}')
+
+    renderer = TemplateRenderer(str(tmp_path))
+
+    assert renderer.render('single_telegram.txt', event=EVENT) == 'Custom: Alice'
+    assert 'Nuki Lock Alert' in renderer.render('single_email.txt', event=EVENT)
+
+
+def test_overrides_can_use_jinja_globals(tmp_path):
+    (tmp_path / 'single_telegram.txt').write_text(
+        '{% set ns = namespace(n=0) %}{% for i in range(3) %}{% set ns.n = ns.n + i %}{% endfor %}{{ ns.n }}'
+    )
+
+    renderer = TemplateRenderer(str(tmp_path))
+
+    assert renderer.render('single_telegram.txt', event=EVENT) == '3'
@@ -0,0 +1,121 @@
+import os
+import sys
+import configparser
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Add scripts to path so we can import nuki
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from nuki.filters import EventFilter
+from nuki.notification import Notifier
+from nuki.recipients import RecipientRegistry, parse_hours
+
+CONFIG = """
+[Recipient:unit1]
+email = unit1@example.com
+channels = email
+locks = Unit 1
+
+[Recipient:night]
+email = night@example.com
+telegram_chat_id = 42
+actions = Unlock
+quiet_hours = 8-20
+
+[Recipient:telegram-only]
+telegram_chat_id = 99
+channels = telegram
+users = Bob
+"""
+
+
+def make_config():
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read_string(CONFIG)
+    return SimpleNamespace(
+        config=parser,
+        notification_type='email',
+        email_recipient='owner@example.com',
+        telegram_chat_id='',
+        use_html_email=False,
+        telegram_use_emoji=True,
+        telegram_format='detailed',
+        template_dir=None,
+        email_subject_prefix='Nuki',
+        email_sender='nuki@example.com',
+        smtp_server='smtp.example.com',
+        smtp_port=587,
+        email_username='user',
+        email_password='secret',
+        telegram_bot_token='token',
+        notify_auto_lock=True,
+        excluded_users=[],
+        excluded_actions=[],
+        excluded_triggers=[],
+        event_filter=EventFilter([])
+    )
+
+
+def event(**values):
+    base = {'lock_name': 'Unit 1', 'lock_id': 7, 'event_type': 'Unlock', 'action': 1,
+            'trigger': 4, 'user_name': 'Alice', 'date': '2025-01-01 10:00:00'}
+    base.update(values)
+    return base
+
+
+def names(registry, mask):
+    return [recipient.name for recipient in registry.members(mask)]
+
+
+def test_parse_hours_spanning_midnight():
+    assert parse_hours('22-2') == {22, 23, 0, 1}
+    assert parse_hours('') == frozenset()
+
+
+def test_match_applies_per_recipient_filters():
+    registry = RecipientRegistry.from_config(make_config())
+
+    assert names(registry, registry.match(event(), hour=22)) == ['default', 'unit1', 'night']
+    assert names(registry, registry.match(event(lock_name='Unit 2', lock_id=8), hour=22)) == ['default', 'night']
+    assert names(registry, registry.match(event(event_type='Lock', action=2, user_name='bob'), hour=22)) == ['default', 'unit1', 'telegram-only']
+
+
+def test_match_respects_quiet_hours():
+    registry = RecipientRegistry.from_config(make_config())
+
+    assert 'night' not in names(registry, registry.match(event(), hour=12))
+
+
+def test_send_notification_uses_one_smtp_session_for_all_recipients():
+    notifier = Notifier(make_config())
+    notifier.recipients.match = lambda evt, hour=None: notifier.recipients.all_mask
+    notifier.channels.http = MagicMock()
+    notifier.channels.http.post.return_value.status_code = 200
+
+    with patch('smtplib.SMTP') as smtp:
+        assert notifier.send_notification(event())
+
+    assert smtp.call_count == 1
+    recipients = [call.args[1] for call in smtp.return_value.sendmail.call_args_list]
+    assert recipients == ['owner@example.com', 'unit1@example.com', 'night@example.com']
+    chats = [call.kwargs['data']['chat_id'] for call in notifier.channels.http.post.call_args_list]
+    assert chats == ['42', '99']
+
+
+def test_system_notifications_skip_filters_and_recipient_rules():
+    config = make_config()
+    config.event_filter = SimpleNamespace(is_filtered=lambda evt: True)
+    notifier = Notifier(config)
+    notifier.channels.http = MagicMock()
+    notifier.channels.http.post.return_value.status_code = 200
+    warning = event(lock_name='Unit 2', event_type='Battery critical in ~5 days', action=None,
+                    trigger=None, user_name='Battery Monitor')
+
+    with patch('smtplib.SMTP') as smtp:
+        assert notifier.send_system_notification(warning)
+
+    recipients = [call.args[1] for call in smtp.return_value.sendmail.call_args_list]
+    assert recipients == ['owner@example.com', 'unit1@example.com', 'night@example.com']
+    chats = [call.kwargs['data']['chat_id'] for call in notifier.channels.http.post.call_args_list]
+    assert chats == ['42', '99']
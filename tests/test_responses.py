@@ -0,0 +1,25 @@
+import os
+import sys
+import json
+
+import pytest
+from flask import Flask
+
+sys.path.append(os.getcwd())
+
+from web import responses
+from web.responses import json_response
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_json_response(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(responses, 'orjson', None)
+    elif responses.orjson is None:
+        pytest.skip('orjson not installed')
+    app = Flask(__name__)
+    with app.app_context():
+        response = json_response([{'id': 1, 'name': 'Front Door', 'battery_history': [[0, 80]]}], status=201)
+    assert response.status_code == 201
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data()) == [{'id': 1, 'name': 'Front Door', 'battery_history': [[0, 80]]}]
@@ -0,0 +1,113 @@
+import os
+import sys
+import configparser
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+# Add repository root and scripts to path so we can import security and nuki
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from security.baseline import HourOfWeekBaseline, hour_of_week
+from security.event_store import EventStore, EVENT_LOG_NAME
+from security.security_monitor import SecurityMonitor
+
+DAY = 86400
+MONDAY_9AM = datetime(2025, 1, 6, 9, 0, 0, tzinfo=timezone.utc)
+
+
+def weekday_mornings(weeks, user_name='Alice', lock_id=1):
+    """Unlocks at 09:00 every weekday"""
+    for day in range(weeks * 7):
+        date = MONDAY_9AM + timedelta(days=day)
+        if date.weekday() < 5:
+            yield {'event_type': 'Unlock', 'user_name': user_name, 'lock_id': lock_id,
+                   'lock_name': 'Front Door', 'date': date.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def test_hour_of_week():
+    assert hour_of_week(MONDAY_9AM) == 9
+    assert hour_of_week(datetime(2025, 1, 12, 23, 59)) == 167
+
+
+def test_probability_and_decay():
+    baseline = HourOfWeekBaseline(half_life_days=7, alpha=0.1)
+    assert baseline.probability('alice', 9, 0) is None
+
+    for i in range(10):
+        baseline.update('alice', 9, i * 60)
+    assert baseline.weight('alice', 600) > 9.9
+    assert baseline.probability('alice', 9, 600) > 0.35
+    assert baseline.probability('alice', 10, 600) < 0.004
+
+    # A week later every access counts half
+    assert abs(baseline.weight('alice', 7 * DAY + 270) - 5.0) < 0.01
+
+
+def test_rebase_keeps_probabilities():
+    baseline = HourOfWeekBaseline(half_life_days=1)
+    baseline.update('alice', 9, 0)
+    baseline.update('alice', 10, 0)
+    # 30 half-lives later the new weight overflows MAX_WEIGHT and the profile is rebased
+    baseline.update('alice', 10, 30 * DAY)
+    profile = baseline.profiles['alice']
+    assert profile.origin == 30 * DAY
+    assert abs(baseline.weight('alice', 30 * DAY) - 1.0) < 1e-6
+
+
+def test_save_and_load(tmp_path):
+    baseline = HourOfWeekBaseline(half_life_days=14)
+    baseline.update(('Alice', 1), 9, 1000)
+    path = str(tmp_path / 'baseline.json')
+    baseline.save(path)
+
+    loaded = HourOfWeekBaseline.load(path)
+    assert loaded.half_life_days == 14
+    assert loaded.probability(('Alice', 1), 9, 1000) == baseline.probability(('Alice', 1), 9, 1000)
+    assert HourOfWeekBaseline.load(str(tmp_path / 'missing.json')) is None
+
+
+def test_detector_flags_rare_hour_after_training():
+    config = configparser.ConfigParser()
+    config['Security'] = {'baseline_min_events': '15', 'baseline_threshold': '0.002'}
+    monitor = SecurityMonitor(config_manager=SimpleNamespace(config=config))
+    alerts = []
+    monitor.alert_callback = alerts.append
+    monitor._save_alert = lambda alert_data: None
+
+    # Training accepts a generator, so history is streamed rather than loaded
+    assert monitor.pipeline.get('access_baseline').train(weekday_mornings(weeks=6)) == 30
+
+    # Usual time: no alert; Sunday 14:00 has never been used
+    monitor.process_event({'event_type': 'Unlock', 'user_name': 'Alice', 'lock_id': 1,
+                           'lock_name': 'Front Door', 'date': '2025-02-17 09:05:00'})
+    monitor.process_event({'event_type': 'Unlock', 'user_name': 'Alice', 'lock_id': 1,
+                           'lock_name': 'Front Door', 'date': '2025-02-16 14:00:00'})
+    assert [alert['type'] for alert in alerts] == ['access_baseline']
+    assert 'Unusual access time for Alice at Front Door: Sunday 14:00' in alerts[0]['message']
+
+    # Another user at the same hour has no history and isn't flagged
+    monitor.process_event({'event_type': 'Unlock', 'user_name': 'Bob', 'lock_id': 1,
+                           'date': '2025-02-16 14:00:00'})
+    assert len(alerts) == 1
+
+
+def test_monitor_logs_events_and_trains_on_first_start(tmp_path):
+    store = EventStore(str(tmp_path / EVENT_LOG_NAME))
+    for event in weekday_mornings(weeks=2):
+        store.append(event)
+    store.close()
+
+    config = configparser.ConfigParser()
+    config['Security'] = {'baseline_min_events': '5'}
+    monitor = SecurityMonitor(config_manager=SimpleNamespace(config=config, data_dir=str(tmp_path)))
+    monitor._save_alert = lambda alert_data: None
+    detector = monitor.pipeline.get('access_baseline')
+    assert len(detector.baseline) == 1
+    assert detector.baseline.weight(('Alice', 1), MONDAY_9AM.timestamp() + 13 * DAY) > 8
+
+    monitor.process_event({'event_type': 'Lock', 'user_name': 'Alice', 'lock_id': 1,
+                           'date': '2025-01-20 09:10:00'})
+    monitor.close()
+    assert len(list(EventStore(str(tmp_path / EVENT_LOG_NAME)))) == 11
+    assert os.path.exists(tmp_path / 'security_baseline.json')
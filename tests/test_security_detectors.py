@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+from datetime import datetime, timezone
+
+# Add repository root and scripts to path so we can import security and nuki
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from security.detectors import Detector, DetectorPipeline, Finding
+
+
+class NightOwlDetector(Detector):
+    """Test plugin: alerts on every unlock by Owl"""
+
+    event_types = {'unlock'}
+    fields = ('lock_id',)
+
+    def process(self, context):
+        if context.user_name != 'Owl':
+            return []
+        return [Finding(self.name, f"Owl at {context.event['lock_id']}")]
+
+
+def event(time, event_type='Unlock', user_name='Alice', **values):
+    return dict({'id': time, 'event_type': event_type, 'user_name': user_name,
+                 'date': f"2025-01-06 {time}"}, **values)
+
+
+def timestamp(time):
+    return datetime.strptime(f"2025-01-06 {time}", '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+
+
+def test_pipeline_uses_configured_order_and_plugins(make_monitor):
+    sys.path.append(os.path.dirname(__file__))
+    monitor, alerts = make_monitor(sections={'Detectors': {'night_owl': 'test_security_detectors:NightOwlDetector'}},
+                                   detectors='night_owl, rapid_access, bogus', rapid_access_threshold='2')
+    assert [d.name for d in monitor.pipeline.detectors] == ['night_owl', 'rapid_access']
+
+    monitor.process_event(event('10:00:00', user_name='Owl', lock_id=1))
+    monitor.process_event(event('10:00:10', user_name='Owl', lock_id=1))
+    assert [alert['type'] for alert in alerts] == ['night_owl', 'night_owl', 'rapid_access']
+
+
+def test_pipeline_dispatches_only_relevant_events(make_monitor):
+    monitor, _ = make_monitor()
+    monitor.process_event(event('10:00:00', 'Lock'))
+    monitor.process_event(event('10:00:05', 'Failed Unlock'))
+    monitor.process_event(event('10:00:10', lock_id=3))
+
+    stats = monitor.get_detector_stats()
+    assert stats['failed_attempts']['events'] == 1
+    assert stats['unusual_hours']['events'] == 1
+    assert stats['rapid_access']['events'] == 2
+    # Needs a lock_id, which only the last event has
+    assert stats['door_left_unlocked']['events'] == 1
+    # Needs an auth_id
+    assert stats['code_reuse']['events'] == 0
+    assert stats['rapid_access']['alerts'] == 0
+    assert stats['rapid_access']['total_ms'] >= 0
+
+
+def test_door_left_unlocked(make_monitor):
+    monitor, alerts = make_monitor(door_left_unlocked_minutes='10')
+    monitor.process_event(event('10:00:00', lock_id=1, lock_name='Front Door'))
+    monitor.process_event(event('10:01:00', lock_id=2))
+    monitor.process_event(event('10:05:00', 'Lock', lock_id=2))
+
+    monitor.check_timers(timestamp('10:09:59'))
+    assert alerts == []
+    monitor.check_timers(timestamp('10:10:00'))
+    assert [alert['type'] for alert in alerts] == ['door_left_unlocked']
+    assert alerts[0]['message'].startswith('Security Notice: Front Door has been unlocked for 10 minutes')
+    assert alerts[0]['user'] == 'Alice'
+
+    # Reported once per unlock
+    monitor.check_timers(timestamp('10:30:00'))
+    assert len(alerts) == 1
+
+
+def test_code_reuse_across_locks(make_monitor):
+    monitor, alerts = make_monitor(code_reuse_locks='3', code_reuse_window='300')
+    monitor.process_event(event('10:00:00', auth_id=9, lock_id=1))
+    monitor.process_event(event('10:01:00', auth_id=9, lock_id=2))
+    monitor.process_event(event('10:01:30', auth_id=9, lock_id=2))
+    # Another code on a third lock doesn't count
+    monitor.process_event(event('10:02:00', auth_id=8, lock_id=3))
+    assert alerts == []
+
+    monitor.process_event(event('10:03:00', auth_id=9, lock_id=3))
+    assert [alert['type'] for alert in alerts] == ['code_reuse']
+
+    # Lock 1 has left the window, so a fourth lock only makes three again
+    monitor.process_event(event('10:05:01', auth_id=9, lock_id=4))
+    assert len(alerts) == 2
+
+
+def test_failed_attempts_across_locks(make_monitor):
+    monitor, alerts = make_monitor(detectors='cross_lock', cross_lock_failure_locks='3',
+                                   cross_lock_failure_window='60')
+    monitor.process_event(event('10:00:00', 'Failed Unlock', user_name='A', lock_id=1))
+    monitor.process_event(event('10:00:10', 'Failed Unlock', user_name='B', lock_id=2))
+    monitor.process_event(event('10:00:20', 'Failed Unlock', user_name='C', lock_id=2))
+    assert alerts == []
+
+    monitor.process_event(event('10:00:30', 'Failed Unlock', user_name='D', lock_id=3))
+    assert [alert['type'] for alert in alerts] == ['cross_lock']
+    assert alerts[0]['message'] == 'Security Alert: Failed access attempts on 3 different locks within 60 seconds.'
+
+    # Spread out over more than the window, failures don't correlate
+    monitor.process_event(event('10:05:00', 'Failed Unlock', lock_id=4))
+    monitor.process_event(event('10:07:00', 'Failed Unlock', lock_id=5))
+    assert len(alerts) == 1
+
+
+def test_inner_lock_opened_without_passing_outer_lock(make_monitor):
+    monitor, alerts = make_monitor(detectors='cross_lock', cross_lock_sequence='1>2, 1>3',
+                                   cross_lock_sequence_window='600')
+    # Through the entrance, then the apartment door
+    monitor.process_event(event('10:00:00', auth_id=9, lock_id=1))
+    monitor.process_event(event('10:02:00', auth_id=9, lock_id=2))
+    assert alerts == []
+
+    # A code that never opened the entrance
+    monitor.process_event(event('10:03:00', user_name='Mallory', auth_id=7, lock_id=3))
+    # The entrance use is too long ago
+    monitor.process_event(event('10:30:00', auth_id=9, lock_id=2))
+    assert [alert['user'] for alert in alerts] == ['Mallory', 'Alice']
+
+
+def test_temp_code_used_after_expiry(tmp_path, make_monitor):
+    codes = {
+        '1700000000': {'code': '123456', 'name': 'Cleaner', 'auth_id': 42,
+                       'created_at': '2025-01-06T08:00:00+00:00', 'expiry': '2025-01-06T12:00:00Z',
+                       'is_active': True}
+    }
+    (tmp_path / 'temp_codes.json').write_text(json.dumps(codes))
+    monitor, alerts = make_monitor(data_dir=str(tmp_path), temp_code_grace='60')
+
+    monitor.process_event(event('11:59:00', user_name='Cleaner', auth_id=42))
+    monitor.process_event(event('12:00:59', user_name='Cleaner', auth_id=42))
+    monitor.process_event(event('07:00:00', user_name='Somebody', auth_id=7))
+    assert alerts == []
+
+    monitor.process_event(event('12:01:01', user_name='Cleaner', auth_id=42))
+    monitor.process_event(event('07:58:00', user_name='Cleaner', auth_id=42))
+    assert [alert['message'] for alert in alerts] == [
+        "Security Alert: Temporary code 'Cleaner' used after it expired. Time: 2025-01-06 12:01:01",
+        "Security Alert: Temporary code 'Cleaner' used before it was issued. Time: 2025-01-06 07:58:00"
+    ]
+
+
+def test_failing_detector_does_not_stop_pipeline(make_monitor):
+    class Broken(Detector):
+        name = 'broken'
+
+        def process(self, context):
+            raise RuntimeError('boom')
+
+    monitor, alerts = make_monitor(rapid_access_threshold='1')
+    monitor.pipeline = DetectorPipeline([Broken()] + monitor.pipeline.detectors)
+    monitor.process_event(event('10:00:00'))
+    assert [alert['type'] for alert in alerts] == ['rapid_access']
+    assert monitor.get_detector_stats()['broken']['alerts'] == 0
@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+# Add repository root and scripts to path so we can import security and nuki
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from security.door_state import DoorStateTracker, LOCKED, UNLOCKED, UNLATCHED
+
+
+@pytest.fixture
+def security_settings():
+    return {'detectors': 'door_left_unlocked'}
+
+
+def timestamp(time):
+    return datetime.strptime(f"2025-01-06 {time}", '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+
+
+def status(time, state, lock_id=1, **values):
+    return dict({'event_type': 'Lock State', 'lock_id': lock_id, 'lock_name': 'Front Door',
+                 'state': state, 'date': f"2025-01-06 {time}"}, **values)
+
+
+def test_tracker_durations_and_single_timer_per_unlock():
+    tracker = DoorStateTracker(limit=600)
+    tracker.transition(1, LOCKED, 0)
+    tracker.transition(1, UNLOCKED, 100)
+    # Unlatching while unlocked keeps the running timer
+    tracker.transition(1, UNLATCHED, 200)
+    assert tracker.pop_due(699) == []
+    assert [lock.lock_id for lock in tracker.pop_due(700)] == [1]
+    assert tracker.pop_due(10000) == []
+
+    lock = tracker.get(1)
+    assert lock.duration(LOCKED, 1000) == 100
+    assert lock.duration(UNLOCKED, 1000) == 100
+    assert lock.duration(UNLATCHED, 1000) == 800
+
+
+def test_tracker_cancels_and_compacts_timers():
+    tracker = DoorStateTracker(limit=600)
+    for lock_id in range(500):
+        tracker.transition(lock_id, UNLOCKED, 0)
+    for lock_id in range(400):
+        tracker.transition(lock_id, LOCKED, 10)
+    # Cancelled timers are dropped from the heap rather than scanned
+    assert len(tracker.timers) <= 250
+    assert sorted(lock.lock_id for lock in tracker.pop_due(600)) == list(range(400, 500))
+
+
+def test_tracker_limit_change_reschedules():
+    tracker = DoorStateTracker(limit=600)
+    tracker.transition(1, UNLOCKED, 0)
+    tracker.set_limit(60)
+    assert [lock.lock_id for lock in tracker.pop_due(60)] == [1]
+
+
+def test_status_readings_drive_the_state_machine(make_monitor):
+    monitor, alerts = make_monitor(door_left_unlocked_minutes='10')
+    monitor.process_event(status('10:00:00', 3, door_state=3, battery_critical=False))
+    # Unlocking (2) is a transition and doesn't change the tracked state
+    monitor.process_event(status('10:02:00', 2))
+    monitor.check_timers(timestamp('10:10:00'))
+
+    assert len(alerts) == 1
+    assert alerts[0]['message'] == ('Security Notice: Front Door has been unlocked for 10 minutes '
+                                    'since 10:00:00. The door is open.')
+
+    states = monitor.pipeline.get('door_left_unlocked').get_lock_states(timestamp('10:15:00'))
+    assert states[1]['state'] == UNLOCKED
+    assert states[1]['door_state'] == 'open'
+    assert states[1]['battery_critical'] is False
+    assert states[1]['seconds_in_state'] == 900
+
+
+def test_status_lock_cancels_event_unlock(make_monitor):
+    monitor, alerts = make_monitor(door_left_unlocked_minutes='10')
+    monitor.process_event({'event_type': 'Unlock', 'user_name': 'Alice', 'lock_id': 1,
+                           'date': '2025-01-06 10:00:00'})
+    monitor.process_event(status('10:05:00', 1))
+    monitor.check_timers(timestamp('10:30:00'))
+    assert alerts == []
+
+
+def test_timers_use_utc_event_time_under_local_timezone(monkeypatch, make_monitor):
+    # Event dates are UTC; a local clock on British Summer Time mustn't shift them by an hour
+    monkeypatch.setenv('TZ', 'Europe/London')
+    time.tzset()
+    try:
+        monitor, alerts = make_monitor(door_left_unlocked_minutes='10')
+        monitor.process_event({'event_type': 'Unlock', 'user_name': 'Alice', 'lock_id': 1,
+                               'date': '2025-07-01 10:00:00'})
+        unlocked = datetime(2025, 7, 1, 10, 0, 0, tzinfo=timezone.utc).timestamp()
+        monitor.check_timers(unlocked + 60)
+        assert alerts == []
+        monitor.check_timers(unlocked + 600)
+        assert len(alerts) == 1
+
+        # The default clock agrees with event time
+        monitor, alerts = make_monitor(door_left_unlocked_minutes='10')
+        recent = datetime.now(timezone.utc).timestamp() - 60
+        monitor.process_event({'event_type': 'Unlock', 'user_name': 'Alice', 'lock_id': 1,
+                               'date': datetime.fromtimestamp(recent, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')})
+        monitor.check_timers()
+        assert alerts == []
+    finally:
+        monkeypatch.delenv('TZ')
+        time.tzset()
@@ -0,0 +1,83 @@
+import os
+import sys
+import configparser
+
+# Add repository root and scripts to path so we can import security and nuki
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from nuki.config_watch import ConfigWatcher
+
+
+def reload(monitor, **settings):
+    parser = configparser.ConfigParser()
+    parser['Security'] = dict({'event_log': 'false'}, **settings)
+    monitor.config.config = parser
+    monitor.reload()
+
+
+def failed(time):
+    return {'event_type': 'Failed Unlock', 'user_name': 'Alice', 'lock_id': 1,
+            'date': f"2025-01-06 {time}"}
+
+
+def test_watcher_reports_settled_changes_once(tmp_path):
+    path = tmp_path / 'config.ini'
+    path.write_text('[Security]\n')
+    watcher = ConfigWatcher([str(path)], debounce=2)
+    assert watcher.poll(now=0) is False
+
+    path.write_text('[Security]\nfailed_attempts_threshold = 5\n')
+    os.utime(path, ns=(1, 1))
+    assert watcher.poll(now=10) is False
+    # A second write within the debounce period restarts it
+    path.write_text('[Security]\nfailed_attempts_threshold = 6\n')
+    os.utime(path, ns=(2, 2))
+    assert watcher.poll(now=11) is False
+    assert watcher.poll(now=12.5) is False
+    assert watcher.poll(now=13) is True
+    assert watcher.poll(now=20) is False
+
+
+def test_watcher_notices_created_and_deleted_files(tmp_path):
+    path = tmp_path / 'security.ini'
+    watcher = ConfigWatcher([str(path)], debounce=0)
+    path.write_text('[Security]\n')
+    watcher.poll(now=0)
+    assert watcher.poll(now=0) is True
+    path.unlink()
+    watcher.poll(now=1)
+    assert watcher.poll(now=1) is True
+
+
+def test_reload_keeps_window_state(make_monitor):
+    monitor, alerts = make_monitor(detectors='failed_attempts', failed_attempts_threshold='3')
+    detector = monitor.pipeline.get('failed_attempts')
+    monitor.process_event(failed('10:00:00'))
+    monitor.process_event(failed('10:01:00'))
+    assert alerts == []
+
+    # Lowering the threshold applies to the failures already counted
+    reload(monitor, detectors='failed_attempts', failed_attempts_threshold='2')
+    assert monitor.pipeline.get('failed_attempts') is detector
+    assert detector.threshold == 2
+    monitor.process_event(failed('10:02:00'))
+    assert [alert['type'] for alert in alerts] == ['failed_attempts']
+
+
+def test_reload_adds_and_removes_detectors(make_monitor):
+    monitor, alerts = make_monitor(detectors='failed_attempts, rapid_access')
+    rapid = monitor.pipeline.get('rapid_access')
+    closed = []
+    rapid.close = lambda: closed.append(True)
+
+    reload(monitor, detectors='rapid_access, door_left_unlocked', cleanup_interval='60')
+    assert [d.name for d in monitor.pipeline.detectors] == ['rapid_access', 'door_left_unlocked']
+    assert monitor.pipeline.get('rapid_access') is rapid
+    assert closed == []
+    assert monitor.sweeper.counters == [rapid.window]
+    assert monitor.sweeper.interval == 60
+
+    reload(monitor, detectors='door_left_unlocked')
+    assert closed == [True]
+    assert list(monitor.get_detector_stats()) == ['door_left_unlocked']
@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+from types import SimpleNamespace
+
+# Add repository root and scripts to path so we can import security and nuki
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from security import replay as replay_cli
+from security.replay import ReplayMonitor, load_settings, replay
+
+
+def event(time, event_type='Unlock', user_name='Alice', **values):
+    return dict({'event_type': event_type, 'user_name': user_name, 'lock_id': 1,
+                 'lock_name': 'Front Door', 'date': f"2025-01-06 {time}"}, **values)
+
+
+HISTORY = [
+    event('10:00:00', 'Failed Unlock'),
+    event('10:01:00', 'Failed Unlock'),
+    event('10:02:00', 'Failed Unlock'),
+    event('not a date'),
+    event('12:00:00'),
+    event('12:50:00', 'Lock', user_name='Bob')
+]
+
+
+def make_monitor(*overrides):
+    settings = load_settings(overrides=('detectors=failed_attempts, door_left_unlocked',) + overrides)
+    return ReplayMonitor(SimpleNamespace(config=settings, data_dir=None))
+
+
+def test_replay_uses_simulated_time():
+    monitor = make_monitor()
+    result = replay(monitor, iter(HISTORY))
+    assert result['processed'] == 5
+    assert result['skipped'] == 1
+
+    # The door alert fires at the first tick 30 minutes after the unlock, not at the next event
+    assert [(alert['type'], alert['timestamp']) for alert in monitor.alerts] == [
+        ('failed_attempts', '2025-01-06 10:02:00'),
+        ('door_left_unlocked', '2025-01-06 12:30:00')
+    ]
+    assert monitor.alert_callback is None
+
+
+def test_replay_with_overridden_thresholds():
+    monitor = make_monitor('failed_attempts_threshold=4', 'door_left_unlocked_minutes=60')
+    replay(monitor, iter(HISTORY))
+    assert monitor.alerts == []
+
+
+def test_replay_does_not_log_events():
+    settings = load_settings(overrides=('event_log=true',))
+    assert settings.getboolean('Security', 'event_log') is False
+    monitor = ReplayMonitor(SimpleNamespace(config=settings, data_dir=None))
+    assert monitor.event_store is None
+
+
+def test_cli_reports_alerts_and_throughput(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'events.jsonl'
+    path.write_text(''.join(json.dumps(e) + '\n' for e in HISTORY))
+    monkeypatch.setattr(sys, 'argv', ['replay.py', str(path), '--config', str(tmp_path / 'none.ini'),
+                                      '--set', 'detectors=failed_attempts', '--json'])
+    replay_cli.main()
+
+    output = json.loads(capsys.readouterr().out)
+    assert output['summary']['events'] == 5
+    assert output['summary']['alerts_by_type'] == {'failed_attempts': 1}
+    assert output['summary']['events_per_second'] > 0
+    assert output['alerts'][0]['user'] == 'Alice'
@@ -0,0 +1,107 @@
+import os
+import sys
+import configparser
+from types import SimpleNamespace
+
+# Add repository root and scripts to path so we can import security and nuki
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from nuki.filters import EventFilter
+from security.security_alerter import SecurityAlerter
+from security.suppression import AlertSuppressor
+
+
+def alert(user='Alice', lock_id=1, alert_type='rapid_access', message='Rapid access'):
+    return {'type': alert_type, 'user': user, 'message': message,
+            'event': {'lock_id': lock_id, 'lock_name': 'Front Door'}}
+
+
+def make_alerter(**settings):
+    parser = configparser.ConfigParser()
+    parser['Security'] = settings
+    config = SimpleNamespace(
+        config=parser,
+        notification_type='email',
+        email_recipient='owner@example.com',
+        telegram_chat_id='',
+        use_html_email=False,
+        telegram_use_emoji=True,
+        telegram_format='detailed',
+        template_dir=None,
+        email_subject_prefix='Nuki',
+        event_filter=EventFilter([])
+    )
+    alerter = SecurityAlerter(config)
+    sent = []
+    alerter.send_security_notification = lambda subject, data: sent.append(data) or True
+    return alerter, sent
+
+
+def test_repeats_are_suppressed_per_fingerprint():
+    suppressor = AlertSuppressor(window=300)
+    assert suppressor.check(alert(), 0) == (True, 0)
+    assert suppressor.check(alert(), 10) == (False, 0)
+    assert suppressor.check(alert(), 20) == (False, 0)
+    # Different user, lock or type is a different fingerprint
+    assert suppressor.check(alert(user='Bob'), 30) == (True, 0)
+    assert suppressor.check(alert(lock_id=2), 30) == (True, 0)
+    assert suppressor.check(alert(alert_type='failed_attempts'), 30) == (True, 0)
+
+    # The window has passed: send again, reporting the two held back
+    assert suppressor.check(alert(), 300) == (True, 2)
+    assert suppressor.check(alert(), 301) == (False, 0)
+
+
+def test_expire_summarizes_and_evicts():
+    suppressor = AlertSuppressor(window=60)
+    suppressor.check(alert(), 0)
+    suppressor.check(alert(message='Rapid access again'), 30)
+    suppressor.check(alert(user='Bob'), 50)
+    assert suppressor.expire(59) == []
+
+    summaries = suppressor.expire(90)
+    assert [(data['message'], count) for data, count in summaries] == [('Rapid access again', 1)]
+    # Alice went quiet at 30 and is dropped; Bob was seen at 50 and is still tracked
+    assert list(suppressor.entries) == [('rapid_access', 'Bob', 1)]
+    suppressor.expire(110)
+    assert len(suppressor) == 0
+
+
+def test_table_is_bounded():
+    suppressor = AlertSuppressor(window=300, max_entries=3)
+    suppressor.check(alert(user='User 0'), 0)
+    suppressor.check(alert(user='User 0'), 1)
+    for i in range(1, 10):
+        suppressor.check(alert(user=f"User {i}"), 2)
+    assert len(suppressor) == 3
+    # The evicted entry's held-back repeat isn't lost
+    assert [(data['user'], count) for data, count in suppressor.expire(3)] == [('User 0', 1)]
+
+
+def test_alerter_sends_one_alert_per_attack():
+    alerter, sent = make_alerter(alert_suppression_window='300')
+    for second in range(100):
+        alerter.send_alert(alert(), now=1000 + second)
+    assert len(sent) == 1
+
+    assert alerter.flush(now=1299) == 0
+    assert alerter.flush(now=1300) == 1
+    assert len(sent) == 2
+    assert sent[1]['message'] == 'Rapid access (99 more in the last 5 minutes)'
+    assert sent[1]['suppressed_count'] == 99
+
+
+def test_alerter_escalation_count_on_next_alert():
+    alerter, sent = make_alerter(alert_suppression_window='60')
+    alerter.send_alert(alert(), now=0)
+    alerter.send_alert(alert(), now=10)
+    alerter.send_alert(alert(), now=70)
+    assert [data['message'] for data in sent] == ['Rapid access', 'Rapid access (1 more in the last minute)']
+
+
+def test_suppression_can_be_disabled():
+    alerter, sent = make_alerter(alert_suppression_window='0')
+    for second in range(3):
+        alerter.send_alert(alert(), now=second)
+    assert len(sent) == 3
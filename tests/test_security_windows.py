@@ -0,0 +1,111 @@
+import os
+import sys
+
+import pytest
+
+# Add repository root and scripts to path so we can import security and nuki
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), "scripts"))
+
+from security.windows import SlidingWindowCounter, BucketedCounter, ExpirySweeper
+
+
+@pytest.fixture
+def security_settings():
+    return {
+        'failed_attempts_threshold': '3',
+        'failed_attempts_window': '300',
+        'rapid_access_threshold': '3',
+        'rapid_access_window': '60',
+        'unusual_hour_start': '23',
+        'unusual_hour_end': '6',
+        'cleanup_interval': '300'
+    }
+
+
+def event(time, event_type='Unlock', user_name='Alice'):
+    return {'id': time, 'event_type': event_type, 'user_name': user_name, 'date': f"2025-01-06 {time}"}
+
+
+def test_counter_evicts_outside_window():
+    counter = SlidingWindowCounter(window=60)
+    assert counter.add('alice', 0) == 1
+    assert counter.add('alice', 30) == 2
+    # An event exactly one window old has left the window
+    assert counter.add('alice', 60) == 2
+    assert counter.add('alice', 200) == 1
+    assert counter.count('alice', 259) == 1
+    assert counter.count('alice', 260) == 0
+    assert counter.count('bob', 0) == 0
+
+
+def test_counter_clamps_out_of_order_timestamps():
+    counter = SlidingWindowCounter(window=60)
+    counter.add('alice', 100)
+    assert counter.add('alice', 90) == 2
+    assert list(counter.events['alice']) == [100, 100]
+
+
+def test_bucketed_counter_tracks_distinct_keys():
+    counter = BucketedCounter(window=60, bucket=10)
+    assert counter.add('lock 1', 0) == 1
+    assert counter.add('lock 1', 5) == 2
+    assert counter.add('lock 2', 30) == 1
+    assert len(counter) == 2
+    # The bucket [0, 10) ends one window before 70
+    assert counter.count('lock 1', 69) == 2
+    assert counter.count('lock 1', 70) == 0
+    assert len(counter) == 1
+    assert counter.sweep(100) == 1
+    assert len(counter) == 0 and not counter.buckets
+
+
+def test_sweeper_drops_idle_keys_once_per_interval():
+    counter = SlidingWindowCounter(window=60)
+    sweeper = ExpirySweeper([counter], interval=300)
+    counter.add('alice', 0)
+    counter.add('bob', 250)
+    assert sweeper.maybe_sweep(0) == 0
+    assert sweeper.maybe_sweep(299) == 0
+    assert sweeper.maybe_sweep(300) == 1
+    assert list(counter.events) == ['bob']
+    # Next sweep isn't due until 600
+    assert sweeper.maybe_sweep(599) == 0
+    assert len(counter) == 1
+
+
+def test_failed_attempts_alert_within_window(make_monitor):
+    monitor, alerts = make_monitor()
+    monitor.process_event(event('10:00:00', 'Failed Unlock'))
+    monitor.process_event(event('10:02:00', 'Failed Unlock'))
+    assert alerts == []
+    monitor.process_event(event('10:04:59', 'Failed Unlock'))
+    assert [alert['type'] for alert in alerts] == ['failed_attempts']
+    assert '3 attempts in the last 5 minutes' in alerts[0]['message']
+
+    # The first failure has left the window by 10:06:59
+    alerts.clear()
+    monitor.process_event(event('10:05:00', 'Failed Unlock', user_name='Bob'))
+    monitor.process_event(event('10:06:59', 'Failed Unlock'))
+    assert [alert['type'] for alert in alerts] == ['failed_attempts']
+    assert '3 attempts' in alerts[0]['message']
+
+
+def test_rapid_access_is_tracked_per_user(make_monitor):
+    monitor, alerts = make_monitor()
+    for second in range(0, 40, 10):
+        monitor.process_event(event(f"12:00:{second:02d}", user_name=f"User {second}"))
+    assert alerts == []
+
+    for second in range(0, 30, 10):
+        monitor.process_event(event(f"12:01:{second:02d}", 'Lock'))
+    assert [alert['type'] for alert in alerts] == ['rapid_access']
+
+
+def test_idle_users_are_swept_on_event_time(make_monitor):
+    monitor, _ = make_monitor(cleanup_interval='600')
+    monitor.process_event(event('12:00:00', user_name='Alice'))
+    monitor.process_event(event('12:05:00', user_name='Bob'))
+    assert len(monitor.pipeline.get('rapid_access').window) == 2
+    monitor.process_event(event('12:10:00', user_name='Carol'))
+    assert list(monitor.pipeline.get('rapid_access').window.events) == ['Carol']
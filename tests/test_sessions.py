@@ -0,0 +1,93 @@
+import os
+import sys
+import sqlite3
+import time
+
+from flask import Flask, session
+from flask.sessions import SecureCookieSessionInterface
+
+sys.path.append(os.getcwd())
+
+from web.sessions import SqliteSessionInterface, create_session_interface
+
+
+def make_app(tmp_path, **options):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = SqliteSessionInterface(str(tmp_path / 'sessions.db'), **options)
+
+    @app.route('/login')
+    def login():
+        session.permanent = True
+        session['username'] = 'alice'
+        return 'ok'
+
+    @app.route('/page')
+    def page():
+        return session.get('username', '')
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return 'ok'
+
+    return app
+
+
+def rows(tmp_path):
+    with sqlite3.connect(str(tmp_path / 'sessions.db')) as db:
+        return db.execute("SELECT sid, expires FROM sessions").fetchall()
+
+
+def test_unchanged_session_is_not_written(tmp_path):
+    app = make_app(tmp_path)
+    client = app.test_client()
+    response = client.get('/login')
+    assert 'Set-Cookie' in response.headers
+    [(sid, expires)] = rows(tmp_path)
+    assert sid in response.headers['Set-Cookie']
+
+    # Reading the session neither rewrites it nor sends a new cookie
+    response = client.get('/page')
+    assert response.data == b'alice'
+    assert 'Set-Cookie' not in response.headers
+    assert rows(tmp_path) == [(sid, expires)]
+
+    # Anonymous requests store nothing
+    assert app.test_client().get('/page').data == b''
+    assert len(rows(tmp_path)) == 1
+
+
+def test_expiry_is_touched_after_interval(tmp_path):
+    app = make_app(tmp_path, touch_interval=0)
+    client = app.test_client()
+    client.get('/login')
+    [(_, expires)] = rows(tmp_path)
+    time.sleep(0.01)
+    assert 'Set-Cookie' in client.get('/page').headers
+    assert rows(tmp_path)[0][1] > expires
+
+
+def test_logout_deletes_session(tmp_path):
+    app = make_app(tmp_path)
+    client = app.test_client()
+    client.get('/login')
+    client.get('/logout')
+    assert rows(tmp_path) == []
+    assert client.get('/page').data == b''
+
+
+def test_prune_removes_expired_sessions(tmp_path):
+    app = make_app(tmp_path)
+    client = app.test_client()
+    client.get('/login')
+    interface = app.session_interface
+    assert interface.prune(time.time()) == 0
+    assert interface.prune(time.time() + app.permanent_session_lifetime.total_seconds() + 1) == 1
+    assert rows(tmp_path) == []
+
+
+def test_backend_selection(tmp_path):
+    assert isinstance(create_session_interface('cookie', str(tmp_path)), SecureCookieSessionInterface)
+    interface = create_session_interface('sqlite', str(tmp_path))
+    assert interface.path == str(tmp_path / 'sessions.db')
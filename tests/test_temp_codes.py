@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+
+sys.path.append(os.getcwd())
+
+from web.temp_codes import TemporaryCodeDatabase, CodeReaper, add_codes_to_locks, remove_codes_from_locks
+
+
+class FakeAPI:
+    def __init__(self, delay=0):
+        self.removed = []
+        self.delay = delay
+        self.running = 0
+        self.most_running = 0
+        self._lock = threading.Lock()
+
+    def add_temporary_code(self, smartlock_id, code, name, expiry, valid_from=None):
+        with self._lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+        if code == '0000':
+            return {'success': False, 'message': 'Rejected'}
+        return {'success': True, 'auth_id': f"{smartlock_id}-{code}"}
+
+    def get_default_lock_id(self):
+        return 7
+
+    def remove_code(self, smartlock_id, auth_id):
+        self.removed.append((smartlock_id, auth_id))
+        return {'success': True}
+
+
+def add(db, code_id, code, creator, expires_in, **kwargs):
+    expiry = datetime.now() + timedelta(seconds=expires_in)
+    assert db.add_code(code_id, code, f"Guest {code_id}", creator, expiry, **kwargs)
+
+
+def test_indexes(tmp_path):
+    db = TemporaryCodeDatabase(str(tmp_path))
+    add(db, '1', '1234', 'alice', 3600)
+    add(db, '2', '5678', 'bob', 3600)
+    add(db, '3', '9012', 'alice', 3600)
+    assert db.get_code_by_value('5678')['id'] == '2'
+    assert db.get_code_by_value('0000') is None
+    assert [code['id'] for code in db.get_codes_by_creator('alice')] == ['1', '3']
+
+    db.update_code('3', {'code': '4321'})
+    assert db.get_code_by_value('9012') is None
+    assert db.get_code_by_value('4321')['id'] == '3'
+    db.delete_code('1')
+    assert [code['id'] for code in db.get_codes_by_creator('alice')] == ['3']
+
+
+def test_expire_codes_pops_due_codes(tmp_path):
+    db = TemporaryCodeDatabase(str(tmp_path))
+    add(db, '1', '1111', 'alice', 10)
+    add(db, '2', '2222', 'alice', 20)
+    add(db, '3', '3333', 'alice', 30)
+    # Extending a code leaves its old heap entry behind, which is skipped
+    db.update_code('1', {'expiry': (datetime.now() + timedelta(seconds=40)).isoformat()})
+    db.delete_code('3')
+
+    now = time.time()
+    assert db.expire_codes(now) == []
+    assert [code['id'] for code in db.expire_codes(now + 25)] == ['2']
+    assert not db.get_code('2')['is_active']
+    assert db.get_code('1')['is_active']
+    assert db.next_expiry() > now + 35
+    assert [code['id'] for code in db.expire_codes(now + 45)] == ['1']
+    assert db.next_expiry() is None
+
+
+def test_aware_expiry_is_handled(tmp_path):
+    db = TemporaryCodeDatabase(str(tmp_path))
+    db.add_code('1', '1111', 'Guest', 'alice', '2020-01-01T00:00:00+00:00')
+    assert [code['id'] for code in db.expire_codes()] == ['1']
+
+
+def test_reaper_revokes_expired_codes(tmp_path):
+    db = TemporaryCodeDatabase(str(tmp_path))
+    api = FakeAPI()
+    add(db, '1', '1111', 'alice', -1, auth_id='a1', smartlock_id=3)
+    add(db, '2', '2222', 'alice', -1, auth_id='a2')
+    add(db, '3', '3333', 'alice', -1)
+    add(db, '4', '4444', 'alice', 3600, auth_id='a4', smartlock_id=3)
+    assert [code['id'] for code in CodeReaper(db, api).reap()] == ['1', '2', '3']
+    # Codes without a stored lock were added to the first one
+    assert sorted(api.removed) == [(3, 'a1'), (7, 'a2')]
+
+
+def test_reaper_thread_wakes_when_codes_are_due(tmp_path):
+    db = TemporaryCodeDatabase(str(tmp_path))
+    api = FakeAPI()
+    reaper = CodeReaper(db, api)
+    reaper.start()
+    try:
+        add(db, '1', '1111', 'alice', 0.2, auth_id='a1', smartlock_id=3)
+        deadline = time.time() + 5
+        while not api.removed and time.time() < deadline:
+            time.sleep(0.05)
+        assert api.removed == [(3, 'a1')]
+    finally:
+        reaper.stop()
+
+
+def test_code_added_during_a_reap_is_not_missed(tmp_path):
+    db = TemporaryCodeDatabase(str(tmp_path))
+    api = FakeAPI()
+    reaper = CodeReaper(db, api, max_sleep=60)
+    next_expiry = db.next_expiry
+
+    def add_while_reaping():
+        # A code added after the reap looked for the next expiry
+        due = next_expiry()
+        if not db.get_code('1'):
+            add(db, '1', '1111', 'alice', 0.2, auth_id='a1', smartlock_id=3)
+        return due
+
+    db.next_expiry = add_while_reaping
+    reaper.start()
+    try:
+        deadline = time.time() + 5
+        while not api.removed and time.time() < deadline:
+            time.sleep(0.05)
+        assert api.removed == [(3, 'a1')]
+    finally:
+        started = time.monotonic()
+        reaper.stop()
+        assert time.monotonic() - started < 5
+
+
+def test_changes_by_other_processes_are_loaded(tmp_path):
+    db = TemporaryCodeDatabase(str(tmp_path))
+    other = TemporaryCodeDatabase(str(tmp_path))
+    add(other, '1', '1111', 'alice', 3600)
+    assert db.get_code_by_value('1111')['id'] == '1'
+    with open(tmp_path / 'temp_codes.json') as f:
+        assert json.load(f)['1']['code'] == '1111'
+
+
+def test_new_code_ids_are_unique_and_increasing(tmp_path):
+    db = TemporaryCodeDatabase(str(tmp_path))
+    ids = [db.new_code_id() for _ in range(1000)]
+    assert len(set(ids)) == 1000
+    assert [int(code_id) for code_id in ids] == sorted(int(code_id) for code_id in ids)
+
+
+def test_add_codes_writes_once(tmp_path, monkeypatch):
+    db = TemporaryCodeDatabase(str(tmp_path))
+    saves = []
+    save_codes = db._save_codes
+    monkeypatch.setattr(db, '_save_codes', lambda: saves.append(1) or save_codes())
+    expiry = datetime.now() + timedelta(days=1)
+    codes = [{'code_id': db.new_code_id(), 'code': f"{1000 + i}", 'name': f"Unit {i}",
+              'created_by': 'alice', 'expiry': expiry, 'auth_id': i, 'smartlock_id': 3} for i in range(40)]
+    assert db.add_codes(codes)
+    assert saves == [1]
+    assert len(db.get_codes_by_creator('alice')) == 40
+    assert not db.add_codes([{**codes[0], 'name': ''}])
+
+
+def test_lock_calls_are_concurrent_and_bounded():
+    api = FakeAPI(delay=0.05)
+    expiry = datetime.now() + timedelta(days=1)
+    codes = [{'smartlock_id': i % 3, 'code': '0000' if i == 5 else f"{1000 + i}", 'name': f"Unit {i}",
+              'expiry': expiry} for i in range(12)]
+    started = time.monotonic()
+    results = add_codes_to_locks(api, codes, max_workers=4)
+    assert time.monotonic() - started < 0.05 * 12 / 2
+    assert api.most_running == 4
+    assert [result['success'] for result in results] == [i != 5 for i in range(12)]
+    assert results[0]['auth_id'] == '0-1000'
+
+    results = remove_codes_from_locks(api, [{'smartlock_id': 0, 'auth_id': '0-1000'}])
+    assert results == [{'success': True}]
+    assert api.removed == [(0, '0-1000')]
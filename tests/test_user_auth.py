@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import sqlite3
+
+sys.path.append(os.getcwd())
+
+from web.models import UserDatabase
+from web.throttle import LoginThrottle
+
+
+def stored(tmp_path, username, column):
+    with sqlite3.connect(str(tmp_path / 'users.db')) as db:
+        return db.execute(f"SELECT {column} FROM users WHERE username = ?", (username,)).fetchone()[0]
+
+
+def test_login_time_is_written_behind(tmp_path):
+    db = UserDatabase(str(tmp_path), hash_iterations=1000, save_interval=3600)
+    db.add_user('alice', 'secret')
+    assert db.authenticate('alice', 'secret')
+    assert db.dirty
+    assert stored(tmp_path, 'alice', 'last_login') is None
+
+    # Not due yet, then forced (as on shutdown)
+    db.flush()
+    assert stored(tmp_path, 'alice', 'last_login') is None
+    db.flush(force=True)
+    assert stored(tmp_path, 'alice', 'last_login') == db.get_user('alice')['last_login']
+    assert not db.dirty
+
+
+def test_verify_password_does_not_record_login(tmp_path):
+    db = UserDatabase(str(tmp_path), hash_iterations=1000)
+    db.add_user('alice', 'secret')
+    assert db.verify_password('alice', 'secret')
+    assert not db.verify_password('alice', 'wrong')
+    assert db.get_user('alice')['last_login'] is None
+    assert not db.dirty
+
+
+def test_hash_is_upgraded_on_login(tmp_path):
+    UserDatabase(str(tmp_path), hash_iterations=1000).add_user('alice', 'secret')
+    db = UserDatabase(str(tmp_path), hash_iterations=2000)
+    assert stored(tmp_path, 'alice', 'password_hash').startswith('pbkdf2:sha256:1000$')
+    assert not db.authenticate('alice', 'wrong')
+    assert stored(tmp_path, 'alice', 'password_hash').startswith('pbkdf2:sha256:1000$')
+
+    # Written at once, not with the login times
+    assert db.authenticate('alice', 'secret')
+    assert stored(tmp_path, 'alice', 'password_hash').startswith('pbkdf2:sha256:2000$')
+    assert UserDatabase(str(tmp_path), hash_iterations=2000).verify_password('alice', 'secret')
+
+
+def test_rehash_does_not_restore_a_changed_password(tmp_path):
+    UserDatabase(str(tmp_path), hash_iterations=1000).add_user('bob', 'oldpw')
+    first = UserDatabase(str(tmp_path), hash_iterations=2000)
+    second = UserDatabase(str(tmp_path), hash_iterations=2000)
+
+    # A login in one worker rehashes, then the password is changed in another
+    assert first.authenticate('bob', 'oldpw')
+    assert second.update_password('bob', 'newpw')
+    assert not first.verify_password('bob', 'oldpw')
+    first.flush(force=True)
+    fresh = UserDatabase(str(tmp_path), hash_iterations=2000)
+    assert fresh.verify_password('bob', 'newpw')
+    assert not fresh.verify_password('bob', 'oldpw')
+
+    # A rehash racing a password change only replaces the hash it verified
+    UserDatabase(str(tmp_path), hash_iterations=1000).add_user('bob', 'oldpw')
+    old_hash = stored(tmp_path, 'bob', 'password_hash')
+    second.update_password('bob', 'newpw')
+    first.get_user = lambda username: dict(second.get_user(username), password_hash=old_hash)
+    assert first.verify_password('bob', 'oldpw')
+    assert fresh.verify_password('bob', 'newpw')
+    assert not fresh.verify_password('bob', 'oldpw')
+
+
+def test_users_json_is_imported_once(tmp_path):
+    users = {
+        'alice': {'password_hash': 'pbkdf2:sha256:1000$salt$hash', 'role': 'admin', 'active': True,
+                  'created_at': '2024-01-01T00:00:00', 'last_login': None, 'theme': 'light'},
+        'bob': {'password_hash': 'pbkdf2:sha256:1000$salt$hash', 'role': 'agent', 'active': False,
+                'created_at': '2024-01-02T00:00:00', 'last_login': '2024-02-01T00:00:00', 'theme': 'dark'}
+    }
+    (tmp_path / 'users.json').write_text(json.dumps(users))
+    db = UserDatabase(str(tmp_path))
+    assert db.get_user('bob') == users['bob']
+    assert [user['username'] for user in db.get_all_users()] == ['alice', 'bob']
+    assert not (tmp_path / 'users.json').exists()
+    assert (tmp_path / 'users.json.migrated').exists()
+    # No default admin next to imported users
+    assert not db.user_exists('admin')
+
+
+def test_changes_are_shared_between_instances(tmp_path):
+    first = UserDatabase(str(tmp_path), hash_iterations=1000)
+    second = UserDatabase(str(tmp_path), hash_iterations=1000)
+    assert second.get_user('admin')['role'] == 'admin'
+
+    first.add_user('alice', 'secret')
+    first.update_theme('alice', 'light')
+    assert second.get_user('alice')['theme'] == 'light'
+    second.update_active('alice', False)
+    assert not first.verify_password('alice', 'secret')
+    assert [user['username'] for user in first.get_all_users(role='agent', active=False)] == ['alice']
+    assert first.get_all_users(role='admin', active=False) == []
+
+    first.update_role('alice', 'admin')
+    assert second.get_user('alice')['role'] == 'admin'
+    assert first.delete_user('alice')
+    assert not second.user_exists('alice')
+    assert not second.delete_user('admin')
+
+
+def test_throttle_locks_out_with_backoff():
+    throttle = LoginThrottle(max_failures=3, lockout=10, max_lockout=100)
+    for _ in range(2):
+        throttle.failure('10.0.0.1', 'alice', now=0)
+    assert throttle.retry_after('10.0.0.1', 'alice', now=0) == 0
+    throttle.failure('10.0.0.1', 'alice', now=0)
+    assert throttle.retry_after('10.0.0.1', 'alice', now=0) == 10
+    # The username is locked from any address
+    assert throttle.retry_after('10.0.0.2', 'Alice', now=5) == 5
+    throttle.failure('10.0.0.1', 'alice', now=10)
+    assert throttle.retry_after('10.0.0.1', 'alice', now=10) == 20
+
+    # A correct password clears the username, the address keeps its count
+    throttle.success('10.0.0.1', 'alice')
+    assert throttle.retry_after('10.0.0.2', 'alice', now=10) == 0
+    assert throttle.entries[('ip', '10.0.0.1')][0] == 4
+
+    # Entries are forgotten after max_lockout
+    assert throttle.retry_after('10.0.0.1', 'bob', now=200) == 0
+    assert ('ip', '10.0.0.1') not in throttle.entries
+
+
+def test_throttle_table_is_bounded():
+    throttle = LoginThrottle(max_entries=10)
+    for i in range(100):
+        throttle.failure(f"10.0.0.{i}", f"user{i}", now=0)
+    assert len(throttle.entries) == 10
+    assert ('user', 'user99') in throttle.entries
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 import os
 import sys
-import json
 import time
+import atexit
 import logging
 from datetime import datetime, timedelta
 
@@ -11,8 +11,8 @@ os.environ["ALLOW_MISSING_TOKEN"] = "true"
 
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 from functools import wraps
-from flask_session import Session
 
 # Add parent directory to path to import nuki modules
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -21,9 +21,13 @@ sys.path.insert(0, parent_dir)
 from scripts.nuki.config import ConfigManager
 from scripts.nuki.api import NukiAPI
 from scripts.nuki.utils import ActivityTracker
-from web.models import UserDatabase, User
-from web.temp_codes import TemporaryCodeDatabase
+from scripts.nuki.battery import BatteryHistory, BATTERY_HISTORY_NAME
+from web.models import UserDatabase, User, DEFAULT_HASH_ITERATIONS
+from web.throttle import LoginThrottle
+from web.temp_codes import TemporaryCodeDatabase, CodeReaper, add_codes_to_locks, remove_codes_from_locks
 from web.dark_mode import init_app
+from web.sessions import create_session_interface
+from web.responses import json_response
 
 # Configure logging with fallback to console if file logging fails
 log_handlers = []
@@ -60,31 +64,49 @@ if not any(isinstance(h, logging.FileHandler) for h in logger.handlers):
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', os.urandom(24))  # Use persistent secret key if available
-app.config['SESSION_TYPE'] = 'filesystem'
-app.config['SESSION_FILE_DIR'] = os.environ.get('SESSION_FILE_DIR', os.path.join(parent_dir, 'flask_session'))
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)  # Longer session lifetime
 app.config['SESSION_COOKIE_SECURE'] = False  # Allow session on http for development
 app.config['SESSION_COOKIE_HTTPONLY'] = True  # Security best practice
 
-# Initialize Flask-Session
-Session(app)
+# Behind a reverse proxy every request comes from the proxy's address; trust the
+# X-Forwarded-* headers set by that many proxies so login throttling and logs
+# see the real client. Leave at 0 when clients connect directly.
+trusted_proxies = int(os.environ.get('TRUSTED_PROXIES', 0))
+if trusted_proxies:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
 
-# Make sessions permanent by default
+# Make sessions permanent by default; only assigned once, since every
+# assignment marks the session as modified and forces a write
 @app.before_request
 def make_session_permanent():
-    session.permanent = True
+    if request.endpoint in ('static', 'health_check'):
+        return
+    if not session.permanent:
+        session.permanent = True
+
+# Pick up configuration written by another worker or container; with inotify
+# this is one non-blocking read while nothing changed
+@app.before_request
+def refresh_config():
+    config.check_for_changes()
 
 # Check if setup is needed
 @app.before_request
 def check_setup():
     # Allow access to setup page, setup API, and static files
-    if request.endpoint in ['setup', 'api_setup', 'static', 'health']:
+    if request.endpoint in ['setup', 'api_setup', 'static', 'health_check']:
         return
     
     # If not configured, redirect to setup
     if not config.is_configured:
         return redirect(url_for('setup'))
 
+# Write login times recorded by earlier requests once they are due
+@app.after_request
+def flush_users(response):
+    user_db.flush()
+    return response
+
 # Initialize dark mode as default
 init_app(app)
 
@@ -95,10 +117,30 @@ def inject_now():
 
 # Load configuration
 config = ConfigManager(parent_dir)
+config.start_watching()
 api = NukiAPI(config)
+
+# Server-side sessions in SQLite by default, or stateless signed cookies
+app.session_interface = create_session_interface(os.environ.get('SESSION_BACKEND', 'sqlite'), config.data_dir)
+
 tracker = ActivityTracker(config.data_dir)
-user_db = UserDatabase(config.data_dir)
+user_db = UserDatabase(config.data_dir,
+                       hash_iterations=int(os.environ.get('PASSWORD_HASH_ITERATIONS', DEFAULT_HASH_ITERATIONS)))
+# Login times are saved in batches; write what is left on shutdown
+atexit.register(user_db.flush, True)
+login_throttle = LoginThrottle(max_failures=int(os.environ.get('LOGIN_MAX_FAILURES', 5)),
+                               lockout=int(os.environ.get('LOGIN_LOCKOUT', 30)))
 temp_code_db = TemporaryCodeDatabase(config.data_dir)
+# Deactivates temporary codes and removes them from the lock as they expire
+code_reaper = CodeReaper(temp_code_db, api)
+code_reaper.start()
+
+# Seconds the lock state shown by /api/status may be old
+LOCK_STATUS_MAX_AGE = 10
+
+# Limits of POST /api/temp-codes/bulk
+MAX_BULK_CODES = 500
+BULK_CODE_WORKERS = int(os.environ.get('TEMP_CODE_BULK_WORKERS', 4))
 
 # Login required decorator
 def login_required(f):
@@ -159,7 +201,14 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
+        retry_after = login_throttle.retry_after(request.remote_addr, username)
+        if retry_after:
+            logger.warning(f"Login throttled for user '{username}' from {request.remote_addr}")
+            error = f'Too many failed attempts, try again in {int(retry_after) + 1} seconds'
+            return render_template('login.html', error=error), 429, {'Retry-After': str(int(retry_after) + 1)}
+        
         if user_db.authenticate(username, password):
+            login_throttle.success(request.remote_addr, username)
             user_data = user_db.get_user(username)
             session['logged_in'] = True
             session['username'] = username
@@ -172,6 +221,7 @@ def login():
                 return redirect(next_page)
             return redirect(url_for('index'))
         else:
+            login_throttle.failure(request.remote_addr, username)
             error = 'Invalid credentials'
             
     return render_template('login.html', error=error)
@@ -208,7 +258,11 @@ def update_profile():
         
         # Verify current password
         if current_password and new_password:
-            if not user_db.authenticate(username, current_password):
+            retry_after = login_throttle.retry_after(request.remote_addr, username)
+            if retry_after:
+                return jsonify({"error": "Too many failed attempts"}), 429, {'Retry-After': str(int(retry_after) + 1)}
+            if not user_db.verify_password(username, current_password):
+                login_throttle.failure(request.remote_addr, username)
                 return jsonify({"error": "Current password is incorrect"}), 401
             
             # Update password
@@ -361,9 +415,10 @@ def get_activity():
         # Get parameters
         days = int(request.args.get('days', 7))
         limit = int(request.args.get('limit', 50))
+        notified_only = request.args.get('notified', 'false').lower() == 'true'
         
         # Get locks
-        locks = api.get_smartlocks()
+        locks = api.get_lock_inventory()
         if not locks:
             return jsonify({"error": "No smartlocks found"}), 404
         
@@ -372,7 +427,6 @@ def get_activity():
         # Get activity for each lock
         for lock in locks:
             lock_id = lock.get('smartlockId')
-            lock_name = lock.get('name', 'Unknown Lock')
             
             # Get activity logs
             activity = api.get_smartlock_logs(lock_id, limit=limit)
@@ -385,15 +439,15 @@ def get_activity():
                 for event in activity:
                     event_date = api.parse_date(event.get('date'))
                     if event_date and event_date >= cutoff_date:
-                        # Add lock name to event
-                        event['lockName'] = lock_name
+                        # Tag the event with its lock; the name is looked up when it's displayed
+                        event['smartlockId'] = lock_id
                         filtered_activity.append(event)
                 
                 all_activity.extend(filtered_activity)
             else:
-                # Add lock name to events
+                # Tag events with their lock
                 for event in activity:
-                    event['lockName'] = lock_name
+                    event['smartlockId'] = lock_id
                 all_activity.extend(activity)
         
         # Sort by date (newest first)
@@ -408,7 +462,9 @@ def get_activity():
         for event in all_activity:
             # Extract event details
             event_id = event.get('id')
-            lock_name = event.get('lockName', 'Unknown Lock')
+            lock_id = event.get('smartlockId')
+            lock_info = api.get_lock_info(lock_id)
+            lock_name = lock_info['name'] if lock_info else 'Unknown Lock'
             action = event.get('action')
             trigger = event.get('trigger')
             auth_id = event.get('authId')
@@ -426,6 +482,20 @@ def get_activity():
             # Get user name
             user_name = "Auto Lock" if trigger == 6 else api.get_user_name(auth_id) if auth_id else "Unknown User"
             
+            # Check the event against the same compiled rules the notifier uses
+            event_date = date.strftime('%Y-%m-%d %H:%M:%S')
+            notified = not config.event_filter.is_filtered({
+                'lock_name': lock_name,
+                'lock_id': lock_id,
+                'event_type': action_description,
+                'action': action,
+                'trigger': trigger,
+                'user_name': user_name,
+                'date': event_date
+            })
+            if notified_only and not notified:
+                continue
+            
             # Create processed event
             processed_event = {
                 'id': event_id,
@@ -433,13 +503,14 @@ def get_activity():
                 'action': action_description,
                 'trigger': trigger_description,
                 'user': user_name,
-                'date': date.strftime('%Y-%m-%d %H:%M:%S'),
-                'raw_date': date.isoformat()
+                'date': event_date,
+                'raw_date': date.isoformat(),
+                'notified': notified
             }
             
             processed_activity.append(processed_event)
         
-        return jsonify(processed_activity)
+        return json_response(processed_activity)
     except Exception as e:
         logger.error(f"Error getting activity: {e}")
         return jsonify({"error": str(e)}), 500
@@ -455,11 +526,16 @@ def status():
 def get_status():
     """API endpoint to get lock status"""
     try:
-        # Get locks
-        locks = api.get_smartlocks()
+        # Get locks; their state may be a few seconds old so that polling dashboards share requests
+        locks = api.get_lock_inventory(max_age=LOCK_STATUS_MAX_AGE)
         if not locks:
             return jsonify({"error": "No smartlocks found"}), 404
         
+        # Battery history is sampled by the monitor; ?history=<days> includes the samples
+        battery = BatteryHistory.load(os.path.join(config.data_dir, BATTERY_HISTORY_NAME))
+        history_days = request.args.get('history', type=int)
+        now = time.time()
+        
         # Process lock information
         lock_status = []
         for lock in locks:
@@ -490,6 +566,12 @@ def get_status():
                 'last_user': None
             }
             
+            # Discharge trend and history from the local store
+            if battery is not None:
+                status['battery_trend'] = battery.trend(lock_id, now, config.battery_critical_level)
+                if history_days:
+                    status['battery_history'] = battery.history(lock_id, since=now - history_days * 86400)
+            
             # Get recent activity for this lock
             activity = api.get_smartlock_logs(lock_id, limit=1)
             if activity:
@@ -505,7 +587,7 @@ def get_status():
             
             lock_status.append(status)
         
-        return jsonify(lock_status)
+        return json_response(lock_status)
     except Exception as e:
         logger.error(f"Error getting status: {e}")
         return jsonify({"error": str(e)}), 500
@@ -543,51 +625,22 @@ def update_notification_settings():
     """API endpoint to update notification settings"""
     try:
         # Get data from request
-        data = request.json
-        
-        # Get current config file path
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        config_path = os.path.join(base_dir, "config", "config.ini")
-        
-        # Import the configuration utility functions
-        sys.path.insert(0, os.path.join(parent_dir, "scripts"))
-        from configure import update_config as update_config_func
+        data = request.json or {}
         
-        # Update notification type
+        changes = {'General': {}, 'Notification': {}, 'Filter': {}}
         if 'type' in data:
-            update_config_func(config_path, 'General', 'notification_type', data['type'])
-        
-        # Update digest mode
-        if 'digest_mode' in data:
-            update_config_func(config_path, 'Notification', 'digest_mode', str(data['digest_mode']).lower())
-        
-        # Update auto lock notifications
-        if 'notify_auto_lock' in data:
-            update_config_func(config_path, 'Notification', 'notify_auto_lock', str(data['notify_auto_lock']).lower())
-        
-        # Update system events notifications
-        if 'notify_system_events' in data:
-            update_config_func(config_path, 'Notification', 'notify_system_events', str(data['notify_system_events']).lower())
+            changes['General']['notification_type'] = data['type']
+        for option in ('digest_mode', 'notify_auto_lock', 'notify_system_events'):
+            if option in data:
+                changes['Notification'][option] = data[option]
+        for option in ('excluded_users', 'excluded_actions', 'excluded_triggers'):
+            if option in data:
+                changes['Filter'][option] = ','.join(data[option])
         
-        # Update excluded users
-        if 'excluded_users' in data:
-            excluded_users = ','.join(data['excluded_users'])
-            update_config_func(config_path, 'Filter', 'excluded_users', excluded_users)
-        
-        # Update excluded actions
-        if 'excluded_actions' in data:
-            excluded_actions = ','.join(data['excluded_actions'])
-            update_config_func(config_path, 'Filter', 'excluded_actions', excluded_actions)
-        
-        # Update excluded triggers
-        if 'excluded_triggers' in data:
-            excluded_triggers = ','.join(data['excluded_triggers'])
-            update_config_func(config_path, 'Filter', 'excluded_triggers', excluded_triggers)
-        
-        # Reload configuration
-        global config, api
-        config = ConfigManager(parent_dir)
-        api = NukiAPI(config)
+        try:
+            config.apply_changes(changes)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         return jsonify({"success": True})
     except Exception as e:
@@ -662,6 +715,7 @@ def get_config():
                 'max_historical_events': config.max_historical_events,
                 'debug_mode': config.debug_mode,
                 'user_cache_timeout': config.user_cache_timeout,
+                'lock_cache_timeout': config.lock_cache_timeout,
                 'retry_on_failure': config.retry_on_failure,
                 'max_retries': config.max_retries,
                 'retry_delay': config.retry_delay
@@ -677,138 +731,39 @@ def get_config():
 @admin_required
 def update_config():
     """API endpoint to update configuration"""
-    global config, api
     try:
-        # Get current config file path
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        config_path = os.path.join(base_dir, "config", "config.ini")
-        config_dir = os.path.dirname(config_path)
-        backup_path = os.path.join(config_dir, "config.ini.bak")
-        
-        # Create a backup before making changes
-        import shutil
-        try:
-            if os.path.exists(config_path):
-                shutil.copy2(config_path, backup_path)
-                logger.info(f"Created backup at {backup_path}")
-        except Exception as backup_error:
-            logger.warning(f"Failed to create backup: {backup_error}")
-        
-        # Import the configuration utility functions
-        sys.path.insert(0, os.path.join(parent_dir, "scripts"))
-        from configure import update_config as update_config_func
-        
         # Get data from request
-        data = request.json
+        data = request.json or {}
         
-        success_count = 0
-        error_count = 0
+        changes = {section: dict(options) if isinstance(options, dict) else options
+                   for section, options in data.items()}
         
-        # Handle Nuki API Token separately (credentials.ini)
-        if 'nuki' in data and 'api_token' in data['nuki'] and data['nuki']['api_token'] and not data['nuki']['api_token'].startswith('***'):
-            try:
-                if not config.credentials.has_section('Nuki'):
-                    config.credentials.add_section('Nuki')
-                config.credentials.set('Nuki', 'api_token', data['nuki']['api_token'])
-                logger.info("Queued Nuki API token update")
-                success_count += 1
-            except Exception as nuki_error:
-                logger.error(f"Error updating Nuki API token: {nuki_error}")
-                error_count += 1
-
-        # Handle Email Credentials
-        if 'email' in data:
-            try:
-                if not config.credentials.has_section('Email'):
-                    config.credentials.add_section('Email')
-                if 'username' in data['email'] and data['email']['username']:
-                    config.credentials.set('Email', 'username', data['email']['username'])
-                if 'password' in data['email'] and data['email']['password'] and not data['email']['password'].startswith('***'):
-                    config.credentials.set('Email', 'password', data['email']['password'])
-                success_count += 1
-            except Exception as e:
-                logger.error(f"Error updating email credentials: {e}")
-                error_count += 1
-
-        # Handle Telegram Credentials
-        if 'telegram' in data:
-            try:
-                if not config.credentials.has_section('Telegram'):
-                    config.credentials.add_section('Telegram')
-                if 'bot_token' in data['telegram'] and data['telegram']['bot_token'] and not data['telegram']['bot_token'].startswith('***'):
-                    config.credentials.set('Telegram', 'bot_token', data['telegram']['bot_token'])
-                success_count += 1
-            except Exception as e:
-                logger.error(f"Error updating telegram credentials: {e}")
-                error_count += 1
-
-        # Save credentials.ini if any credential changes were made
-        try:
-            config._save_config(config.credentials, config.credentials_path)
-            logger.info("Successfully updated credentials.ini")
-        except Exception as e:
-            logger.error(f"Failed to save credentials.ini: {e}")
-            error_count += 1
-
-        # Remove sensitive sections from data so they aren't processed by the standard loop
-        if 'nuki' in data: del data['nuki']
-        # Special case: keep non-sensitive parts of email/telegram for standard loop
-        standard_data = data.copy()
-        if 'email' in standard_data:
-            if 'username' in standard_data['email']: del standard_data['email']['username']
-            if 'password' in standard_data['email']: del standard_data['email']['password']
-        if 'telegram' in standard_data:
-            if 'bot_token' in standard_data['telegram']: del standard_data['telegram']['bot_token']
+        # Masked or empty credentials mean "keep the stored value"
+        for section, option in (('nuki', 'api_token'), ('email', 'username'),
+                                ('email', 'password'), ('telegram', 'bot_token')):
+            options = changes.get(section)
+            if isinstance(options, dict) and option in options:
+                value = options[option]
+                if not value or str(value).startswith('***'):
+                    del options[option]
         
-        # ... validation ...
-
         # Validate notification type to ensure it's not empty
-        if 'general' in data and 'notification_type' in data['general']:
-            if not data['general']['notification_type']:
-                data['general']['notification_type'] = 'both'
-        
-        # Update standard configuration
-        for section, options in standard_data.items():
-            for option, value in options.items():
-                # Convert boolean values to strings
-                if isinstance(value, bool):
-                    value = str(value).lower()
-                
-                try:
-                    # Update config
-                    update_config_func(config_path, section, option, str(value))
-                    success_count += 1
-                except Exception as option_error:
-                    logger.error(f"Error updating option {section}.{option}: {option_error}")
-                    error_count += 1
-        
-        if error_count > 0:
-            logger.warning(f"Configuration update completed with {error_count} errors and {success_count} successes")
-        else:
-            logger.info(f"Configuration update completed successfully with {success_count} changes")
-        
-        # Reload configuration
-        config = ConfigManager(parent_dir)
-        api = NukiAPI(config)
+        if isinstance(changes.get('general'), dict) and 'notification_type' in changes['general']:
+            if not changes['general']['notification_type']:
+                changes['general']['notification_type'] = 'both'
         
-        # Ensure file has proper permissions
+        # Validate and write everything at once, updating the live configuration
         try:
-            os.chmod(config_path, 0o640)
-        except Exception as perm_error:
-            logger.warning(f"Failed to set config file permissions: {perm_error}")
+            changed = config.apply_changes(changes)
+        except ValueError as e:
+            logger.warning(f"Rejected configuration update: {e}")
+            return jsonify({"error": str(e)}), 400
         
-        return jsonify({"success": True, "changes": success_count, "errors": error_count})
+        logger.info(f"Configuration update completed successfully with {len(changed)} changes")
+        
+        return jsonify({"success": True, "changes": len(changed), "errors": 0})
     except Exception as e:
         logger.error(f"Error updating configuration: {e}")
-        # Try to restore backup if it exists
-        try:
-            if os.path.exists(backup_path):
-                import shutil
-                shutil.copy2(backup_path, config_path)
-                logger.info(f"Restored configuration from backup after error")
-        except Exception as restore_error:
-            logger.error(f"Failed to restore backup: {restore_error}")
-            
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/setup', methods=['POST'])
@@ -892,7 +847,7 @@ def get_stats():
         days = int(request.args.get('days', 30))
         
         # Get locks
-        locks = api.get_smartlocks()
+        locks = api.get_lock_inventory()
         if not locks:
             return jsonify({"error": "No smartlocks found"}), 404
         
@@ -1011,7 +966,7 @@ def get_users():
             
             user_data.append(user_obj)
         
-        return jsonify(user_data)
+        return json_response(user_data)
     except Exception as e:
         logger.error(f"Error getting users: {e}")
         return jsonify({"error": str(e)}), 500
@@ -1027,9 +982,6 @@ def temp_codes_page():
 def get_temp_codes():
     """API endpoint to get temporary codes"""
     try:
-        # Clean expired codes
-        temp_code_db.clean_expired_codes()
-        
         # For agent users, only show codes they created
         if session.get('role') == 'agent':
             codes = temp_code_db.get_codes_by_creator(session.get('username'))
@@ -1068,14 +1020,11 @@ def create_temp_code():
         if not code.isdigit() or len(code) < 4 or len(code) > 8:
             return jsonify({"error": "Code must be 4-8 digits"}), 400
         
-        # Get first smartlock ID (we'll use the first one for simplicity)
-        locks = api.get_smartlocks()
-        if not locks:
+        # Use the first smartlock for simplicity
+        smartlock_id = api.get_default_lock_id()
+        if smartlock_id is None:
             return jsonify({"error": "No smartlocks found"}), 404
         
-        # Use the first smartlock
-        smartlock_id = locks[0].get('smartlockId')
-        
         # Convert expiry to datetime
         expiry_datetime = datetime.fromisoformat(expiry.replace('Z', '+00:00'))
         
@@ -1086,15 +1035,17 @@ def create_temp_code():
             return jsonify({"error": result.get('message', 'Failed to add code to lock')}), 500
         
         # Generate a unique ID for the code
-        code_id = str(int(time.time()))
+        code_id = temp_code_db.new_code_id()
         
-        # Add code to database
+        # Add code to database, with the authorization to remove when it expires
         success = temp_code_db.add_code(
             code_id=code_id, 
             code=code, 
             name=name, 
             created_by=session.get('username'), 
-            expiry=expiry_datetime
+            expiry=expiry_datetime,
+            auth_id=result.get('auth_id'),
+            smartlock_id=smartlock_id
         )
         
         if not success:
@@ -1104,9 +1055,6 @@ def create_temp_code():
                 api.remove_code(smartlock_id, auth_id)
             return jsonify({"error": "Failed to save code to database"}), 500
         
-        # Record the auth_id in our database for easier cleanup later
-        temp_code_db.update_code(code_id, {"auth_id": result.get('auth_id')})
-        
         return jsonify({
             "id": code_id,
             "code": code,
@@ -1120,6 +1068,137 @@ def create_temp_code():
         logger.error(f"Error creating temporary code: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/temp-codes/bulk', methods=['POST'])
+@agent_access_required
+def create_temp_codes_bulk():
+    """API endpoint to create many temporary codes at once
+
+    Takes {"codes": [{"code", "name", "expiry", "valid_from", "smartlock_id"}, ...],
+    "atomic": false}. Codes without a smartlock_id go to the first lock. All
+    items are validated before any lock is changed; the codes are then added
+    to the locks several at a time. With "atomic", a failure removes the codes
+    that were added again.
+    """
+    try:
+        data = request.json or {}
+        items = data.get('codes')
+        atomic = bool(data.get('atomic', False))
+
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "A non-empty list of codes is required"}), 400
+        if len(items) > MAX_BULK_CODES:
+            return jsonify({"error": f"At most {MAX_BULK_CODES} codes per request"}), 400
+
+        # One lookup for all items
+        locks = api.get_lock_inventory()
+        if not locks:
+            return jsonify({"error": "No smartlocks found"}), 404
+
+        # Validate every item before touching a lock
+        specs = []
+        errors = []
+        seen = set()
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors.append({"index": index, "error": "Each code must be an object"})
+                continue
+            code = str(item.get('code') or '')
+            name = item.get('name')
+            smartlock_id = item.get('smartlock_id')
+            if not code or not name or not item.get('expiry'):
+                errors.append({"index": index, "error": "Code, name, and expiry are required"})
+                continue
+            if not code.isdigit() or len(code) < 4 or len(code) > 8:
+                errors.append({"index": index, "error": "Code must be 4-8 digits"})
+                continue
+            # Lock ids arrive as strings from forms and as numbers from scripts
+            if smartlock_id is None or smartlock_id == '':
+                smartlock_id = locks[0].get('smartlockId')
+            else:
+                try:
+                    smartlock_id = int(smartlock_id)
+                except (TypeError, ValueError):
+                    errors.append({"index": index, "error": f"Invalid smartlock id {smartlock_id!r}"})
+                    continue
+            if api.get_lock_info(smartlock_id) is None:
+                errors.append({"index": index, "error": f"Unknown smartlock {smartlock_id}"})
+                continue
+            if (smartlock_id, code) in seen:
+                errors.append({"index": index, "error": "Duplicate code for this smartlock"})
+                continue
+            try:
+                expiry = datetime.fromisoformat(item['expiry'].replace('Z', '+00:00'))
+                valid_from = item.get('valid_from')
+                if valid_from:
+                    valid_from = datetime.fromisoformat(valid_from.replace('Z', '+00:00'))
+            except (ValueError, TypeError, AttributeError):
+                errors.append({"index": index, "error": "Invalid expiry or valid_from date"})
+                continue
+            seen.add((smartlock_id, code))
+            specs.append({
+                "code_id": temp_code_db.new_code_id(),
+                "code": code,
+                "name": name,
+                "created_by": session.get('username'),
+                "expiry": expiry,
+                "valid_from": valid_from or None,
+                "smartlock_id": smartlock_id
+            })
+        if errors:
+            return jsonify({"error": "Invalid codes", "errors": errors}), 400
+
+        # Add the codes to the locks, a few requests at a time
+        results = []
+        added = []
+        for index, (spec, result) in enumerate(zip(specs, add_codes_to_locks(api, specs, BULK_CODE_WORKERS))):
+            if result.get('success'):
+                spec['auth_id'] = result.get('auth_id')
+                added.append(spec)
+                results.append({"index": index, "success": True, "id": spec['code_id'],
+                                "smartlock_id": spec['smartlock_id'], "auth_id": spec['auth_id']})
+            else:
+                results.append({"index": index, "success": False, "smartlock_id": spec['smartlock_id'],
+                                "error": result.get('message', 'Failed to add code to lock')})
+
+        failed = len(specs) - len(added)
+        if atomic and failed:
+            saved = False
+        else:
+            saved = temp_code_db.add_codes(added) if added else True
+
+        # Take the codes off the locks again if the batch is all-or-nothing or can't be saved
+        rollback = []
+        if added and not saved:
+            reason = "Rolled back" if atomic and failed else "Failed to save code to database"
+            revocable = [spec for spec in added if spec['auth_id']]
+            removed = dict(zip((spec['code_id'] for spec in revocable),
+                               remove_codes_from_locks(api, revocable, BULK_CODE_WORKERS)))
+            for spec in added:
+                result = removed.get(spec['code_id'], {"success": False, "message": "No authorization ID to remove"})
+                rollback.append({"smartlock_id": spec['smartlock_id'], "auth_id": spec['auth_id'],
+                                 "code": spec['code'], "removed": bool(result.get('success')),
+                                 "error": result.get('message')})
+            for entry in results:
+                if entry['success']:
+                    entry.update(success=False, error=reason)
+                    entry.pop('id', None)
+            logger.warning(f"Bulk temporary codes rolled back: {len(added)} added, {failed} failed")
+
+        created = len(added) if saved else 0
+        logger.info(f"Bulk temporary codes by {session.get('username')}: {created} created, "
+                    f"{len(specs) - created} not created")
+        status = 200 if created == len(specs) else (207 if created else 500)
+        return jsonify({
+            "success": created == len(specs),
+            "created": created,
+            "failed": len(specs) - created,
+            "results": results,
+            "rollback": rollback
+        }), status
+    except Exception as e:
+        logger.error(f"Error creating temporary codes: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/temp-codes/<code_id>', methods=['DELETE'])
 @agent_access_required
 def delete_temp_code(code_id):
@@ -1134,29 +1213,21 @@ def delete_temp_code(code_id):
         if session.get('role') == 'agent' and code.get('created_by') != session.get('username'):
             return jsonify({"error": "You can only delete codes you created"}), 403
         
-        # Get the auth_id
+        # Get the auth_id and its lock; codes from older versions are on the first lock
         auth_id = code.get('auth_id')
+        smartlock_id = code.get('smartlock_id') or api.get_default_lock_id()
         
         # If no auth_id stored, try to find it
         if not auth_id:
-            # Get first smartlock ID
-            locks = api.get_smartlocks()
-            if not locks:
+            if smartlock_id is None:
                 return jsonify({"error": "No smartlocks found"}), 404
             
-            # Use the first smartlock
-            smartlock_id = locks[0].get('smartlockId')
-            
             # Find auth_id by code value
             auth_id = api.find_auth_id_by_code(smartlock_id, code.get('code'))
         
         # If we have an auth_id, delete from API
-        if auth_id:
-            # Get first smartlock ID
-            locks = api.get_smartlocks()
-            if locks:
-                smartlock_id = locks[0].get('smartlockId')
-                api.remove_code(smartlock_id, auth_id)
+        if auth_id and smartlock_id is not None:
+            api.remove_code(smartlock_id, auth_id)
         
         # Delete from database
         success = temp_code_db.delete_code(code_id)
@@ -1250,94 +1321,12 @@ def health_check():
             "timestamp": int(time.time())
         }), 500
 
-# Helper function to filter sensitive data for non-admin users
-def filter_api_response_for_role(response):
-    """Filter API responses to remove sensitive data for non-admin users"""
-    if not response.is_json:
-        return response
-    
-    # Only filter for non-admin users
-    if 'logged_in' not in session or session.get('role') == 'admin':
-        return response
-    
-    # Check if this is a sensitive API endpoint
-    sensitive_endpoints = [
-        '/api/config',
-        '/api/status'
-    ]
-    
-    is_sensitive = False
-    for endpoint in sensitive_endpoints:
-        if request.path.startswith(endpoint):
-            is_sensitive = True
-            break
-    
-    if not is_sensitive:
-        return response
-    
-    try:
-        # Get JSON data
-        data = response.get_json()
-        
-        # Filter status endpoint to remove sensitive information
-        if request.path.startswith('/api/status'):
-            # Remove personal email and telegram details
-            if isinstance(data, list):
-                for lock in data:
-                    if 'email_details' in lock:
-                        lock.pop('email_details')
-                    if 'telegram_details' in lock:
-                        lock.pop('telegram_details')
-        
-        # Filter config endpoint (should be blocked by decorator, but just in case)
-        if request.path.startswith('/api/config'):
-            # Prepare limited config data for non-admin users
-            limited_data = {}
-            
-            # Only include public configuration options
-            if 'general' in data:
-                limited_data['general'] = {
-                    'polling_interval': data['general'].get('polling_interval')
-                }
-            
-            data = limited_data
-        
-        # Set the modified data
-        response.set_data(json.dumps(data))
-    except Exception as e:
-        logger.error(f"Error filtering API response: {e}")
-    
-    return response
-
-# Apply theme to all responses and filter sensitive data
-@app.after_request
-def apply_theme_and_filter(response):
-    # Apply dark theme to HTML responses
-    if 'logged_in' in session and session.get('theme') == 'dark':
-        # Only apply to HTML responses
-        if response.content_type and 'text/html' in response.content_type:
-            response_data = response.get_data(as_text=True)
-            # Add dark-theme class to body
-            if '<body>' in response_data and 'dark-theme' not in response_data:
-                response_data = response_data.replace('<body>', '<body class="dark-theme">')
-                response.set_data(response_data)
-            # Add dark mode CSS link if not present
-            if '<head>' in response_data and 'dark-mode.css' not in response_data:
-                css_link = '<link rel="stylesheet" href="{{ url_for(\'static\', filename=\'css/dark-mode.css\') }}">' 
-                response_data = response_data.replace('</head>', f'{css_link}\n</head>')
-                response.set_data(response_data)
-    
-    # Filter sensitive data for non-admin users
-    response = filter_api_response_for_role(response)
-    
-    return response
-
 # Main entry point
 if __name__ == '__main__':
     # Create logger directory if it doesn't exist
     os.makedirs(os.path.join(parent_dir, "logs"), exist_ok=True)
     
-    # Ensure the users.json file exists and has the admin user
+    # Ensure the user database has the admin user
     if not user_db.get_user('admin'):
         user_db.add_user('admin', 'nukiadmin', 'admin', True)
     
@@ -10,18 +10,24 @@ def init_app(app):
         import os
         from flask import session, request
         
+        # Health checks and static files don't need a session; storing a
+        # theme would create one for every request
+        if request.endpoint in ('static', 'health_check'):
+            return
+        
         # Always ensure theme is set
         if "theme" not in session or not session.get("theme"):
             # Use environment variable or default to dark mode
             default_theme = os.environ.get('DEFAULT_THEME', 'dark')
             session["theme"] = default_theme
         
-        # Force dark mode for all new sessions
-        if request.endpoint == 'login' and 'logged_in' not in session:
+        # Force dark mode for all new sessions (only assigned when it changes,
+        # so the session isn't rewritten on every visit)
+        if request.endpoint == 'login' and 'logged_in' not in session and session.get("theme") != 'dark':
             session["theme"] = 'dark'
     
-    # Add a template context processor to always provide theme
+    # Templates pick the theme from the context; responses aren't rewritten afterwards
     @app.context_processor
     def inject_theme():
         from flask import session
-        return {'theme': session.get('theme', 'dark')}
+        return {'theme': session.get('theme') or 'dark'}
@@ -1,24 +1,122 @@
 import os
 import json
 import time
+import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# PBKDF2 iterations for new password hashes (werkzeug's default)
+DEFAULT_HASH_ITERATIONS = 260000
+
+USERS_DB_NAME = 'users.db'
+
+# Columns of the users table besides username, in the order of a user record
+USER_FIELDS = ('password_hash', 'role', 'active', 'created_at', 'last_login', 'theme')
+
 class UserDatabase:
-    """Simple file-based user database"""
-    
-    def __init__(self, data_dir):
-        """Initialize the database with a data directory"""
+    """User database stored in SQLite
+
+    Every call reads or updates single rows, so all workers sharing the data
+    directory see the same users. users.json from older versions is imported
+    once, when the database is created.
+    """
+
+    def __init__(self, data_dir, hash_iterations=DEFAULT_HASH_ITERATIONS, save_interval=60):
+        """Initialize the database with a data directory
+
+        Args:
+            data_dir: Directory holding users.db
+            hash_iterations: PBKDF2 iterations for password hashes; hashes made
+                with a different count are replaced on the user's next login
+            save_interval: Seconds login times may stay unsaved before flush() writes them
+        """
         self.data_dir = data_dir
+        self.db_file = os.path.join(self.data_dir, USERS_DB_NAME)
+        # Imported into the database on first start, then renamed to users.json.migrated
         self.users_file = os.path.join(self.data_dir, 'users.json')
-        self.users = self._load_users()
-        
-        # Create default admin user if no users exist
-        if not self.users:
-            self.add_user('admin', 'nukiadmin', 'admin', True)
-    
+        self.hash_method = f"pbkdf2:sha256:{hash_iterations}"
+        self.save_interval = save_interval
+        # username -> login time not yet written
+        self.pending = {}
+        self._saved = time.monotonic()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._init_db()
+
+    @property
+    def dirty(self):
+        """Whether there are login times to write"""
+        return bool(self.pending)
+
+    def _connect(self):
+        """Get the connection of the current thread"""
+        db = getattr(self._local, 'db', None)
+        # Connections can't be shared with a forked worker
+        if db is not None and self._local.pid == os.getpid():
+            return db
+        os.makedirs(self.data_dir, exist_ok=True)
+        db = sqlite3.connect(self.db_file, timeout=10, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = NORMAL")
+        self._local.db = db
+        self._local.pid = os.getpid()
+        return db
+
+    def _init_db(self):
+        """Create the tables, then import users.json or create the default admin if there are no users"""
+        db = self._connect()
+        db.execute("CREATE TABLE IF NOT EXISTS users ("
+                   "username TEXT PRIMARY KEY, password_hash TEXT NOT NULL, role TEXT NOT NULL, "
+                   "active INTEGER NOT NULL, created_at TEXT, last_login TEXT, theme TEXT)")
+        db.execute("CREATE INDEX IF NOT EXISTS users_role ON users (role)")
+        db.execute("CREATE INDEX IF NOT EXISTS users_active ON users (active)")
+        # Secure the file
+        os.chmod(self.db_file, 0o600)
+
+        # Workers starting together: the first one to get the write lock fills the table
+        migrated = False
+        with self._transaction() as db:
+            if db.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+                return
+            users = self._load_users()
+            if users:
+                db.executemany(
+                    "INSERT OR IGNORE INTO users (username, password_hash, role, active, created_at, last_login, theme) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(username, data.get('password_hash', ''), data.get('role', 'agent'), bool(data.get('active', True)),
+                      data.get('created_at'), data.get('last_login'), data.get('theme', 'dark'))
+                     for username, data in users.items()]
+                )
+                migrated = True
+            else:
+                # Create default admin user if no users exist
+                self._insert(db, 'admin', 'nukiadmin', 'admin', True, replace=False)
+
+        if migrated:
+            print(f"Imported {len(users)} users from {self.users_file} into {self.db_file}")
+            try:
+                os.replace(self.users_file, f"{self.users_file}.migrated")
+            except OSError as e:
+                print(f"Error renaming {self.users_file}: {e}")
+
+    @contextmanager
+    def _transaction(self):
+        """Run a write transaction on the connection of the current thread, rolled back on errors"""
+        db = self._connect()
+        # Take the write lock up front so concurrent writers wait for it instead of failing
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
     def _load_users(self):
-        """Load users from the users file"""
+        """Load users from a users.json of an older version"""
         if os.path.exists(self.users_file):
             try:
                 with open(self.users_file, 'r') as f:
@@ -27,127 +125,191 @@ class UserDatabase:
                 print(f"Error loading users: {e}")
                 return {}
         return {}
-    
-    def _save_users(self):
-        """Save users to the users file"""
+
+    def _insert(self, db, username, password, role, active, replace=True):
+        """Insert a user row, keeping the row (and its position) of an existing user when replacing"""
+        conflict = ("DO UPDATE SET password_hash = excluded.password_hash, role = excluded.role, "
+                    "active = excluded.active, created_at = excluded.created_at, "
+                    "last_login = excluded.last_login, theme = excluded.theme") if replace else "DO NOTHING"
+        db.execute(
+            "INSERT INTO users (username, password_hash, role, active, created_at, last_login, theme) "
+            f"VALUES (?, ?, ?, ?, ?, NULL, 'dark') ON CONFLICT (username) {conflict}",
+            (username, generate_password_hash(password, method=self.hash_method), role, bool(active),
+             datetime.now().isoformat())
+        )
+
+    def _update(self, username, **columns):
+        """Update columns of one user, returning whether the user exists"""
+        assignments = ', '.join(f"{column} = ?" for column in columns)
         try:
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(self.users_file), exist_ok=True)
-            
-            with open(self.users_file, 'w') as f:
-                json.dump(self.users, f, indent=2)
-            
-            # Secure the file
-            os.chmod(self.users_file, 0o600)
-            
-            return True
-        except IOError as e:
-            print(f"Error saving users: {e}")
+            with self._transaction() as db:
+                cursor = db.execute(f"UPDATE users SET {assignments} WHERE username = ?",
+                                    (*columns.values(), username))
+        except sqlite3.Error as e:
+            print(f"Error saving user {username}: {e}")
             return False
-    
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _record(row):
+        """Convert a users row to a user record"""
+        user = {field: row[field] for field in USER_FIELDS}
+        user['active'] = bool(user['active'])
+        return user
+
     def add_user(self, username, password, role='agent', active=True):
         """Add a new user or update existing user"""
         if not username or not password:
             return False
-            
+
         # Validate role (default to agent if invalid role provided)
         if role not in ['admin', 'agent']:
             role = 'agent'
-            
-        self.users[username] = {
-            'password_hash': generate_password_hash(password, method='pbkdf2:sha256'),
-            'role': role,
-            'active': active,
-            'created_at': datetime.now().isoformat(),
-            'last_login': None,
-            'theme': 'dark'  # Default theme - dark mode
-        }
-        
-        return self._save_users()
-    
+
+        try:
+            with self._transaction() as db:
+                self._insert(db, username, password, role, active)
+        except sqlite3.Error as e:
+            print(f"Error saving user {username}: {e}")
+            return False
+        with self._lock:
+            self.pending.pop(username, None)
+        return True
+
     def get_user(self, username):
         """Get a user by username"""
-        return self.users.get(username)
-    
-    def authenticate(self, username, password):
-        """Authenticate a user"""
+        row = self._connect().execute(
+            f"SELECT {', '.join(USER_FIELDS)} FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        if row is None:
+            return None
+        user = self._record(row)
+        with self._lock:
+            if username in self.pending:
+                user['last_login'] = self.pending[username]
+        return user
+
+    def verify_password(self, username, password):
+        """Check the password of an active user without recording a login"""
         user = self.get_user(username)
         if not user:
             return False
-            
+
         if not user.get('active', True):
             return False
-            
-        if check_password_hash(user.get('password_hash', ''), password):
-            # Update last login time
-            self.users[username]['last_login'] = datetime.now().isoformat()
-            self._save_users()
+
+        password_hash = user.get('password_hash', '')
+        if not check_password_hash(password_hash, password):
+            return False
+
+        # The hash cost changed since this hash was made: replace it while we know the password,
+        # unless another worker changed the password since we read it
+        if password_hash.split('$', 1)[0] != self.hash_method:
+            try:
+                with self._transaction() as db:
+                    db.execute("UPDATE users SET password_hash = ? WHERE username = ? AND password_hash = ?",
+                               (generate_password_hash(password, method=self.hash_method), username, password_hash))
+            except sqlite3.Error as e:
+                print(f"Error rehashing password of {username}: {e}")
+        return True
+
+    def authenticate(self, username, password):
+        """Authenticate a user and record the login
+
+        The login time is written by flush(), in one transaction with the
+        other logins since the last write, rather than on every login.
+        """
+        if not self.verify_password(username, password):
+            return False
+        with self._lock:
+            self.pending[username] = datetime.now().isoformat()
+        return True
+
+    def flush(self, force=False):
+        """Write pending login times once save_interval has passed since the last write"""
+        if not self.pending:
             return True
-            
-        return False
-    
+        if not force and time.monotonic() - self._saved < self.save_interval:
+            return True
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        self._saved = time.monotonic()
+        try:
+            with self._transaction() as db:
+                db.executemany("UPDATE users SET last_login = ? WHERE username = ?",
+                               [(last_login, username) for username, last_login in pending.items()])
+        except sqlite3.Error as e:
+            print(f"Error saving logins: {e}")
+            return False
+        return True
+
     def update_password(self, username, new_password):
         """Update a user's password"""
-        if not username in self.users:
-            return False
-            
-        self.users[username]['password_hash'] = generate_password_hash(new_password, method='pbkdf2:sha256')
-        return self._save_users()
-    
+        return self._update(username, password_hash=generate_password_hash(new_password, method=self.hash_method))
+
     def update_role(self, username, new_role):
         """Update a user's role"""
-        if not username in self.users:
-            return False
-        
         # Validate role (only allow specific roles)
         if new_role not in ['admin', 'agent']:
             return False
-            
-        self.users[username]['role'] = new_role
-        return self._save_users()
-    
+
+        return self._update(username, role=new_role)
+
     def update_active(self, username, active):
         """Update a user's active status"""
-        if not username in self.users:
-            return False
-            
-        self.users[username]['active'] = active
-        return self._save_users()
-    
+        return self._update(username, active=bool(active))
+
     def update_theme(self, username, theme):
         """Update a user's theme preference"""
-        if not username in self.users:
-            return False
-            
-        self.users[username]['theme'] = theme
-        return self._save_users()
-    
+        return self._update(username, theme=theme)
+
     def delete_user(self, username):
         """Delete a user"""
-        if not username in self.users:
-            return False
-            
         if username == 'admin':
             return False  # Prevent deletion of admin user
-            
-        del self.users[username]
-        return self._save_users()
-    
-    def get_all_users(self):
-        """Get all users"""
+
+        with self._lock:
+            self.pending.pop(username, None)
+        try:
+            with self._transaction() as db:
+                cursor = db.execute("DELETE FROM users WHERE username = ?", (username,))
+        except sqlite3.Error as e:
+            print(f"Error deleting user {username}: {e}")
+            return False
+        return cursor.rowcount > 0
+
+    def get_all_users(self, role=None, active=None):
+        """Get all users, optionally only those with a role and/or active status"""
+        conditions, params = [], []
+        if role is not None:
+            conditions.append("role = ?")
+            params.append(role)
+        if active is not None:
+            conditions.append("active = ?")
+            params.append(bool(active))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self._connect().execute(
+            f"SELECT username, {', '.join(USER_FIELDS)} FROM users{where} ORDER BY rowid", params
+        ).fetchall()
+
         users_list = []
-        for username, data in self.users.items():
-            user = data.copy()
-            user['username'] = username
-            # Don't expose password hash
-            user.pop('password_hash', None)
-            users_list.append(user)
-        
+        with self._lock:
+            for row in rows:
+                user = self._record(row)
+                if row['username'] in self.pending:
+                    user['last_login'] = self.pending[row['username']]
+                user['username'] = row['username']
+                # Don't expose password hash
+                user.pop('password_hash', None)
+                users_list.append(user)
+
         return users_list
-    
+
     def user_exists(self, username):
         """Check if a user exists"""
-        return username in self.users
+        return self._connect().execute(
+            "SELECT 1 FROM users WHERE username = ?", (username,)
+        ).fetchone() is not None
 
 class User:
     """User class for Flask-Login compatibility"""
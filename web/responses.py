@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+import json
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data):
+    """Serialize to JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(data, status=200):
+    """Create a JSON response without Flask's pretty-printing and sorting"""
+    return current_app.response_class(dumps(data), status=status, mimetype='application/json')
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+import os
+import time
+import sqlite3
+import secrets
+import logging
+import threading
+
+from flask.sessions import SessionInterface, SessionMixin, SecureCookieSessionInterface, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger('nuki_web')
+
+# Backends selectable with the SESSION_BACKEND environment variable
+SESSION_BACKENDS = ('sqlite', 'cookie')
+
+SESSION_DB_NAME = 'sessions.db'
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session whose data is stored on the server under a random ID"""
+
+    def __init__(self, initial=None, sid=None, expires=None):
+        def on_update(session):
+            session.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        # Expiry stored in the database, None if the session isn't stored yet
+        self.expires = expires
+        self.modified = False
+
+
+class SqliteSessionInterface(SessionInterface):
+    """Stores sessions in one SQLite database in the data directory
+
+    Only a random session ID goes into the cookie. A session is written
+    when its data changed; otherwise its expiry is pushed back at most once
+    per `touch_interval`, so browsing pages costs one indexed read and no
+    write. Expired sessions are deleted every `prune_interval` seconds and
+    the freed pages returned to the file system.
+    """
+
+    def __init__(self, path, touch_interval=3600, prune_interval=3600):
+        self.path = path
+        self.touch_interval = touch_interval
+        self.prune_interval = prune_interval
+        self.next_prune = 0
+        self._local = threading.local()
+
+    def _connect(self):
+        """Get the connection of the current thread, creating the database if needed"""
+        db = getattr(self._local, 'db', None)
+        # Connections can't be shared with a forked worker
+        if db is not None and self._local.pid == os.getpid():
+            return db
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        # auto_vacuum only takes effect on a new database, before any table exists
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                   "sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+        self._local.db = db
+        self._local.pid = os.getpid()
+        return db
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            row = self._connect().execute(
+                "SELECT data, expires FROM sessions WHERE sid = ? AND expires > ?", (sid, time.time())
+            ).fetchone()
+            if row is not None:
+                try:
+                    return ServerSession(session_json_serializer.loads(row[0]), sid, row[1])
+                except ValueError as e:
+                    logger.warning(f"Discarding unreadable session: {e}")
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        now = time.time()
+        db = self._connect()
+
+        if now >= self.next_prune:
+            self.prune(now)
+
+        # An emptied session (e.g. logout) is deleted with its cookie
+        if not session:
+            if session.sid is not None:
+                db.execute("DELETE FROM sessions WHERE sid = ?", (session.sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        expires = now + lifetime
+        if session.modified or session.expires is None:
+            if session.sid is None:
+                session.sid = secrets.token_urlsafe(32)
+            db.execute("INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)",
+                       (session.sid, session_json_serializer.dumps(dict(session)), expires))
+        elif expires - session.expires >= self.touch_interval:
+            db.execute("UPDATE sessions SET expires = ? WHERE sid = ?", (expires, session.sid))
+        else:
+            # Nothing changed: no write and no new cookie
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+    def prune(self, now=None):
+        """Delete expired sessions and release the space they used"""
+        if now is None:
+            now = time.time()
+        self.next_prune = now + self.prune_interval
+        db = self._connect()
+        deleted = db.execute("DELETE FROM sessions WHERE expires <= ?", (now,)).rowcount
+        if deleted:
+            db.execute("PRAGMA incremental_vacuum")
+            logger.info(f"Removed {deleted} expired sessions")
+        return deleted
+
+
+def create_session_interface(backend, data_dir):
+    """Create the session interface for a backend name from SESSION_BACKENDS
+
+    'sqlite' keeps sessions on the server in the data directory; 'cookie'
+    keeps them in a signed cookie, which needs no storage but requires a
+    SECRET_KEY shared by all workers and can't be revoked on the server.
+    """
+    if backend == 'cookie':
+        if not os.environ.get('SECRET_KEY'):
+            logger.warning("SESSION_BACKEND=cookie without SECRET_KEY: sessions end on restart "
+                           "and aren't shared between workers")
+        return SecureCookieSessionInterface()
+    if backend != 'sqlite':
+        logger.warning(f"Unknown SESSION_BACKEND '{backend}', using sqlite")
+    return SqliteSessionInterface(os.environ.get('SESSION_DB', os.path.join(data_dir, SESSION_DB_NAME)))
@@ -2,17 +2,60 @@
 import os
 import json
 import time
+import heapq
+import secrets
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger('nuki_web')
+
+def file_signature(path):
+    """Get (inode, mtime in ns, size) of a file, or None if it doesn't exist
+
+    Every save replaces the file, so the inode changes even when the mtime
+    resolution of the file system can't tell two writes apart.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def expiry_timestamp(expiry):
+    """Convert an ISO expiry (naive means local time) to a Unix timestamp, or None if it can't be parsed"""
+    try:
+        return datetime.fromisoformat(expiry.replace('Z', '+00:00')).timestamp()
+    except (ValueError, TypeError, AttributeError):
+        return None
+
 class TemporaryCodeDatabase:
-    """File-based database for temporary access codes"""
-    
+    """File-based database for temporary access codes
+
+    Codes are indexed by value and by creator, and active codes are kept in
+    a min-heap by expiry, so expiring the due codes only looks at those.
+    The file is re-read when another process changed it.
+    """
+
     def __init__(self, data_dir):
         """Initialize the database with a data directory"""
         self.data_dir = data_dir
         self.codes_file = os.path.join(self.data_dir, 'temp_codes.json')
-        self.codes = self._load_codes()
-    
+        self._lock = threading.RLock()
+        # Set when a code is added or changed, to wake up the reaper
+        self.changed = threading.Event()
+        self.codes = {}
+        # Signature of the codes file as last read or written; False before the first read
+        self._signature = False
+        self._last_id = 0
+        self._reload_if_changed()
+
     def _load_codes(self):
         """Load codes from the codes file"""
         if os.path.exists(self.codes_file):
@@ -23,132 +66,374 @@ class TemporaryCodeDatabase:
                 print(f"Error loading temporary codes: {e}")
                 return {}
         return {}
-    
+
+    def _reload_if_changed(self):
+        """Load the codes file if it changed since it was last read or written, and rebuild the indexes"""
+        with self._lock:
+            signature = file_signature(self.codes_file)
+            if signature == self._signature:
+                return
+            self._signature = signature
+            self.codes = self._load_codes()
+            self.by_value = {}
+            self.by_creator = {}
+            self.expiries = {}
+            self.heap = []
+            for code_id, data in self.codes.items():
+                self._index(code_id, data)
+            heapq.heapify(self.heap)
+            self.changed.set()
+
+    def _index(self, code_id, data):
+        """Add a code to the indexes and, while it is active, to the expiry heap"""
+        self.by_value[data.get('code')] = code_id
+        self.by_creator.setdefault(data.get('created_by'), set()).add(code_id)
+        timestamp = expiry_timestamp(data.get('expiry'))
+        self.expiries[code_id] = timestamp
+        if timestamp is not None and data.get('is_active', True):
+            # Entries of changed or deleted codes stay in the heap and are skipped when popped
+            heapq.heappush(self.heap, (timestamp, code_id))
+
+    def _unindex(self, code_id, data):
+        """Remove a code from the indexes"""
+        if self.by_value.get(data.get('code')) == code_id:
+            del self.by_value[data.get('code')]
+        creator_codes = self.by_creator.get(data.get('created_by'))
+        if creator_codes is not None:
+            creator_codes.discard(code_id)
+            if not creator_codes:
+                del self.by_creator[data.get('created_by')]
+        self.expiries.pop(code_id, None)
+
     def _save_codes(self):
         """Save codes to the codes file"""
         try:
             # Create directory if it doesn't exist
             os.makedirs(os.path.dirname(self.codes_file), exist_ok=True)
-            
-            with open(self.codes_file, 'w') as f:
+
+            # Replace the file in one step so other processes never read a partial file
+            tmp_file = f"{self.codes_file}.tmp"
+            with open(tmp_file, 'w') as f:
                 json.dump(self.codes, f, indent=2)
-            
+
             # Secure the file
-            os.chmod(self.codes_file, 0o600)
-            
+            os.chmod(tmp_file, 0o600)
+            os.replace(tmp_file, self.codes_file)
+
+            self._signature = file_signature(self.codes_file)
             return True
         except IOError as e:
             print(f"Error saving temporary codes: {e}")
             return False
-    
-    def add_code(self, code_id, code, name, created_by, expiry):
+
+    def new_code_id(self):
+        """Generate an unused code ID: the creation time in microseconds plus random digits
+
+        IDs are increasing within a process, so IDs generated for codes not
+        saved yet don't collide either; the random digits keep processes apart.
+        """
+        with self._lock:
+            self._reload_if_changed()
+            code_id = max(time.time_ns() // 1000 * 1000 + secrets.randbelow(1000), self._last_id + 1)
+            while str(code_id) in self.codes:
+                code_id += 1
+            self._last_id = code_id
+            return str(code_id)
+
+    def add_code(self, code_id, code, name, created_by, expiry, auth_id=None, smartlock_id=None):
         """Add a new temporary code"""
-        if not code or not name or not created_by or not expiry:
-            return False
-        
-        # Convert expiry to ISO format if it's a datetime object
-        if isinstance(expiry, datetime):
-            expiry = expiry.isoformat()
-            
-        self.codes[code_id] = {
+        return self.add_codes([{
+            'code_id': code_id,
             'code': code,
             'name': name,
             'created_by': created_by,
-            'created_at': datetime.now().isoformat(),
             'expiry': expiry,
-            'is_active': True,
-            'last_used': None
-        }
-        
-        return self._save_codes()
-    
+            'auth_id': auth_id,
+            'smartlock_id': smartlock_id
+        }])
+
+    def add_codes(self, codes):
+        """Add several temporary codes with one write
+
+        Args:
+            codes: Dicts with the arguments of add_code()
+
+        Returns:
+            bool: False if a code is missing a field or the codes couldn't be saved
+        """
+        if any(not spec.get(field) for spec in codes for field in ('code', 'name', 'created_by', 'expiry')):
+            return False
+
+        with self._lock:
+            self._reload_if_changed()
+            for spec in codes:
+                # Convert expiry to ISO format if it's a datetime object
+                expiry = spec['expiry']
+                if isinstance(expiry, datetime):
+                    expiry = expiry.isoformat()
+
+                code_id = spec['code_id']
+                old = self.codes.get(code_id)
+                if old is not None:
+                    self._unindex(code_id, old)
+                self.codes[code_id] = {
+                    'code': spec['code'],
+                    'name': spec['name'],
+                    'created_by': spec['created_by'],
+                    'created_at': datetime.now().isoformat(),
+                    'expiry': expiry,
+                    'is_active': True,
+                    'last_used': None,
+                    'auth_id': spec.get('auth_id'),
+                    'smartlock_id': spec.get('smartlock_id')
+                }
+                self._index(code_id, self.codes[code_id])
+            self.changed.set()
+            return self._save_codes()
+
     def get_code(self, code_id):
         """Get a code by its ID"""
-        return self.codes.get(str(code_id))
-    
+        with self._lock:
+            self._reload_if_changed()
+            return self.codes.get(str(code_id))
+
     def get_code_by_value(self, code_value):
         """Get a code by its value (the actual code)"""
-        for code_id, code_data in self.codes.items():
-            if code_data.get('code') == code_value:
-                code_data['id'] = code_id
-                return code_data
-        return None
-    
+        with self._lock:
+            self._reload_if_changed()
+            code_id = self.by_value.get(code_value)
+            if code_id is None:
+                return None
+            return {**self.codes[code_id], 'id': code_id}
+
     def update_code(self, code_id, data):
         """Update a code with new data"""
-        if str(code_id) not in self.codes:
-            return False
-            
-        # Update only the provided fields
-        for key, value in data.items():
-            if key in self.codes[str(code_id)]:
-                self.codes[str(code_id)][key] = value
-                
-        return self._save_codes()
-    
+        code_id = str(code_id)
+        with self._lock:
+            self._reload_if_changed()
+            if code_id not in self.codes:
+                return False
+
+            code = self.codes[code_id]
+            self._unindex(code_id, code)
+            # Update only the provided fields
+            for key, value in data.items():
+                if key in code:
+                    code[key] = value
+            self._index(code_id, code)
+            self.changed.set()
+            return self._save_codes()
+
     def delete_code(self, code_id):
         """Delete a code"""
-        if str(code_id) not in self.codes:
-            return False
-            
-        del self.codes[str(code_id)]
-        return self._save_codes()
-    
+        code_id = str(code_id)
+        with self._lock:
+            self._reload_if_changed()
+            if code_id not in self.codes:
+                return False
+
+            self._unindex(code_id, self.codes.pop(code_id))
+            return self._save_codes()
+
     def get_all_codes(self):
         """Get all codes"""
-        codes_list = []
-        for code_id, data in self.codes.items():
-            code = data.copy()
-            code['id'] = code_id
-            codes_list.append(code)
-        
-        return codes_list
-    
+        with self._lock:
+            self._reload_if_changed()
+            return [{**data, 'id': code_id} for code_id, data in self.codes.items()]
+
     def get_codes_by_creator(self, username):
         """Get all codes created by a specific user"""
-        return [
-            {**data, 'id': code_id} 
-            for code_id, data in self.codes.items() 
-            if data.get('created_by') == username
-        ]
-    
+        with self._lock:
+            self._reload_if_changed()
+            return [
+                {**self.codes[code_id], 'id': code_id}
+                for code_id in sorted(self.by_creator.get(username, ()), key=code_id_order)
+            ]
+
+    def next_expiry(self):
+        """Get the Unix timestamp of the next active code to expire, or None"""
+        with self._lock:
+            self._reload_if_changed()
+            while self.heap:
+                timestamp, code_id = self.heap[0]
+                if self._is_due_entry(timestamp, code_id):
+                    return timestamp
+                heapq.heappop(self.heap)
+            return None
+
+    def _is_due_entry(self, timestamp, code_id):
+        """Whether a heap entry still belongs to an active code with that expiry"""
+        data = self.codes.get(code_id)
+        return (data is not None and data.get('is_active', True)
+                and self.expiries.get(code_id) == timestamp)
+
+    def expire_codes(self, now=None):
+        """Deactivate the codes whose expiry has passed
+
+        Returns:
+            list: The codes deactivated, with their IDs
+        """
+        if now is None:
+            now = time.time()
+        expired = []
+        with self._lock:
+            self._reload_if_changed()
+            while self.heap and self.heap[0][0] <= now:
+                timestamp, code_id = heapq.heappop(self.heap)
+                if not self._is_due_entry(timestamp, code_id):
+                    continue
+                self.codes[code_id]['is_active'] = False
+                expired.append({**self.codes[code_id], 'id': code_id})
+            if expired:
+                self._save_codes()
+        return expired
+
     def clean_expired_codes(self):
         """Remove expired codes"""
-        now = datetime.now()
-        expired_codes = []
-        
-        for code_id, data in self.codes.items():
-            expiry = data.get('expiry')
-            if expiry:
-                try:
-                    expiry_date = datetime.fromisoformat(expiry)
-                    if expiry_date < now and data.get('is_active', True):
-                        data['is_active'] = False
-                        expired_codes.append(code_id)
-                except (ValueError, TypeError):
-                    pass
-        
-        if expired_codes:
-            return self._save_codes()
+        self.expire_codes()
         return True
-    
+
     def get_active_codes(self):
         """Get all active (non-expired) codes"""
-        now = datetime.now()
-        active_codes = []
-        
-        for code_id, data in self.codes.items():
-            expiry = data.get('expiry')
-            is_active = data.get('is_active', True)
-            
-            if expiry and is_active:
-                try:
-                    expiry_date = datetime.fromisoformat(expiry)
-                    if expiry_date > now:
-                        code = data.copy()
-                        code['id'] = code_id
-                        active_codes.append(code)
-                except (ValueError, TypeError):
-                    pass
-        
-        return active_codes
+        now = time.time()
+        with self._lock:
+            self._reload_if_changed()
+            return [
+                {**data, 'id': code_id}
+                for code_id, data in self.codes.items()
+                if data.get('is_active', True) and (self.expiries.get(code_id) or 0) > now
+            ]
+
+def add_codes_to_locks(api, codes, max_workers=4):
+    """Add temporary codes to their locks, several requests at a time
+
+    Args:
+        api: NukiAPI instance
+        codes: Dicts with smartlock_id, code, name, expiry and optionally valid_from
+        max_workers: Most requests to the Nuki API in flight at once
+
+    Returns:
+        list: The result of add_temporary_code() for each code, in order
+    """
+    def add(code):
+        try:
+            return api.add_temporary_code(code['smartlock_id'], code['code'], code['name'],
+                                          code['expiry'], valid_from=code.get('valid_from'))
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    if not codes:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(codes)), thread_name_prefix='temp-code') as pool:
+        return list(pool.map(add, codes))
+
+def remove_codes_from_locks(api, codes, max_workers=4):
+    """Remove authorizations (dicts with smartlock_id and auth_id) from their locks, several at a time
+
+    Returns:
+        list: The result of remove_code() for each authorization, in order
+    """
+    def remove(code):
+        try:
+            return api.remove_code(code['smartlock_id'], code['auth_id'])
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    if not codes:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(codes)), thread_name_prefix='temp-code') as pool:
+        return list(pool.map(remove, codes))
+
+def code_id_order(code_id):
+    """Sort key for code IDs, which are creation timestamps"""
+    return (0, int(code_id), '') if code_id.isdigit() else (1, 0, code_id)
+
+class CodeReaper:
+    """Background thread that deactivates temporary codes when they expire
+
+    Sleeps until the next code is due (or `max_sleep` seconds, to notice
+    codes added by other processes), deactivates the due codes and removes
+    their authorizations from the lock. With several web workers on one
+    data directory only the one holding temp_codes.lock reaps.
+    """
+
+    def __init__(self, db, api, max_sleep=60):
+        self.db = db
+        self.api = api
+        self.max_sleep = max_sleep
+        self.lock_file = os.path.join(db.data_dir, 'temp_codes.lock')
+        self._lock_fd = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the reaper thread"""
+        self._thread = threading.Thread(target=self._run, name='temp-code-reaper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the reaper thread"""
+        self._stop.set()
+        self.db.changed.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _acquire(self):
+        """Take the reaper lock shared with other processes, returning whether this process holds it"""
+        if fcntl is None or self._lock_fd is not None:
+            return True
+        try:
+            os.makedirs(self.db.data_dir, exist_ok=True)
+            fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            logger.warning(f"Can't open {self.lock_file}: {e}")
+            return True
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Cleared before reaping, so codes added meanwhile cut the wait short
+            self.db.changed.clear()
+            timeout = self.max_sleep
+            try:
+                if self._acquire():
+                    self.reap()
+                    next_expiry = self.db.next_expiry()
+                    if next_expiry is not None:
+                        timeout = min(max(next_expiry - time.time(), 0), self.max_sleep)
+            except Exception as e:
+                logger.error(f"Error expiring temporary codes: {e}")
+            if not self._stop.is_set():
+                self.db.changed.wait(timeout)
+
+    def reap(self, now=None):
+        """Deactivate the due codes and revoke them on the lock
+
+        Returns:
+            list: The codes deactivated
+        """
+        expired = self.db.expire_codes(now)
+        for code in expired:
+            auth_id = code.get('auth_id')
+            if not auth_id:
+                # The lock stops accepting the code at its expiry anyway
+                logger.info(f"Temporary code '{code.get('name')}' expired")
+                continue
+            # Codes from older versions were always added to the first lock
+            lock_id = code.get('smartlock_id') or self.api.get_default_lock_id()
+            if lock_id is None:
+                logger.warning(f"No smartlock to revoke expired code '{code.get('name')}' from")
+                continue
+            result = self.api.remove_code(lock_id, auth_id)
+            if result.get('success'):
+                logger.info(f"Temporary code '{code.get('name')}' expired and was removed from the lock")
+            else:
+                logger.warning(f"Expired code '{code.get('name')}' could not be removed from the lock: "
+                               f"{result.get('message')}")
+        return expired
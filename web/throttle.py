@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import time
+import threading
+from collections import OrderedDict
+
+
+class LoginThrottle:
+    """Failed password checks per client address and per username
+
+    After `max_failures` failures for a username (`max_ip_failures` for an
+    address) further attempts are refused for `lockout` seconds, doubling
+    with every further failure up to `max_lockout`. Refused attempts never
+    reach the password hash, so guessing costs no hashing CPU. The table
+    keeps at most `max_entries` keys, dropping the least recently failed;
+    entries are forgotten `max_lockout` seconds after their last failure.
+
+    Addresses are only per client when the app sees the real client
+    address; behind a reverse proxy set TRUSTED_PROXIES so it does, or all
+    clients share the proxy's entry. The table lives in one process, so
+    with several gunicorn workers each keeps its own and an attacker gets
+    up to the limits times the worker count.
+    """
+
+    def __init__(self, max_failures=5, max_ip_failures=20, lockout=30, max_lockout=3600, max_entries=10000):
+        self.max_failures = max_failures
+        self.max_ip_failures = max_ip_failures
+        self.lockout = lockout
+        self.max_lockout = max_lockout
+        self.max_entries = max_entries
+        # key -> [failures, locked until, last failure]
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _keys(self, ip, username):
+        keys = [(('user', (username or '').lower()), self.max_failures)]
+        if ip:
+            keys.append((('ip', ip), self.max_ip_failures))
+        return keys
+
+    def _entry(self, key, now):
+        """Get the entry of a key, dropping it if it is stale"""
+        entry = self.entries.get(key)
+        if entry is not None and now - entry[2] >= self.max_lockout:
+            del self.entries[key]
+            return None
+        return entry
+
+    def retry_after(self, ip, username, now=None):
+        """Get the seconds until an attempt is allowed, 0 if it is allowed now"""
+        if now is None:
+            now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key, _ in self._keys(ip, username):
+                entry = self._entry(key, now)
+                if entry is not None:
+                    wait = max(wait, entry[1] - now)
+        return wait
+
+    def failure(self, ip, username, now=None):
+        """Record a failed attempt"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            for key, limit in self._keys(ip, username):
+                entry = self._entry(key, now) or [0, 0, now]
+                entry[0] += 1
+                entry[2] = now
+                if entry[0] >= limit:
+                    entry[1] = now + min(self.lockout * 2 ** (entry[0] - limit), self.max_lockout)
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def success(self, ip, username):
+        """Forget the failures of a username after a correct password
+
+        The address keeps its count, so one known account can't be used to
+        reset the limit while guessing others.
+        """
+        with self._lock:
+            self.entries.pop(self._keys(ip, username)[0][0], None)